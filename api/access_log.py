@@ -0,0 +1,43 @@
+import random
+import time
+from config.logging_config import get_logger
+
+logger = get_logger('api.access')
+
+
+class AccessLogMiddleware:
+    # Per-request access log for high request rates: logs `sample_rate` of the
+    # requests plus every 5xx. Replaces uvicorn's own access log (--no-access-log),
+    # which writes one line per request.
+
+    def __init__(self,app,sample_rate:float):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self,scope,receive,send):
+        if scope['type'] != 'http':
+            return await self.app(scope,receive,send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_wrapper)
+        finally:
+            if status >= 500 or random.random() < self.sample_rate:
+                duration_ms = round((time.perf_counter() - start) * 1000,3)
+                client = scope.get('client')
+                logger.info('%s %s %s %.3fms',scope['method'],scope['path'],status,duration_ms,extra={
+                    'method' : scope['method'],
+                    'path' : scope['path'],
+                    'status' : status,
+                    'duration_ms' : duration_ms,
+                    'client' : client[0] if client else None,
+                    'sample_rate' : self.sample_rate,
+                })
@@ -1,14 +1,27 @@
-from fastapi import FastAPI,HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI,HTTPException,Request,Header
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse,PlainTextResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel,Field
 from typing import Annotated
-import joblib
-import pandas as pd
-import mlflow
-import mlflow.pyfunc
 from contextlib import asynccontextmanager
+from dataclasses import replace
+import asyncio
 import numpy as np
 import os
+import time
+from api.inference import SharedFeatures,parse_batch_body,records_to_columns,validate_records
+from api.metrics import REGISTRY,METRICS,MetricsMiddleware,stage_timer
+from api.access_log import AccessLogMiddleware
+from api.batcher import MicroBatcher
+from api.settings import settings
+from api.model_store import load_bundle
+from api.reloader import ModelReloader,build_serving_model,load_models
+from api.shadow import ShadowRunner,worker_log_path
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
 
 class UserInput(BaseModel):
     time_spend_alone : Annotated[int,Field(...,ge=0,le=11,description='Time spend alone by the user (0–11)')]
@@ -19,86 +32,327 @@ class UserInput(BaseModel):
     friends_circle_size : Annotated[int,Field(...,ge=0,le=15,description='Number of close friends (0–15)')]
     post_frequency: Annotated[int,Field(...,ge=0,le=10,description='Social media post frequency (0–10)')] 
     
-# mlflow.set_tracking_uri("https://dagshub.com/AkHiLdEvGoD/Personality-Prediction.mlflow")
+def _score_active(records):
+    # Resolved at flush time so a micro-batch always runs on the current model;
+    # each result carries the ServingModel that produced it.
+    active = app.state.active
+    labels,proba = active.predict_records(records)
+    return [((label,proba[i] if proba is not None else None),active) for i,label in enumerate(labels)]
+
+
+def _prediction_content(label,proba,active):
+    content = {'Predicted Personality': label, 'model_version': active.version}
+    if proba is not None:
+        content['probabilities'] = {name : round(float(p),6) for name,p in zip(active.classes,proba)}
+    return content
 
-dagshub_token = os.getenv("PERSONALITY_TEST")
-if not dagshub_token:
-    raise EnvironmentError("PERSONALITY_TEST environment variable is not set")
 
-os.environ["MLFLOW_TRACKING_USERNAME"] = dagshub_token
-os.environ["MLFLOW_TRACKING_PASSWORD"] = dagshub_token
+def load_serving_model():
+    # The primary (warmed, with its cache built), ensemble members and shadow
+    # models. api.server calls this once in the master process before forking.
+    bundle = load_bundle(
+        settings.model_name,
+        settings.model_stage,
+        settings.model_source,
+        settings.model_store_dir,
+        settings.model_store_max_age_s,
+        prefer_arrays=settings.model_format != 'pickle'
+    )
+    logger.info('Loaded %s v%s from %s',bundle.model_name,bundle.version,bundle.source)
+    members = load_models(settings.ensemble_models,UserInput,settings)
+    shadow_models = load_models(settings.shadow_models,UserInput,settings)
+    return build_serving_model(bundle,UserInput,settings,members=members),shadow_models
 
-dagshub_url = "https://dagshub.com"
-repo_owner = "AkHiLdEvGoD"
-repo_name = "Personality-Prediction"
 
-mlflow.set_tracking_uri(f'{dagshub_url}/{repo_owner}/{repo_name}.mlflow')
+async def _evaluate_drift(interval_s:float):
+    # Closes a drift window of whichever model is active at each tick.
+    while True:
+        await asyncio.sleep(interval_s)
+        drift = app.state.active.drift
+        if drift is not None:
+            try:
+                drift.evaluate()
+            except Exception as e:
+                logger.error('Drift evaluation failed : %s',e)
 
-def get_latest_model_version(model_name):
-    client = mlflow.MlflowClient()
-    latest = client.get_latest_versions(model_name,stages=['Production'])
-    if not latest:
-        latest = client.get_latest_versions(model_name,stages=['None'])
-    return latest[0].version if latest else None
 
 @asynccontextmanager
 async def lifespan(app : FastAPI):
-    model_name = 'my_model'
-    model_version = get_latest_model_version(model_name)
-    if not model_version:
-        raise RuntimeError(f"No versions found for model: {model_name}")
-    model_uri = f'models:/{model_name}/{model_version}'
-    print(f'Loading model from {model_uri}')
-
-    app.state.model = mlflow.pyfunc.load_model(model_uri)
-    
-    app.state.label_encoder = joblib.load('./local_Storage/models/label_encoder.pkl')
+    # A worker forked by api.server serves the model its master preloaded; the
+    # shadow runner's threads and the batcher and reloader tasks always belong
+    # to the serving process.
+    if app.state.worker_id is None:
+        app.state.active,app.state.shadow_models = load_serving_model()
+    logger.info('Model and encoders loaded')
+
+    shadow = None
+    if app.state.shadow_models:
+        shadow = ShadowRunner(
+            app.state.shadow_models,
+            max_workers=settings.shadow_max_workers,
+            max_pending=settings.shadow_max_pending,
+            sample_rate=settings.shadow_sample_rate,
+            log_path=worker_log_path(settings.shadow_log_path,app.state.worker_id)
+        )
+    app.state.active.shadow = shadow
 
-    app.state.preprocessing_pipeline = joblib.load('./local_Storage/models/preprocessing_pipeline.pkl')
+    app.state.batcher = None
+    if settings.batching_enabled:
+        app.state.batcher = MicroBatcher(_score_active,settings.batch_max_size,settings.batch_max_wait_us)
+        await app.state.batcher.start()
 
-    print('Model and encoders loaded')
+    # Under api.server the master process polls for new versions and replaces
+    # the workers, so a worker does not reload on its own.
+    reload_settings = settings if app.state.request_reload is None else replace(settings,model_reload_interval_s=0)
+    app.state.reloader = ModelReloader(app.state,UserInput,reload_settings)
+    await app.state.reloader.start()
+
+    drift_task = None
+    if settings.drift_enabled and settings.drift_interval_s > 0:
+        drift_task = asyncio.create_task(_evaluate_drift(settings.drift_interval_s))
     yield
 
+    if drift_task is not None:
+        drift_task.cancel()
+        try:
+            await drift_task
+        except asyncio.CancelledError:
+            pass
+    await app.state.reloader.stop()
+    if app.state.batcher is not None:
+        await app.state.batcher.stop()
+    if shadow is not None:
+        shadow.stop()
+
 
 app = FastAPI(title="Personality Prediction API",lifespan=lifespan)
+app.state.active = None
+app.state.shadow_models = ()
+# Set by api.server in each forked worker.
+app.state.worker_id = None
+app.state.request_reload = None
+
+
+def _loaded_models(active):
+    # (role, ServingModel) for every model held in memory.
+    models = [('primary',active)] + [('ensemble',member) for member in active.members]
+    if active.shadow is not None:
+        models += [('shadow',model) for model in active.shadow.models]
+    return models
+
+
+def _collect_model_metrics():
+    active = app.state.active
+    METRICS['model_info'].clear()
+    METRICS['model_bytes'].clear()
+    if active is not None:
+        METRICS['model_info'].set(active.bundle.model_name,active.version,active.scorer.name,value=1)
+        METRICS['model_loaded'].set(value=active.loaded_at)
+        for role,model in _loaded_models(active):
+            METRICS['model_bytes'].set(role,model.bundle.version,value=model.nbytes)
+        if active.shadow is not None:
+            METRICS['shadow_pending'].set(value=active.shadow.pending)
+        if active.cache is not None:
+            cache = active.cache.stats()
+            for stat in ('size','hits','misses','evictions','expirations'):
+                METRICS['cache'].set(stat,value=cache[stat])
+    METRICS['drift_psi'].clear()
+    METRICS['drift_ks'].clear()
+    window = active.drift.last_window if active is not None and active.drift is not None else None
+    if window is not None:
+        for feature,stats in [*window['features'].items(),('prediction',window['prediction'])]:
+            METRICS['drift_psi'].set(feature,value=stats['psi'])
+            METRICS['drift_ks'].set(feature,value=stats['ks'])
+    batcher = getattr(app.state,'batcher',None)
+    if batcher is not None:
+        batches = batcher.stats()
+        for stat in ('queue_depth','max_queue_depth','batches','records'):
+            METRICS['batcher'].set(stat,value=batches[stat])
+
+REGISTRY.add_collector(_collect_model_metrics)
+
+if settings.access_log_sample_rate > 0:
+    app.add_middleware(AccessLogMiddleware,sample_rate=settings.access_log_sample_rate)
+
+
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get('/metrics',include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(),media_type='text/plain; version=0.0.4')
+
 
 @app.get("/health")
 def health():
-    return {"status": "up"}
+    active = app.state.active
+    if active is None:
+        return JSONResponse(status_code=503,content={"status": "loading", "model_loaded": False})
+    reloader = getattr(app.state,'reloader',None)
+    return {
+        "status": "up",
+        "model_loaded": True,
+        "model_name": active.bundle.model_name,
+        "model_version": active.version,
+        "model_source": active.bundle.source,
+        "scorer": active.scorer.name,
+        "ensemble_versions": [member.version for member in active.members],
+        "shadow_versions": [model.version for model in active.shadow.models] if active.shadow is not None else [],
+        "model_loaded_at": active.loaded_at,
+        "model_age_s": round(time.time() - active.loaded_at,3),
+        "last_reload_error": reloader.last_error if reloader is not None else None,
+    }
+
+@app.get("/stats")
+def stats():
+    batcher = app.state.batcher
+    cache = app.state.active.cache
+    return {
+        'model_version' : app.state.active.version,
+        'worker' : {'id' : app.state.worker_id,'pid' : os.getpid()},
+        'batcher' : batcher.stats() if batcher is not None else None,
+        'cache' : cache.stats() if cache is not None else None,
+        'reloader' : app.state.reloader.stats(),
+        'models' : [{'role' : role,'version' : model.bundle.version,'scorer' : model.scorer.name,'bytes' : model.nbytes} for role,model in _loaded_models(app.state.active)],
+        'shadow' : app.state.active.shadow.stats() if app.state.active.shadow is not None else None
+    }
+
+@app.get('/drift')
+def drift():
+    # Per process: each api.server worker reports the traffic it served.
+    active = app.state.active
+    if active.drift is None:
+        raise HTTPException(status_code=404,detail="Drift monitoring is disabled or the model has no reference profile")
+    return {
+        'model_version' : active.version,
+        'worker' : {'id' : app.state.worker_id,'pid' : os.getpid()},
+        **active.drift.report()
+    }
+
+@app.post('/admin/reload')
+async def reload_model(force:bool = False,x_admin_token:Annotated[str | None,Header()] = None):
+    if settings.admin_token and x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403,detail="Invalid admin token")
+    if app.state.request_reload is not None:
+        # Preforked worker: the master reloads and replaces every worker.
+        app.state.request_reload(force)
+        return JSONResponse(status_code=202,content={'reloaded' : False,'scheduled' : True,'model_version' : app.state.active.version})
+    try:
+        return await app.state.reloader.check(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=500,detail=f"Reload error: {e}")
+
+@app.post('/predict',openapi_extra={'requestBody' : {'required' : True,'content' : {'application/json' : {'schema' : UserInput.model_json_schema()}}}})
+async def predict(request:Request):
+    # The body is validated here rather than by FastAPI so the validation stage
+    # can be timed; invalid input still gets FastAPI's usual 422 response.
+    timer = stage_timer()
+    try:
+        data = UserInput.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    timer.lap('validation')
 
-@app.post('/predict')
-async def predict(data:UserInput):
     try : 
-        model = app.state.model
-        preprocessing_pipeline = app.state.preprocessing_pipeline
-        label_encoder = app.state.label_encoder
-
-        offline_social_activity = data.social_event_attendance * data.going_outside
-        df = pd.DataFrame({
-            'Time_spent_Alone' : [data.time_spend_alone],
-            'Stage_fear' : [data.stage_fear],
-            'Social_event_attendance' : [data.social_event_attendance],
-            'Going_outside':[data.going_outside],
-            'Drained_after_socializing':[data.drained_after_socializing],
-            'Friends_circle_size' : [data.friends_circle_size],
-            'Post_frequency':[data.post_frequency],
-            'Offline_social_activity' : [offline_social_activity]
-        })
-        # print(df.isnull().sum())       # Check for NaNs
-        num_cols = df.select_dtypes(include='number').columns
-        df['Stage_fear'] = df['Stage_fear'].map({True : 'Yes' , False : 'No'})
-        df['Drained_after_socializing'] = df['Drained_after_socializing'].map({True : 'Yes' , False : 'No'})
-        df[num_cols] = df[num_cols].astype(float)
-        
-        print(df.dtypes)
-
-        processed_df = preprocessing_pipeline.transform(df)
-        pred = model.predict(processed_df)
-
-        decoded_pred = label_encoder.inverse_transform(pred)
-
-        return JSONResponse(status_code=200, content={'Predicted Personality': decoded_pred[0]})
+        active = app.state.active
+        if active.cache is not None:
+            cached = active.cache.get(active.version,data)
+            if cached is not None:
+                METRICS['predictions'].inc(cached[0],'cache')
+                if active.drift is not None:
+                    active.drift.observe(data,cached[0])
+                # Shadow models see the same traffic whether or not it was cached.
+                if active.shadow is not None:
+                    active.shadow.submit_records([data],[cached[0]],active.version)
+                return JSONResponse(status_code=200, content=_prediction_content(*cached,active))
+
+        if app.state.batcher is not None:
+            prediction,active = await app.state.batcher.submit(data)
+        else:
+            labels,proba = await run_in_threadpool(active.predict_records,[data])
+            prediction = (labels[0],proba[0] if proba is not None else None)
+
+        if active.cache is not None:
+            active.cache.put(active.version,data,prediction)
+        METRICS['predictions'].inc(prediction[0],'model')
+        if active.drift is not None:
+            active.drift.observe(data,prediction[0])
+        return JSONResponse(status_code=200, content=_prediction_content(*prediction,active))
 
     except Exception as e:
+        logger.error('Prediction error : %s',e)
         raise HTTPException(status_code=500,detail=f"Prediction error: {e}")
 
+def _count_predictions(labels,source:str):
+    for label,count in zip(*np.unique(np.asarray(labels,dtype=str),return_counts=True)):
+        METRICS['predictions'].inc(str(label),source,amount=int(count))
+
+def _score_batch(active,records,missing):
+    # (columns, labels, probabilities): the raw columns of every record when the
+    # drift monitor needs them, built once and sliced for scoring the cache misses.
+    if active.drift is None:
+        return (None,*active.predict_records([records[i] for i in missing]))
+    timer = stage_timer()
+    columns = records_to_columns(records)
+    if not missing:
+        return columns,np.array([],dtype=object),None
+    scored = columns if len(missing) == len(records) else {name : values[missing] for name,values in columns.items()}
+    return (columns,*active.predict_features(SharedFeatures(scored),timer))
+
+@app.post('/predict_batch')
+async def predict_batch(request:Request):
+    try:
+        items = parse_batch_body(await request.body(),request.headers.get('content-type',''))
+    except ValueError as e:
+        raise HTTPException(status_code=400,detail=f"Invalid batch body: {e}")
+
+    timer = stage_timer()
+    records,indices,errors = validate_records(items,UserInput)
+    timer.lap('validation')
+    active = app.state.active
+    cache = active.cache
+    # (label, probabilities) per valid record
+    results = [None] * len(records)
+    missing = list(range(len(records)))
+    if cache is not None:
+        results = [cache.get(active.version,record) for record in records]
+        missing = [i for i,result in enumerate(results) if result is None]
+
+    try :
+        columns,scored,proba = await run_in_threadpool(_score_batch,active,records,missing)
+    except Exception as e:
+        logger.error('Batch prediction error : %s',e)
+        raise HTTPException(status_code=500,detail=f"Prediction error: {e}")
+
+    if cache is not None and len(missing) < len(records):
+        _count_predictions([result[0] for result in results if result is not None],'cache')
+        if active.shadow is not None:
+            hits = [i for i,result in enumerate(results) if result is not None]
+            active.shadow.submit_records([records[i] for i in hits],[results[i][0] for i in hits],active.version)
+    _count_predictions(scored,'model')
+
+    for j,(i,label) in enumerate(zip(missing,scored)):
+        results[i] = (label,proba[j] if proba is not None else None)
+        if cache is not None:
+            cache.put(active.version,records[i],results[i])
+
+    if active.drift is not None:
+        active.drift.observe_batch(columns,[label for label,_ in results])
+
+    predictions = [None] * len(items)
+    for index,(label,_) in zip(indices,results):
+        predictions[index] = label
+    content = {
+        'count' : len(items),
+        'model_version' : active.version,
+        'predictions' : predictions,
+        'errors' : errors
+    }
+    if active.probabilities:
+        # One row per item in `classes` order; null for invalid items.
+        probabilities = [None] * len(items)
+        for index,(_,p) in zip(indices,results):
+            probabilities[index] = [round(float(value),6) for value in p]
+        content['classes'] = active.classes
+        content['probabilities'] = probabilities
+    return JSONResponse(status_code=200, content=content)
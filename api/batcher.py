@@ -0,0 +1,116 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bounds of the realized batch size histogram
+BATCH_SIZE_BUCKETS = (1,2,4,8,16,32,64,128,256,512,1024)
+
+
+class MicroBatcher:
+    # Coalesces concurrent single-record predictions into one vectorized call.
+    # A batch is flushed once it holds max_batch_size records or max_wait_us has
+    # passed since its first record arrived; scoring runs in a worker thread so
+    # the event loop keeps accepting requests meanwhile.
+
+    def __init__(self,predict_fn,max_batch_size:int,max_wait_us:int):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(int(max_batch_size),1)
+        self.max_wait = max(int(max_wait_us),0) / 1_000_000
+        self._queue = None
+        self._task = None
+        self._executor = None
+        self.batches = 0
+        self.records = 0
+        self.max_queue_depth = 0
+        self.last_batch_size = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1,thread_name_prefix='predict-batcher')
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _,future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError('Prediction batcher stopped'))
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def submit(self,record):
+        if self._task is None:
+            raise RuntimeError('Prediction batcher is not running')
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((record,future))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(),timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            self._record_batch(len(batch))
+            records = [record for record,_ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor,self.predict_fn,records)
+            except Exception as e:
+                for _,future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_,future),result in zip(batch,results):
+                if not future.done():
+                    future.set_result(result)
+
+    def _record_batch(self,size:int):
+        self.batches += 1
+        self.records += size
+        self.last_batch_size = size
+        for i,bound in enumerate(BATCH_SIZE_BUCKETS):
+            if size <= bound:
+                self.batch_size_counts[i] += 1
+                break
+        else:
+            self.batch_size_counts[-1] += 1
+
+    def stats(self):
+        buckets = {str(bound) : count for bound,count in zip(BATCH_SIZE_BUCKETS,self.batch_size_counts)}
+        buckets['+Inf'] = self.batch_size_counts[-1]
+        return {
+            'max_batch_size' : self.max_batch_size,
+            'max_wait_us' : int(self.max_wait * 1_000_000),
+            'queue_depth' : self._queue.qsize() if self._queue is not None else 0,
+            'max_queue_depth' : self.max_queue_depth,
+            'batches' : self.batches,
+            'records' : self.records,
+            'last_batch_size' : self.last_batch_size,
+            'mean_batch_size' : self.records / self.batches if self.batches else 0.0,
+            'batch_size_histogram' : buckets,
+        }
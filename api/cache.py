@@ -0,0 +1,137 @@
+import time
+from collections import OrderedDict
+import numpy as np
+from api.inference import SharedFeatures,field_bounds,grid_columns
+from api.metrics import SILENT_TIMER
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class PredictionCache:
+    # Every UserInput field is a bounded integer or a bool, so a request is fully
+    # described by its normalized field tuple. Entries belong to one model version
+    # and are dropped as soon as a lookup arrives for a different version.
+    #
+    # mode='lru'   : bounded LRU of tuple -> (label, probabilities), optional TTL
+    # mode='table' : dense label (and probability) table over the whole input
+    #                space, built up front
+    #
+    # Values are (label, probabilities) pairs; probabilities is None when the
+    # served model does not return them.
+
+    def __init__(self,model_cls,mode:str = 'lru',max_size:int = 100_000,ttl_s:float = 0,table_max_entries:int = 5_000_000):
+        if mode not in ('lru','table'):
+            raise ValueError(f'Unsupported prediction cache mode: {mode}')
+        self.mode = mode
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.table_max_entries = table_max_entries
+        self.bounds = field_bounds(model_cls)
+        self.fields = list(self.bounds)
+        self.version = None
+        self._entries = OrderedDict()
+        self._table = None
+        self._table_labels = None
+        self._table_proba = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        radices = [hi - lo + 1 for lo,hi in self.bounds.values()]
+        self.space_size = int(np.prod(radices))
+        self._strides = [int(np.prod(radices[i + 1:])) for i in range(len(radices))]
+        self._offsets = [lo for lo,_ in self.bounds.values()]
+
+    def key(self,record):
+        return tuple(int(getattr(record,field)) for field in self.fields)
+
+    def bind(self,version,scorer = None,probabilities:bool = False):
+        # Called whenever a model is (re)loaded; invalidates everything cached for
+        # the previous version and, in table mode, precomputes the new table.
+        if version == self.version and (self.mode != 'table' or self._table is not None):
+            return
+        self._entries.clear()
+        self._table = None
+        self._table_labels = None
+        self._table_proba = None
+        self.version = version
+        if self.mode == 'table' and scorer is not None:
+            self._table,self._table_labels,self._table_proba = self.build_table(scorer,probabilities)
+
+    def build_table(self,scorer,probabilities:bool = False,chunk_size:int = 8192):
+        if self.space_size > self.table_max_entries:
+            logger.warning('Input space of %s entries exceeds table limit, falling back to LRU lookups',self.space_size)
+            return None,None,None
+        start_time = time.perf_counter()
+        codes = np.empty(self.space_size,dtype=np.uint8)
+        table_proba = np.empty((self.space_size,len(scorer.labels)),dtype=np.float32) if probabilities else None
+        labels = []
+        for start in range(0,self.space_size,chunk_size):
+            stop = min(start + chunk_size,self.space_size)
+            features = SharedFeatures(grid_columns(self.bounds,start,stop))
+            if probabilities:
+                predicted,proba = scorer.predict_with_proba(features,SILENT_TIMER)
+                table_proba[start:stop] = proba
+            else:
+                predicted = scorer.predict_features(features,SILENT_TIMER)
+            predicted = np.asarray(predicted)
+            uniques,inverse = np.unique(predicted,return_inverse=True)
+            for label in uniques:
+                if label not in labels:
+                    labels.append(label)
+            mapping = np.array([labels.index(label) for label in uniques],dtype=np.uint8)
+            codes[start:stop] = mapping[inverse]
+        logger.info('Precomputed %s predictions in %.2fs',self.space_size,time.perf_counter() - start_time)
+        return codes,np.array(labels,dtype=object),table_proba
+
+    def get(self,version,record):
+        if version != self.version:
+            self.bind(version)
+        if self._table is not None:
+            index = sum((int(getattr(record,field)) - offset) * stride
+                        for field,offset,stride in zip(self.fields,self._offsets,self._strides))
+            self.hits += 1
+            return self._table_labels[self._table[index]],self._table_proba[index] if self._table_proba is not None else None
+
+        key = self.key(record)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value,expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self,version,record,value):
+        if version != self.version or self._table is not None:
+            return
+        key = self.key(record)
+        expires_at = time.monotonic() + self.ttl_s if self.ttl_s else None
+        self._entries[key] = (value,expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'mode' : 'table' if self._table is not None else 'lru',
+            'model_version' : self.version,
+            'size' : self.space_size if self._table is not None else len(self._entries),
+            'max_size' : self.space_size if self._table is not None else self.max_size,
+            'ttl_s' : self.ttl_s,
+            'hits' : self.hits,
+            'misses' : self.misses,
+            'evictions' : self.evictions,
+            'expirations' : self.expirations,
+            'hit_rate' : self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import pickle
+import numpy as np
+from api.metrics import stage_timer
+from api.inference import SharedFeatures,records_to_columns,columns_to_frame,transform_frame,sample_records
+from src.features import FEATURE_SPEC,FeatureSpec
+from src.model_bundle import extract_arrays,read_array_bundle,decision_function,predict_labels,probability_map
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class SklearnScorer:
+    name = 'sklearn'
+
+    def __init__(self,preprocessing_pipeline,model,label_encoder):
+        self.preprocessing_pipeline = preprocessing_pipeline
+        self.model = model
+        self.label_encoder = label_encoder
+        # Class names in predict_proba column order.
+        self.labels = np.asarray(label_encoder.inverse_transform(model.classes_),dtype=object)
+        self._processed_key = ('processed',id(preprocessing_pipeline),tuple(getattr(model,'feature_names_in_',())))
+
+    @property
+    def has_probabilities(self):
+        return hasattr(self.model,'predict_proba')
+
+    def _processed(self,features:SharedFeatures):
+        frame = features.get(('frame',),lambda: columns_to_frame(features.columns))
+        return features.get(self._processed_key,lambda: transform_frame(frame,self.preprocessing_pipeline,self.model))
+
+    def predict_features(self,features:SharedFeatures,timer = None):
+        timer = timer or stage_timer()
+        features.get(('frame',),lambda: columns_to_frame(features.columns))
+        timer.lap('feature_build')
+        processed = self._processed(features)
+        timer.lap('transform')
+        pred = self.model.predict(processed)
+        timer.lap('predict')
+        labels = self.label_encoder.inverse_transform(pred)
+        timer.lap('inverse_transform')
+        return labels
+
+    def predict_proba_features(self,features:SharedFeatures):
+        return self.model.predict_proba(self._processed(features))
+
+    def predict_with_proba(self,features:SharedFeatures,timer = None):
+        timer = timer or stage_timer()
+        features.get(('frame',),lambda: columns_to_frame(features.columns))
+        timer.lap('feature_build')
+        processed = self._processed(features)
+        timer.lap('transform')
+        if hasattr(self.model,'predict_with_proba'):
+            # Calibrated models derive both from one decision_function call.
+            pred,proba = self.model.predict_with_proba(processed)
+            timer.lap('predict')
+        else:
+            pred = self.model.predict(processed)
+            timer.lap('predict')
+            proba = self.model.predict_proba(processed)
+        timer.lap('calibrate')
+        labels = self.label_encoder.inverse_transform(pred)
+        timer.lap('inverse_transform')
+        return labels,proba
+
+    def predict_columns(self,columns,timer = None):
+        return self.predict_features(SharedFeatures(columns),timer)
+
+    def predict_records(self,records):
+        if not records:
+            return np.array([],dtype=object)
+        timer = stage_timer()
+        return self.predict_columns(records_to_columns(records),timer)
+
+
+class CompiledScorer:
+    # Pure NumPy re-implementation of ColumnTransformer(StandardScaler, OrdinalEncoder)
+    # followed by a linear model (optionally behind a Nystroem / RBFSampler feature
+    # map) or a binary SVC. It only needs the arrays and
+    # manifest produced by src.model_bundle, either extracted from the fitted sklearn
+    # objects at startup or memory-mapped from an exported array bundle.
+    name = 'compiled'
+
+    def __init__(self,arrays:dict,manifest:dict):
+        self.arrays = arrays
+        self.manifest = manifest
+        self.num_columns = manifest['num_columns']
+        self.cat_columns = manifest['cat_columns']
+        self.kernel = manifest['kernel']
+        self.labels = np.array(manifest['labels'],dtype=object)
+        # Bundles written before the feature spec existed used the current one.
+        self.feature_spec = FeatureSpec.from_dict(manifest['feature_spec']) if 'feature_spec' in manifest else FEATURE_SPEC
+        self.mean = arrays['scaler_mean']
+        self.scale = arrays['scaler_scale']
+        self.yes_codes = arrays['yes_codes']
+        self.no_codes = arrays['no_codes']
+        self.num_offset = 0 if manifest['num_first'] else len(self.cat_columns)
+        self.cat_offset = len(self.num_columns) if manifest['num_first'] else 0
+        self.probability = probability_map(manifest)
+        # Calibrated labels come from the probabilities, not the sign of the score.
+        self.calibrated = 'calibration' in manifest
+        self.sv_sq_norms = None
+        if self.kernel != 'linear_model':
+            self.sv_sq_norms = (arrays['support_vectors'] ** 2).sum(axis=1)
+        elif manifest.get('feature_map') == 'nystroem':
+            self.sv_sq_norms = (arrays['components'] ** 2).sum(axis=1)
+        # Scorers whose bundles share a feature spec share the encoded columns;
+        # those that also share the fitted scaler and encoder share the matrix.
+        spec = json.dumps(self.feature_spec.to_dict(),sort_keys=True).encode()
+        self._encoded_key = ('encoded',hashlib.sha256(spec).hexdigest())
+        digest = hashlib.sha256(spec)
+        digest.update(json.dumps([self.num_columns,self.cat_columns,manifest['num_first']]).encode())
+        for name in ('scaler_mean','scaler_scale','yes_codes','no_codes'):
+            digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+        self._matrix_key = ('matrix',digest.hexdigest())
+
+    @classmethod
+    def from_fitted(cls,preprocessing_pipeline,model,label_encoder):
+        return cls(*extract_arrays(preprocessing_pipeline,model,label_encoder))
+
+    @classmethod
+    def from_bundle(cls,bundle_dir:str,mmap:bool = True):
+        return cls(*read_array_bundle(bundle_dir,mmap=mmap))
+
+    def transform_columns(self,columns):
+        return self.transform_encoded(self.feature_spec.encode(columns))
+
+    def transform_encoded(self,raw):
+        n = len(raw[self.num_columns[0]]) if self.num_columns else len(raw[self.cat_columns[0]])
+
+        X = np.empty((n,len(self.num_columns) + len(self.cat_columns)),dtype=np.float64)
+        num_block = X[:,self.num_offset:self.num_offset + len(self.num_columns)]
+        for j,column in enumerate(self.num_columns):
+            num_block[:,j] = raw[column]
+        num_block -= self.mean
+        num_block /= self.scale
+        for j,column in enumerate(self.cat_columns):
+            X[:,self.cat_offset + j] = np.where(raw[column],self.yes_codes[j],self.no_codes[j])
+        return X
+
+    def decision_function(self,X):
+        return decision_function(self.arrays,self.manifest,X,self.sv_sq_norms)
+
+    @property
+    def has_probabilities(self):
+        return self.probability is not None
+
+    def _matrix(self,features:SharedFeatures):
+        raw = features.get(self._encoded_key,lambda: self.feature_spec.encode(features.columns))
+        return features.get(self._matrix_key,lambda: self.transform_encoded(raw))
+
+    def predict_features(self,features:SharedFeatures,timer = None):
+        timer = timer or stage_timer()
+        raw = features.get(self._encoded_key,lambda: self.feature_spec.encode(features.columns))
+        timer.lap('feature_build')
+        X = features.get(self._matrix_key,lambda: self.transform_encoded(raw))
+        timer.lap('transform')
+        scores = self.decision_function(X)
+        timer.lap('predict')
+        labels = predict_labels(self.labels,self.manifest,scores,self.probability(scores) if self.calibrated else None)
+        timer.lap('inverse_transform')
+        return labels
+
+    def predict_proba_features(self,features:SharedFeatures):
+        p = self.probability(self.decision_function(self._matrix(features)))
+        return np.column_stack([1.0 - p,p])
+
+    def predict_with_proba(self,features:SharedFeatures,timer = None):
+        # Labels and probabilities from the same decision scores.
+        timer = timer or stage_timer()
+        raw = features.get(self._encoded_key,lambda: self.feature_spec.encode(features.columns))
+        timer.lap('feature_build')
+        X = features.get(self._matrix_key,lambda: self.transform_encoded(raw))
+        timer.lap('transform')
+        scores = self.decision_function(X)
+        timer.lap('predict')
+        p = self.probability(scores)
+        proba = np.column_stack([1.0 - p,p])
+        timer.lap('calibrate')
+        labels = predict_labels(self.labels,self.manifest,scores,p)
+        timer.lap('inverse_transform')
+        return labels,proba
+
+    def predict_columns(self,columns,timer = None):
+        return self.predict_features(SharedFeatures(columns),timer)
+
+    def predict_records(self,records):
+        if not records:
+            return np.array([],dtype=object)
+        # feature_build covers records_to_columns as well.
+        timer = stage_timer()
+        return self.predict_columns(records_to_columns(records),timer)
+
+
+class VotingScorer:
+    # Soft voting: the weighted mean of the members' class probabilities. All
+    # members score the same SharedFeatures, so the request is encoded once and
+    # scaled once per distinct preprocessing, not once per model.
+    name = 'ensemble'
+    has_probabilities = True
+
+    def __init__(self,scorers:list,weights:tuple = ()):
+        missing = [scorer.name for scorer in scorers if not scorer.has_probabilities]
+        if missing:
+            raise ValueError(f'Soft voting needs class probabilities; {len(missing)} member(s) have none ({missing})')
+        weights = tuple(weights) or (1.0,) * len(scorers)
+        if len(weights) != len(scorers):
+            raise ValueError(f'Got {len(weights)} ensemble weights for {len(scorers)} models')
+        self.scorers = scorers
+        self.weights = np.asarray(weights,dtype=np.float64) / sum(weights)
+        self.labels = np.asarray(scorers[0].labels,dtype=object)
+        # Column order of each member's probabilities relative to self.labels.
+        self.orders = []
+        for scorer in scorers:
+            labels = list(scorer.labels)
+            if sorted(labels) != sorted(self.labels):
+                raise ValueError(f'Ensemble members predict different classes: {labels} vs {list(self.labels)}')
+            self.orders.append([labels.index(label) for label in self.labels])
+
+    def predict_proba_features(self,features:SharedFeatures):
+        proba = 0.0
+        for scorer,weight,order in zip(self.scorers,self.weights,self.orders):
+            proba = proba + weight * scorer.predict_proba_features(features)[:,order]
+        return proba
+
+    def predict_with_proba(self,features:SharedFeatures,timer = None):
+        timer = timer or stage_timer()
+        proba = self.predict_proba_features(features)
+        timer.lap('predict')
+        labels = self.labels[proba.argmax(axis=1)]
+        timer.lap('inverse_transform')
+        return labels,proba
+
+    def predict_features(self,features:SharedFeatures,timer = None):
+        return self.predict_with_proba(features,timer)[0]
+
+    def predict_columns(self,columns,timer = None):
+        return self.predict_features(SharedFeatures(columns),timer)
+
+    def predict_records(self,records):
+        if not records:
+            return np.array([],dtype=object)
+        timer = stage_timer()
+        return self.predict_columns(records_to_columns(records),timer)
+
+
+def scorer_nbytes(scorer):
+    # Parameter memory of a scorer; memory-mapped arrays are file-backed pages
+    # shared with every other process mapping the same bundle.
+    if isinstance(scorer,VotingScorer):
+        return sum(scorer_nbytes(member) for member in scorer.scorers)
+    if isinstance(scorer,CompiledScorer):
+        return int(sum(array.nbytes for array in scorer.arrays.values()))
+    return len(pickle.dumps(scorer.model,protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def verify_scorer(scorer,reference,model_cls,n_samples:int = 2000):
+    samples = sample_records(model_cls,n_samples)
+    expected = np.asarray(reference.predict_records(samples))
+    actual = np.asarray(scorer.predict_records(samples))
+    return int((expected != actual).sum()),len(samples)
+
+
+def build_scorer(preprocessing_pipeline,model,label_encoder,model_cls,n_samples:int = 2000):
+    reference = SklearnScorer(preprocessing_pipeline,model,label_encoder)
+    try:
+        compiled = CompiledScorer.from_fitted(preprocessing_pipeline,model,label_encoder)
+    except NotImplementedError as e:
+        logger.warning('Compiled scorer unavailable, using sklearn path : %s',e)
+        return reference
+
+    mismatches,checked = verify_scorer(compiled,reference,model_cls,n_samples)
+    if mismatches:
+        logger.warning('Compiled scorer disagrees with sklearn on %s/%s samples, using sklearn path',mismatches,checked)
+        return reference
+
+    logger.info('Compiled scorer verified on %s samples',checked)
+    return compiled
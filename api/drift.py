@@ -0,0 +1,122 @@
+import time
+from bisect import bisect_right
+from collections import Counter
+import numpy as np
+from src.drift import psi,ks
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# PSI rule of thumb: below 0.1 no significant shift, 0.1-0.25 moderate shift.
+PSI_STABLE = 0.1
+
+
+class DriftMonitor:
+    # Served traffic counted into the bins of the training reference profile
+    # (src/drift.py). Each record costs one bisect per feature and a list
+    # increment, and memory is fixed by the profile's bins. The counts belong to
+    # the event loop: request handlers observe and the periodic evaluation reads
+    # and resets them on the loop thread, so they need no lock.
+
+    def __init__(self,profile:dict,min_count:int = 200,psi_threshold:float = 0.25):
+        self.profile = profile
+        self.min_count = min_count
+        self.psi_threshold = psi_threshold
+        # (api field, column, edges) in profile order
+        self.features = [(f['field'],name,f['edges']) for name,f in profile['features'].items()]
+        self.reference = {name : np.asarray(f['counts'],dtype=np.float64) for name,f in profile['features'].items()}
+        self.classes = list(profile['predictions']['classes'])
+        self.class_index = {label : i for i,label in enumerate(self.classes)}
+        # Labels the training split never had are counted in one extra slot.
+        self.reference['prediction'] = np.append(np.asarray(profile['predictions']['counts'],dtype=np.float64),0)
+        self.started_at = time.time()
+        self.total = self._empty()
+        self.window = self._empty()
+        self.window_started_at = self.started_at
+        self.last_window = None
+        self.windows = 0
+
+    def _empty(self):
+        counts = {name : [0] * (len(edges) + 1) for _,name,edges in self.features}
+        counts['prediction'] = [0] * (len(self.classes) + 1)
+        return counts
+
+    def observe(self,record,label):
+        window,total = self.window,self.total
+        for field,name,edges in self.features:
+            i = bisect_right(edges,getattr(record,field))
+            window[name][i] += 1
+            total[name][i] += 1
+        i = self.class_index.get(str(label),len(self.classes))
+        window['prediction'][i] += 1
+        total['prediction'][i] += 1
+
+    def observe_batch(self,columns:dict,labels):
+        # columns as built by records_to_columns, so a batch reuses the arrays it
+        # was scored from.
+        for _,name,edges in self.features:
+            counts = np.bincount(np.searchsorted(edges,columns[name],side='right'),minlength=len(edges) + 1)
+            self._add(name,enumerate(counts.tolist()))
+        other = len(self.classes)
+        self._add('prediction',[(self.class_index.get(str(label),other),count) for label,count in Counter(labels).items()])
+
+    def _add(self,name:str,counts):
+        # counts: (bin, count) pairs
+        window,total = self.window[name],self.total[name]
+        for i,count in counts:
+            window[i] += count
+            total[i] += count
+
+    def _status(self,value:float):
+        if value < PSI_STABLE:
+            return 'stable'
+        return 'moderate' if value < self.psi_threshold else 'drift'
+
+    def compare(self,counts:dict):
+        n = sum(counts['prediction'])
+        report = {'records' : n,'sufficient' : n >= self.min_count,'features' : {},'prediction' : None,
+                  'drifted_features' : [],'prediction_drift' : False}
+        if n == 0:
+            return report
+        for name,live in counts.items():
+            value = psi(self.reference[name],live)
+            stats = {'psi' : round(value,6),'ks' : round(ks(self.reference[name],live),6),'status' : self._status(value)}
+            if name == 'prediction':
+                stats['classes'] = self.classes + ['other']
+                stats['counts'] = list(live)
+                report['prediction'] = stats
+            else:
+                report['features'][name] = stats
+        report['drifted_features'] = [name for name,stats in report['features'].items() if stats['status'] == 'drift']
+        report['prediction_drift'] = report['prediction']['status'] == 'drift'
+        return report
+
+    def evaluate(self):
+        # Closes the current window once it has min_count records; a quieter window
+        # keeps accumulating so the statistics are never computed on a handful of
+        # requests.
+        now = time.time()
+        if sum(self.window['prediction']) < self.min_count:
+            return None
+        report = self.compare(self.window)
+        report['started_at'] = self.window_started_at
+        report['ended_at'] = now
+        self.last_window = report
+        self.windows += 1
+        self.window = self._empty()
+        self.window_started_at = now
+        if report['drifted_features'] or report['prediction_drift']:
+            logger.warning('Drift in the last %s records : features %s, predictions %s (PSI %.3f)',
+                           report['records'],report['drifted_features'],report['prediction']['status'],report['prediction']['psi'])
+        return report
+
+    def report(self):
+        return {
+            'reference' : {'rows' : self.profile['rows'],'created_at' : self.profile['created_at']},
+            'min_count' : self.min_count,
+            'psi_threshold' : self.psi_threshold,
+            'windows' : self.windows,
+            'last_window' : self.last_window,
+            'current_window' : {'started_at' : self.window_started_at,'records' : sum(self.window['prediction'])},
+            'since_start' : {'started_at' : self.started_at,**self.compare(self.total)},
+        }
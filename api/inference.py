@@ -0,0 +1,158 @@
+import json
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+from src.features import FEATURE_SPEC
+
+# UserInput field -> column name the preprocessing pipeline was fitted on
+NUMERIC_FIELDS = FEATURE_SPEC.numeric_fields
+BOOL_FIELDS = FEATURE_SPEC.binary_fields
+FEATURE_COLUMNS = FEATURE_SPEC.columns
+NDJSON_CONTENT_TYPES = ('application/x-ndjson','application/ndjson','application/jsonl','application/x-jsonlines')
+
+
+def parse_batch_body(body:bytes,content_type:str):
+    # Returns a list of (item, error) pairs so that a single malformed NDJSON line
+    # is reported against its own index instead of rejecting the whole batch.
+    media_type = content_type.split(';')[0].strip().lower()
+    if media_type in NDJSON_CONTENT_TYPES:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append((json.loads(line),None))
+            except json.JSONDecodeError as e:
+                items.append((None,f'Invalid JSON line: {e}'))
+        return items
+
+    payload = json.loads(body)
+    if isinstance(payload,dict) and 'records' in payload:
+        payload = payload['records']
+    if not isinstance(payload,list):
+        raise ValueError('Batch body must be a JSON array of records or NDJSON')
+    return [(item,None) for item in payload]
+
+
+def validate_records(items,model_cls):
+    records = []
+    indices = []
+    errors = []
+    for index,(item,parse_error) in enumerate(items):
+        if parse_error is not None:
+            errors.append({'index' : index, 'errors' : [{'type' : 'json_invalid', 'msg' : parse_error}]})
+            continue
+        try:
+            records.append(model_cls.model_validate(item))
+            indices.append(index)
+        except ValidationError as e:
+            errors.append({'index' : index, 'errors' : json.loads(e.json(include_url=False))})
+    return records,indices,errors
+
+
+class SharedFeatures:
+    # The raw columns of one request or micro-batch plus whatever the scorers
+    # derive from them. Scorers that apply the same preprocessing (the primary,
+    # ensemble members, shadow models) build the encoded columns and the scaled
+    # matrix once: the first one computes them and the others look them up.
+
+    __slots__ = ('columns','_derived')
+
+    def __init__(self,columns:dict):
+        self.columns = columns
+        self._derived = {}
+
+    @classmethod
+    def from_records(cls,records):
+        return cls(records_to_columns(records))
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def get(self,key,build):
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = build()
+        return value
+
+
+def records_to_columns(records):
+    n = len(records)
+    columns = {}
+    for field,column in NUMERIC_FIELDS.items():
+        columns[column] = np.fromiter((getattr(r,field) for r in records),dtype=np.float64,count=n)
+    for field,column in BOOL_FIELDS.items():
+        columns[column] = np.fromiter((getattr(r,field) for r in records),dtype=bool,count=n)
+    return columns
+
+
+def columns_to_frame(columns,feature_spec = FEATURE_SPEC):
+    return feature_spec.to_frame(feature_spec.encode(columns))
+
+
+def records_to_frame(records):
+    return columns_to_frame(records_to_columns(records))
+
+
+def field_bounds(model_cls):
+    bounds = {}
+    for field,info in model_cls.model_fields.items():
+        if info.annotation is bool:
+            bounds[field] = (0,1)
+            continue
+        lo = next(m.ge for m in info.metadata if hasattr(m,'ge'))
+        hi = next(m.le for m in info.metadata if hasattr(m,'le'))
+        bounds[field] = (lo,hi)
+    return bounds
+
+
+def grid_columns(bounds,start:int,stop:int):
+    # Rows start..stop of the full input space enumerated in mixed-radix order
+    # over the fields of `bounds` (last field varies fastest).
+    shape = tuple(hi - lo + 1 for lo,hi in bounds.values())
+    values = np.unravel_index(np.arange(start,stop),shape)
+    columns = {}
+    for (field,(lo,_)),value in zip(bounds.items(),values):
+        if field in NUMERIC_FIELDS:
+            columns[NUMERIC_FIELDS[field]] = (value + lo).astype(np.float64)
+        else:
+            columns[BOOL_FIELDS[field]] = (value + lo).astype(bool)
+    return columns
+
+
+def sample_records(model_cls,n:int,seed:int = 0):
+    # Corners of the input space plus a seeded uniform sample, used to check that
+    # alternative scoring paths agree with the sklearn one.
+    rng = np.random.default_rng(seed)
+    bounds = field_bounds(model_cls)
+    rows = [{f : lo for f,(lo,hi) in bounds.items()},{f : hi for f,(lo,hi) in bounds.items()}]
+    for _ in range(max(n - len(rows),0)):
+        rows.append({f : int(rng.integers(lo,hi + 1)) for f,(lo,hi) in bounds.items()})
+    return [model_cls.model_validate(row) for row in rows]
+
+
+def predict_labels(records,preprocessing_pipeline,model,label_encoder):
+    if not records:
+        return np.array([],dtype=object)
+    return predict_frame_labels(records_to_frame(records),preprocessing_pipeline,model,label_encoder)
+
+
+def transform_frame(df,preprocessing_pipeline,model):
+    processed = preprocessing_pipeline.transform(df)
+    if hasattr(model,'feature_names_in_'):
+        # Models trained on the named train set expect the same column names.
+        processed = pd.DataFrame(processed,columns=model.feature_names_in_)
+    return processed
+
+
+def predict_frame_labels(df,preprocessing_pipeline,model,label_encoder,timer = None):
+    processed = transform_frame(df,preprocessing_pipeline,model)
+    if timer is not None:
+        timer.lap('transform')
+    pred = model.predict(processed)
+    if timer is not None:
+        timer.lap('predict')
+    labels = label_encoder.inverse_transform(pred)
+    if timer is not None:
+        timer.lap('inverse_transform')
+    return labels
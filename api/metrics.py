@@ -0,0 +1,227 @@
+import bisect
+import threading
+import time
+from api.settings import settings
+
+# Minimal Prometheus text-format (0.0.4) metrics. Observations are a bisect and a
+# few integer adds under a per-metric lock, so they are cheap enough to leave on;
+# with METRICS_ENABLED=0 every metric is replaced by a no-op.
+
+LATENCY_BUCKETS = (0.00005,0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1.0,2.5)
+
+
+def _escape(value):
+    # Label value escaping of the text format: backslash, double quote and newline.
+    return str(value).replace('\\','\\\\').replace('"','\\"').replace('\n','\\n')
+
+
+def _format_labels(names,values,extra:str = ''):
+    pairs = [f'{name}="{_escape(value)}"' for name,value in zip(names,values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self,name:str,help:str,labelnames:tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        # An unlabelled series is exported as 0 before its first update.
+        self._values = {} if labelnames else {() : 0}
+        self._lock = threading.Lock()
+
+    def inc(self,*labels,amount:float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels,0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels,value in values.items():
+            yield f'{self.name}{_format_labels(self.labelnames,labels)} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self,*labels,value:float):
+        with self._lock:
+            self._values[labels] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self,name:str,help:str,labelnames:tuple = (),buckets:tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self,*labels,value:float):
+        index = bisect.bisect_left(self.buckets,value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1),0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels : (list(counts),total) for labels,(counts,total) in self._series.items()}
+        for labels,(counts,total) in series.items():
+            cumulative = 0
+            for bound,count in zip(self.buckets + ('+Inf',),counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                yield f'{self.name}_bucket{_format_labels(self.labelnames,labels,le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames,labels)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labelnames,labels)} {cumulative}'
+
+
+class _NoOp:
+    def inc(self,*labels,amount:float = 1):
+        pass
+
+    def set(self,*labels,value:float):
+        pass
+
+    def observe(self,*labels,value:float):
+        pass
+
+    def clear(self):
+        pass
+
+
+class Registry:
+
+    def __init__(self,enabled:bool = True):
+        self.enabled = enabled
+        self._metrics = []
+        self._collectors = []
+
+    def _add(self,metric):
+        if not self.enabled:
+            return _NoOp()
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self,name:str,help:str,labelnames:tuple = ()):
+        return self._add(Counter(name,help,labelnames))
+
+    def gauge(self,name:str,help:str,labelnames:tuple = ()):
+        return self._add(Gauge(name,help,labelnames))
+
+    def histogram(self,name:str,help:str,labelnames:tuple = (),buckets:tuple = LATENCY_BUCKETS):
+        return self._add(Histogram(name,help,labelnames,buckets))
+
+    def add_collector(self,fn):
+        # fn() runs at scrape time to refresh gauges from state kept elsewhere.
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    # Times consecutive stages of one scoring call with a single perf_counter()
+    # per boundary: t = StageTimer(); ...; t.lap('transform'); ...; t.lap('predict')
+
+    __slots__ = ('last',)
+
+    def __init__(self):
+        self.last = time.perf_counter()
+
+    def lap(self,stage:str):
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(stage,value=now - self.last)
+        self.last = now
+
+
+class _NoOpTimer:
+    __slots__ = ()
+
+    def lap(self,stage:str):
+        pass
+
+
+class MetricsMiddleware:
+    # Plain ASGI middleware: times each HTTP request and counts it by route template
+    # and status. Starlette's @app.middleware('http') wrapper streams every response
+    # through an extra task and costs far more than the metrics themselves.
+
+    def __init__(self,app):
+        self.app = app
+
+    async def __call__(self,scope,receive,send):
+        if scope['type'] != 'http':
+            return await self.app(scope,receive,send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope,receive,send_wrapper)
+        finally:
+            # Route templates keep the label set bounded; requests that matched no
+            # route (404, 405, failures before routing) share one label.
+            path = getattr(scope.get('route'),'path',None) or 'unmatched'
+            METRICS['request_seconds'].observe(scope['method'],path,value=time.perf_counter() - start)
+            METRICS['requests'].inc(scope['method'],path,status)
+            if status >= 400:
+                METRICS['errors'].inc(path,status)
+
+
+def _build(enabled:bool):
+    registry = Registry(enabled)
+    metrics = {
+        'stage_seconds' : registry.histogram('predict_stage_seconds','Time spent per scoring stage and call',('stage',)),
+        'request_seconds' : registry.histogram('http_request_duration_seconds','HTTP request latency',('method','path')),
+        'requests' : registry.counter('http_requests_total','HTTP requests by status',('method','path','status')),
+        'errors' : registry.counter('http_errors_total','HTTP responses with status >= 400 or unhandled exceptions',('path','status')),
+        'predictions' : registry.counter('predictions_total','Predicted labels',('label','source')),
+        'model_info' : registry.gauge('model_info','Currently served model version',('model_name','version','scorer')),
+        'model_loaded' : registry.gauge('model_loaded_timestamp_seconds','Unix time the served model was loaded'),
+        'model_reloads' : registry.counter('model_reloads_total','Model hot swaps since start'),
+        'cache' : registry.gauge('prediction_cache','Prediction cache counters for the served model version',('stat',)),
+        'batcher' : registry.gauge('micro_batcher','Micro-batcher queue and batch counters',('stat',)),
+        'shadow_seconds' : registry.histogram('shadow_predict_seconds','Time a shadow model spent scoring one batch',('version',)),
+        'shadow_records' : registry.counter('shadow_records_total','Records scored by shadow models, by agreement with the served model',('version','outcome')),
+        'shadow_errors' : registry.counter('shadow_errors_total','Shadow scoring failures',('version',)),
+        'shadow_dropped' : registry.counter('shadow_dropped_batches_total','Batches not shadow-scored because the queue was full'),
+        'shadow_pending' : registry.gauge('shadow_pending_batches','Batches waiting for or in shadow scoring'),
+        'model_bytes' : registry.gauge('model_array_bytes','Size of each loaded model\'s parameters',('role','version')),
+        'drift_psi' : registry.gauge('drift_psi','Population stability index of the last drift window against the training profile',('feature',)),
+        'drift_ks' : registry.gauge('drift_ks','Largest CDF gap of the last drift window against the training profile',('feature',)),
+    }
+    return registry,metrics
+
+
+REGISTRY,METRICS = _build(settings.metrics_enabled)
+STAGE_SECONDS = METRICS['stage_seconds']
+stage_timer = StageTimer if settings.metrics_enabled else _NoOpTimer
+# For scoring that must not count towards the request stages (shadow models).
+SILENT_TIMER = _NoOpTimer()
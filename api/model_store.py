@@ -0,0 +1,361 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any
+import joblib
+import numpy as np
+from src.model_bundle import extract_arrays,verify_arrays,write_array_bundle
+from src.drift import REFERENCE_PROFILE_FILE,load_profile,save_profile
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_FILE = 'model.pkl'
+PIPELINE_FILE = 'preprocessing_pipeline.pkl'
+ENCODER_FILE = 'label_encoder.pkl'
+MANIFEST_FILE = 'manifest.json'
+ARRAY_DIR = 'arrays'
+
+
+class ChecksumError(RuntimeError):
+    pass
+
+
+@dataclass
+class ModelBundle:
+    model_name : str
+    version : str
+    model : Any
+    preprocessing_pipeline : Any
+    label_encoder : Any
+    source : str
+    array_dir : str = None
+    # Training distribution for drift monitoring; None for artifacts built before it existed.
+    reference_profile : dict = None
+
+
+def load_reference_profile(directory:str):
+    path = os.path.join(directory,REFERENCE_PROFILE_FILE)
+    return load_profile(path) if os.path.exists(path) else None
+
+
+def sha256_file(path:str):
+    digest = hashlib.sha256()
+    with open(path,'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024),b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path:str,text:str):
+    directory = os.path.dirname(path)
+    os.makedirs(directory,exist_ok=True)
+    fd,tmp_path = tempfile.mkstemp(dir=directory,prefix='.tmp-')
+    with os.fdopen(fd,'w') as f:
+        f.write(text)
+    os.replace(tmp_path,path)
+
+
+class LocalModelStore:
+    # Filesystem layout:
+    #   <root>/<model_name>/versions/<version>/{model.pkl, preprocessing_pipeline.pkl, label_encoder.pkl, reference_profile.json, manifest.json}
+    #   <root>/<model_name>/versions/<version>/arrays/   -> optional mmap-able array bundle (src.model_bundle)
+    #   <root>/<model_name>/stages/<stage>      -> text file holding the version
+    name = 'local'
+
+    def __init__(self,root:str):
+        self.root = root
+
+    def version_dir(self,model_name:str,version):
+        return os.path.join(self.root,model_name,'versions',str(version))
+
+    def stage_path(self,model_name:str,stage:str):
+        return os.path.join(self.root,model_name,'stages',stage)
+
+    def latest_version(self,model_name:str,stage:str = 'Production'):
+        try:
+            with open(self.stage_path(model_name,stage)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_stage(self,model_name:str,stage:str,version):
+        _write_atomic(self.stage_path(model_name,stage),f'{version}\n')
+
+    def stage_age(self,model_name:str,stage:str):
+        try:
+            return time.time() - os.path.getmtime(self.stage_path(model_name,stage))
+        except FileNotFoundError:
+            return None
+
+    def has_version(self,model_name:str,version):
+        return os.path.isfile(os.path.join(self.version_dir(model_name,version),MANIFEST_FILE))
+
+    def verify(self,model_name:str,version):
+        version_dir = self.version_dir(model_name,version)
+        with open(os.path.join(version_dir,MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        for filename,checksum in manifest['files'].items():
+            actual = sha256_file(os.path.join(version_dir,filename))
+            if actual != checksum:
+                raise ChecksumError(f'Checksum mismatch for {model_name} v{version}/{filename}')
+        return manifest
+
+    def load(self,model_name:str,version,prefer_arrays:bool = True):
+        # With a verified array bundle present the pickled estimator is not
+        # deserialized at all; the API memory-maps the arrays instead.
+        manifest = self.verify(model_name,version)
+        version_dir = self.version_dir(model_name,version)
+        array_dir = os.path.join(version_dir,ARRAY_DIR)
+        use_arrays = prefer_arrays and manifest.get('arrays_verified',False)
+        return ModelBundle(
+            model_name=model_name,
+            version=str(version),
+            model=None if use_arrays else joblib.load(os.path.join(version_dir,MODEL_FILE)),
+            preprocessing_pipeline=joblib.load(os.path.join(version_dir,PIPELINE_FILE)),
+            label_encoder=joblib.load(os.path.join(version_dir,ENCODER_FILE)),
+            source=self.name,
+            array_dir=array_dir if use_arrays else None,
+            reference_profile=load_reference_profile(version_dir)
+        )
+
+    def _write_arrays(self,bundle:ModelBundle,tmp_dir:str):
+        target = os.path.join(tmp_dir,ARRAY_DIR)
+        if bundle.array_dir:
+            shutil.copytree(bundle.array_dir,target)
+            with open(os.path.join(target,'manifest.json')) as f:
+                return json.load(f).get('verified',False)
+        try:
+            arrays,manifest = extract_arrays(bundle.preprocessing_pipeline,bundle.model,bundle.label_encoder)
+        except NotImplementedError as e:
+            logger.warning('No array bundle for %s v%s : %s',bundle.model_name,bundle.version,e)
+            return False
+        # No training data here, so check the estimator part on random points of the
+        # standardized feature space.
+        X = np.random.default_rng(0).standard_normal((2000,bundle.model.n_features_in_))
+        manifest['verified'] = verify_arrays(arrays,manifest,bundle.model,X) == 0
+        write_array_bundle(target,arrays,manifest)
+        return manifest['verified']
+
+    def save(self,bundle:ModelBundle,stage:str = None):
+        # Written into a temporary directory and renamed into place, so readers never
+        # see a half-written version.
+        versions_dir = os.path.dirname(self.version_dir(bundle.model_name,bundle.version))
+        os.makedirs(versions_dir,exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=versions_dir,prefix='.tmp-')
+        os.chmod(tmp_dir,0o755)
+        try:
+            joblib.dump(bundle.model,os.path.join(tmp_dir,MODEL_FILE))
+            joblib.dump(bundle.preprocessing_pipeline,os.path.join(tmp_dir,PIPELINE_FILE))
+            joblib.dump(bundle.label_encoder,os.path.join(tmp_dir,ENCODER_FILE))
+            arrays_verified = self._write_arrays(bundle,tmp_dir)
+            files = [MODEL_FILE,PIPELINE_FILE,ENCODER_FILE]
+            if bundle.reference_profile is not None:
+                save_profile(bundle.reference_profile,os.path.join(tmp_dir,REFERENCE_PROFILE_FILE))
+                files.append(REFERENCE_PROFILE_FILE)
+            if os.path.isdir(os.path.join(tmp_dir,ARRAY_DIR)):
+                files += [os.path.join(ARRAY_DIR,name) for name in sorted(os.listdir(os.path.join(tmp_dir,ARRAY_DIR)))]
+            manifest = {
+                'model_name' : bundle.model_name,
+                'version' : str(bundle.version),
+                'source' : bundle.source,
+                'created_at' : time.time(),
+                'arrays_verified' : arrays_verified,
+                'files' : {name : sha256_file(os.path.join(tmp_dir,name)) for name in files}
+            }
+            with open(os.path.join(tmp_dir,MANIFEST_FILE),'w') as f:
+                json.dump(manifest,f,indent=4)
+            target_dir = self.version_dir(bundle.model_name,bundle.version)
+            if os.path.isdir(target_dir):
+                shutil.rmtree(target_dir)
+            os.replace(tmp_dir,target_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir,ignore_errors=True)
+            raise
+        if stage:
+            self.set_stage(bundle.model_name,stage,bundle.version)
+
+
+def configure_mlflow():
+    # TRACKING_BACKEND=file|sqlite points the API at a local MLflow store instead of DagsHub.
+    from src.tracking import configure_tracking
+    configure_tracking()
+
+
+def get_latest_model_version(model_name,stage:str = 'Production',unstaged_fallback:bool = True):
+    # unstaged_fallback: an empty stage falls back to the newest unstaged version
+    # (the served model's behaviour; ensemble and shadow refs must not).
+    import mlflow
+
+    client = mlflow.MlflowClient()
+    latest = client.get_latest_versions(model_name,stages=[stage])
+    if not latest and unstaged_fallback:
+        latest = client.get_latest_versions(model_name,stages=['None'])
+    return latest[0].version if latest else None
+
+
+class MlflowRegistrySource:
+    # The registry only holds the estimator; the preprocessing pipeline and label
+    # encoder come from the DVC-tracked artifacts directory, as before.
+    name = 'mlflow'
+
+    def __init__(self,artifacts_dir:str = './local_Storage/models'):
+        self.artifacts_dir = artifacts_dir
+        self._configured = False
+
+    def _configure(self):
+        if not self._configured:
+            configure_mlflow()
+            self._configured = True
+
+    def latest_version(self,model_name:str,stage:str = 'Production',unstaged_fallback:bool = True):
+        self._configure()
+        return get_latest_model_version(model_name,stage,unstaged_fallback)
+
+    def load(self,model_name:str,version):
+        self._configure()
+        import mlflow.sklearn
+
+        model_uri = f'models:/{model_name}/{version}'
+        logger.info('Loading model from %s',model_uri)
+        return ModelBundle(
+            model_name=model_name,
+            version=str(version),
+            model=mlflow.sklearn.load_model(model_uri),
+            preprocessing_pipeline=joblib.load(os.path.join(self.artifacts_dir,PIPELINE_FILE)),
+            label_encoder=joblib.load(os.path.join(self.artifacts_dir,ENCODER_FILE)),
+            source=self.name,
+            reference_profile=load_reference_profile(self.artifacts_dir)
+        )
+
+
+def load_bundle(model_name:str,stage:str,source:str,store_dir:str,max_age_s:float,artifacts_dir:str = './local_Storage/models',prefer_arrays:bool = True,unstaged_fallback:bool = True):
+    # source='local'  : only the local store is used (air-gapped pods)
+    # source='mlflow' : always resolve the version against the remote registry
+    # source='auto'   : use the local copy unless it is missing, corrupt or older
+    #                   than max_age_s, and only then ask the remote registry
+    store = LocalModelStore(store_dir)
+    local_version = store.latest_version(model_name,stage)
+
+    if source == 'local':
+        if local_version is None:
+            raise RuntimeError(f"No {stage} version of {model_name} in local model store {store_dir}")
+        return store.load(model_name,local_version,prefer_arrays)
+
+    if source == 'auto' and local_version is not None:
+        age = store.stage_age(model_name,stage)
+        if not max_age_s or age <= max_age_s:
+            try:
+                return store.load(model_name,local_version,prefer_arrays)
+            except (ChecksumError,OSError) as e:
+                logger.warning('Local model bundle unusable, fetching from registry : %s',e)
+                local_version = None
+
+    remote = MlflowRegistrySource(artifacts_dir)
+    try:
+        remote_version = remote.latest_version(model_name,stage,unstaged_fallback)
+    except Exception as e:
+        if local_version is None:
+            raise
+        logger.warning('Model registry unreachable, serving stale local version %s : %s',local_version,e)
+        return store.load(model_name,local_version,prefer_arrays)
+
+    if not remote_version:
+        if local_version is not None:
+            return store.load(model_name,local_version,prefer_arrays)
+        raise RuntimeError(f"No versions found for model: {model_name}")
+
+    return fetch_bundle(model_name,remote_version,stage,store,remote,prefer_arrays)
+
+
+def fetch_bundle(model_name:str,version,stage:str,store:LocalModelStore,remote:MlflowRegistrySource = None,prefer_arrays:bool = True):
+    # Loads `version` from the local store, downloading it from the registry first
+    # when it is not there (or fails its checksum), and moves the stage pointer
+    # unless stage is None.
+    if store.has_version(model_name,version):
+        try:
+            bundle = store.load(model_name,version,prefer_arrays)
+            if stage:
+                store.set_stage(model_name,stage,version)
+            return bundle
+        except ChecksumError as e:
+            if remote is None:
+                raise
+            logger.warning('Re-fetching corrupt local bundle : %s',e)
+    if remote is None:
+        raise RuntimeError(f"Version {version} of {model_name} not found in local model store {store.root}")
+
+    bundle = remote.load(model_name,version)
+    store.save(bundle,stage=stage)
+    logger.info('Cached %s v%s in local model store %s',model_name,version,store.root)
+    return bundle
+
+
+def load_model_ref(model_name:str,ref:str,source:str,store_dir:str,max_age_s:float,artifacts_dir:str = './local_Storage/models',prefer_arrays:bool = True):
+    # ref is a version number ('7') or a stage name ('Staging'). Loading a version
+    # leaves every stage pointer alone.
+    if str(ref).isdigit():
+        remote = None if source == 'local' else MlflowRegistrySource(artifacts_dir)
+        return fetch_bundle(model_name,str(ref),None,LocalModelStore(store_dir),remote,prefer_arrays)
+    # A stage with no version is an error here: falling back to an unstaged
+    # version would compare or vote with a model nobody picked.
+    try:
+        return load_bundle(model_name,ref,source,store_dir,max_age_s,artifacts_dir,prefer_arrays,unstaged_fallback=False)
+    except RuntimeError as e:
+        logger.error('Cannot load %s of %s : %s',ref,model_name,e)
+        raise
+
+
+def resolve_version(model_name:str,stage:str,source:str,store_dir:str,artifacts_dir:str = './local_Storage/models'):
+    # Version that should currently be served for `stage`; used by the reload watcher.
+    store = LocalModelStore(store_dir)
+    if source == 'local':
+        return store.latest_version(model_name,stage),None
+    remote = MlflowRegistrySource(artifacts_dir)
+    try:
+        return remote.latest_version(model_name,stage),remote
+    except Exception as e:
+        logger.warning('Model registry unreachable, using local %s pointer : %s',stage,e)
+        return store.latest_version(model_name,stage),None
+
+
+def publish_artifacts(artifacts_dir:str,store_dir:str,model_name:str,version,stage:str):
+    with open(os.path.join(artifacts_dir,'trained_model.pkl'),'rb') as f:
+        model = pickle.load(f)
+    bundle = ModelBundle(
+        model_name=model_name,
+        version=str(version),
+        model=model,
+        preprocessing_pipeline=joblib.load(os.path.join(artifacts_dir,PIPELINE_FILE)),
+        label_encoder=joblib.load(os.path.join(artifacts_dir,ENCODER_FILE)),
+        source='local_artifacts',
+        reference_profile=load_reference_profile(artifacts_dir)
+    )
+    bundle_dir = os.path.join(artifacts_dir,'model_bundle')
+    if os.path.isdir(bundle_dir):
+        bundle.array_dir = bundle_dir
+    LocalModelStore(store_dir).save(bundle,stage=stage)
+    return bundle
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Publish local training artifacts into the local model store')
+    parser.add_argument('--version',required=True)
+    parser.add_argument('--model-name',default=os.getenv('MODEL_NAME','my_model'))
+    parser.add_argument('--stage',default=os.getenv('MODEL_STAGE','Production'))
+    parser.add_argument('--store-dir',default=os.getenv('MODEL_STORE_DIR','./local_Storage/model_store'))
+    parser.add_argument('--artifacts-dir',default='./local_Storage/models')
+    args = parser.parse_args()
+
+    publish_artifacts(args.artifacts_dir,args.store_dir,args.model_name,args.version,args.stage)
+    logger.info('Published %s v%s to %s (%s)',args.model_name,args.version,args.store_dir,args.stage)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import asyncio
+import functools
+import time
+import numpy as np
+from dataclasses import dataclass,field
+from typing import Any
+from api.cache import PredictionCache
+from api.compiled import CompiledScorer,VotingScorer,build_scorer,scorer_nbytes
+from api.drift import DriftMonitor
+from api.inference import SharedFeatures,sample_records
+from api.metrics import METRICS,stage_timer
+from api.model_store import LocalModelStore,fetch_bundle,load_model_ref,resolve_version
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ServingModel:
+    # Everything a request needs, swapped as one object so a request that grabbed
+    # the previous ServingModel finishes on it undisturbed.
+    bundle : Any
+    scorer : Any
+    cache : Any = None
+    loaded_at : float = field(default_factory=time.time)
+    # Other ServingModels soft-voting with this one (fixed at startup).
+    members : tuple = ()
+    shadow : Any = None
+    # Responses carry class probabilities (the scorer has them and they are enabled).
+    probabilities : bool = False
+    # Served traffic against the training profile; counts start over with each version.
+    drift : Any = None
+
+    @property
+    def version(self):
+        if not self.members:
+            return self.bundle.version
+        return '+'.join([self.bundle.version] + [member.version for member in self.members])
+
+    @functools.cached_property
+    def nbytes(self):
+        # This model's own parameters, excluding ensemble members.
+        scorer = self.scorer.scorers[0] if isinstance(self.scorer,VotingScorer) else self.scorer
+        return scorer_nbytes(scorer)
+
+    @functools.cached_property
+    def classes(self):
+        # Column order of the probabilities.
+        return [str(label) for label in self.scorer.labels]
+
+    def predict_records(self,records):
+        # (labels, probabilities); probabilities is None unless self.probabilities.
+        if not records:
+            return np.array([],dtype=object),None
+        # feature_build covers records_to_columns as well.
+        timer = stage_timer()
+        return self.predict_features(SharedFeatures.from_records(records),timer)
+
+    def predict_features(self,features,timer):
+        if self.probabilities:
+            labels,proba = self.scorer.predict_with_proba(features,timer)
+        else:
+            labels,proba = self.scorer.predict_features(features,timer),None
+        if self.shadow is not None:
+            self.shadow.submit(features,labels,self.version)
+        return labels,proba
+
+
+def bundle_scorer(bundle,model_cls):
+    if bundle.array_dir:
+        # Arrays were verified against the estimator when the bundle was written.
+        return CompiledScorer.from_bundle(bundle.array_dir,mmap=True)
+    return build_scorer(bundle.preprocessing_pipeline,bundle.model,bundle.label_encoder,model_cls)
+
+
+def load_models(refs,model_cls,settings):
+    # Ensemble members and shadow models: versions ('7') or stages ('Staging') of
+    # the configured model, loaded once at startup without moving stage pointers.
+    models = []
+    for ref in refs:
+        bundle = load_model_ref(settings.model_name,ref,settings.model_source,settings.model_store_dir,
+                                settings.model_store_max_age_s,prefer_arrays=settings.model_format != 'pickle')
+        models.append(ServingModel(bundle=bundle,scorer=bundle_scorer(bundle,model_cls)))
+        logger.info('Loaded %s v%s (%s) with the %s scorer',bundle.model_name,bundle.version,ref,models[-1].scorer.name)
+    return tuple(models)
+
+
+def build_serving_model(bundle,model_cls,settings,warmup_size:int = 256,members:tuple = (),shadow = None):
+    scorer = bundle_scorer(bundle,model_cls)
+    if members:
+        scorer = VotingScorer([scorer] + [member.scorer for member in members],settings.ensemble_weights)
+    probabilities = settings.return_probabilities and scorer.has_probabilities
+    logger.info('Serving %s v%s with the %s scorer%s',bundle.model_name,bundle.version,scorer.name,' and probabilities' if probabilities else '')
+
+    cache = None
+    if settings.prediction_cache != 'off':
+        cache = PredictionCache(
+            model_cls,
+            mode=settings.prediction_cache,
+            max_size=settings.prediction_cache_size,
+            ttl_s=settings.prediction_cache_ttl_s,
+            table_max_entries=settings.prediction_table_max_entries
+        )
+        cache.bind(ServingModel(bundle,scorer,members=members).version,scorer,probabilities)
+
+    drift = None
+    if settings.drift_enabled and bundle.reference_profile is not None:
+        drift = DriftMonitor(bundle.reference_profile,settings.drift_min_count,settings.drift_psi_threshold)
+
+    if warmup_size:
+        scorer.predict_records(sample_records(model_cls,warmup_size,seed=1))
+    return ServingModel(bundle=bundle,scorer=scorer,cache=cache,members=members,shadow=shadow,probabilities=probabilities,drift=drift)
+
+
+class ModelReloader:
+    # Polls for a new version of the configured stage and swaps it in. All loading,
+    # self-checking and warmup happens in a worker thread; the swap itself is a
+    # single attribute assignment on app.state.
+
+    def __init__(self,state,model_cls,settings):
+        self.state = state
+        self.model_cls = model_cls
+        self.settings = settings
+        self.interval_s = settings.model_reload_interval_s
+        self._lock = asyncio.Lock()
+        self._task = None
+        self.last_check = None
+        self.last_error = None
+        self.reloads = 0
+
+    async def start(self):
+        if self.interval_s > 0:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error('Model reload check failed : %s',e)
+
+    def _load(self,version,remote):
+        s = self.settings
+        store = LocalModelStore(s.model_store_dir)
+        bundle = fetch_bundle(s.model_name,version,s.model_stage,store,remote,s.model_format != 'pickle')
+        active = self.state.active
+        return build_serving_model(bundle,self.model_cls,s,members=active.members,shadow=active.shadow)
+
+    async def check(self,force:bool = False):
+        async with self._lock:
+            s = self.settings
+            self.last_check = time.time()
+            current = self.state.active.bundle.version
+            try:
+                version,remote = await asyncio.to_thread(
+                    resolve_version,s.model_name,s.model_stage,s.model_source,s.model_store_dir
+                )
+                if version is None or (str(version) == current and not force):
+                    return {'reloaded' : False, 'model_version' : current}
+                serving_model = await asyncio.to_thread(self._load,version,remote)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+
+            self.state.active = serving_model
+            self.reloads += 1
+            METRICS['model_reloads'].inc()
+            self.last_error = None
+            logger.info('Swapped model v%s -> v%s',current,serving_model.version)
+            return {'reloaded' : True, 'previous_version' : current, 'model_version' : serving_model.version}
+
+    def stats(self):
+        return {
+            'interval_s' : self.interval_s,
+            'last_check' : self.last_check,
+            'last_error' : self.last_error,
+            'reloads' : self.reloads,
+        }
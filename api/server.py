@@ -0,0 +1,337 @@
+import argparse
+import asyncio
+import gc
+import math
+import os
+import random
+import signal
+import socket
+import time
+import uvicorn
+from api.settings import settings
+from config.logging_config import get_logger,restart_listeners,stop_listeners
+
+logger = get_logger(__name__)
+
+# Production entry point with preloaded, copy-on-write shared model state.
+#
+#   python -m api.server --host 0.0.0.0 --port 8000 --workers 4
+#
+# The master process loads and warms the model once (primary, ensemble members,
+# shadow models and, with PREDICTION_CACHE=table, the prediction table), then
+# forks the workers, which serve api.app:app on one shared listening socket. The
+# model arrays, pipelines and table are shared copy-on-write, where
+# `uvicorn --workers N` loads N private copies and contacts the registry N times.
+# Each worker still starts its own batcher, shadow threads and log listener.
+#
+# Signals to the master:
+#   SIGTERM, SIGINT  graceful shutdown; workers finish in-flight requests
+#   SIGHUP           reload the model (even if the version is unchanged) and replace every worker
+#   SIGUSR1          check the registry for a new version now
+#
+# The master also checks every MODEL_RELOAD_INTERVAL_S and, when a new version
+# is loaded, replaces the workers one at a time with forks of the updated master.
+# A worker that exits, because it served SERVER_MAX_REQUESTS requests (plus up to
+# SERVER_MAX_REQUESTS_JITTER) or because it crashed, is replaced the same way.
+
+# Crashing faster than this backs off before the next fork.
+MIN_UPTIME_S = 5
+HANDLED_SIGNALS = {signal.SIGTERM,signal.SIGINT,signal.SIGHUP,signal.SIGUSR1}
+
+
+def available_cpus():
+    # CPUs this process may run on, capped by a cgroup v2 quota (docker --cpus).
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os,'sched_getaffinity') else os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota,period = f.read().split()
+        if quota != 'max':
+            cpus = min(cpus,max(math.ceil(int(quota) / int(period)),1))
+    except (OSError,ValueError):
+        pass
+    return cpus
+
+
+def bind_socket(host:str,port:int,backlog:int = 2048):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    # asyncio only disables Nagle on connections whose socket says IPPROTO_TCP
+    # (accepted sockets inherit it from the listener); with proto 0 every small
+    # response waits out the client's delayed ACK, a ~40ms floor per request.
+    sock = socket.socket(family,socket.SOCK_STREAM,socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET,socket.SO_REUSEADDR,1)
+    sock.setsockopt(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)
+    sock.bind((host,port))
+    sock.listen(backlog)
+    return sock
+
+
+def freeze_heap():
+    # Moves everything allocated so far into a generation the cyclic GC never
+    # scans, so collections in the workers do not write to (and un-share) the
+    # pages holding the preloaded model.
+    gc.unfreeze()
+    gc.collect()
+    gc.freeze()
+
+
+class WorkerServer(uvicorn.Server):
+    # Stopping a worker, on SIGTERM or once it has served max_requests, first
+    # closes its listener (new connections go to the other workers through the
+    # shared backlog) and answers every further request with Connection: close.
+    # The worker exits once its clients have closed their connections, or after
+    # drain_timeout_s. Closing keep-alive connections right away, as uvicorn
+    # does on shutdown, resets requests clients already sent on them. A second
+    # SIGTERM/SIGINT skips the drain.
+
+    def __init__(self,app,max_requests:int = None,drain_timeout_s:float = 30,**config):
+        super().__init__(uvicorn.Config(self.asgi,interface='asgi3',**config))
+        self.served_app = app
+        self.max_requests = max_requests
+        self.drain_timeout_s = drain_timeout_s
+        self.drain_requested = False
+        self.drain_started = None
+
+    async def asgi(self,scope,receive,send):
+        if self.drain_started is None or scope['type'] != 'http':
+            return await self.served_app(scope,receive,send)
+
+        async def send_closing(message):
+            if message['type'] == 'http.response.start':
+                message = {**message,'headers' : [*message.get('headers',[]),(b'connection',b'close')]}
+            await send(message)
+        await self.served_app(scope,receive,send_closing)
+
+    def handle_exit(self,sig,frame):
+        if self.drain_started is None and not self.drain_requested:
+            self.drain_requested = True
+            return
+        super().handle_exit(sig,frame)
+
+    async def on_tick(self,counter:int):
+        if self.drain_started is None:
+            if self.max_requests is not None and self.server_state.total_requests >= self.max_requests:
+                logger.info('Served %s requests, recycling worker pid %s',self.server_state.total_requests,os.getpid())
+                self.drain_requested = True
+            if self.drain_requested:
+                for server in self.servers:
+                    server.close()
+                self.drain_started = time.monotonic()
+        elif not self.server_state.connections or time.monotonic() - self.drain_started >= self.drain_timeout_s:
+            return True
+        return await super().on_tick(counter)
+
+
+class PreforkServer:
+
+    def __init__(self,host:str,port:int,workers:int,max_requests:int = 0,max_requests_jitter:int = 0,graceful_timeout_s:int = 30):
+        self.host = host
+        self.port = port
+        self.n_workers = max(int(workers),1)
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout_s = graceful_timeout_s
+        self.app = None
+        self.reloader = None
+        self.sock = None
+        # pid -> worker slot, for serving and for stopping workers
+        self.workers = {}
+        self.retiring = {}
+        self.started = {}
+        self._stopping = False
+        self._reload = None
+
+    def preload(self):
+        from api.app import UserInput,app,load_serving_model
+        from api.reloader import ModelReloader
+        start = time.perf_counter()
+        app.state.active,app.state.shadow_models = load_serving_model()
+        self.app = app
+        self.reloader = ModelReloader(app.state,UserInput,settings)
+        freeze_heap()
+        logger.info('Preloaded model v%s in %.2fs',app.state.active.version,time.perf_counter() - start)
+
+    def run(self):
+        self.preload()
+        # Bound after preloading, so connections are refused rather than left
+        # hanging while the model loads.
+        self.sock = bind_socket(self.host,self.port)
+        signal.signal(signal.SIGTERM,self._on_stop)
+        signal.signal(signal.SIGINT,self._on_stop)
+        signal.signal(signal.SIGHUP,lambda *_: self._request_reload('force'))
+        signal.signal(signal.SIGUSR1,lambda *_: self._request_reload('check'))
+        logger.info('Serving on %s:%s with %s workers',self.host,self.port,self.n_workers)
+        for slot in range(self.n_workers):
+            self.spawn(slot)
+
+        interval_s = settings.model_reload_interval_s
+        next_check = time.monotonic() + interval_s
+        try:
+            while not self._stopping:
+                self.reap()
+                if self._reload is not None or (interval_s > 0 and time.monotonic() >= next_check):
+                    force,self._reload = self._reload == 'force',None
+                    self.check_model(force)
+                    next_check = time.monotonic() + interval_s
+                time.sleep(0.2)
+        finally:
+            self.shutdown()
+
+    def _on_stop(self,signum,frame):
+        self._stopping = True
+
+    def _request_reload(self,kind:str):
+        if self._reload != 'force':
+            self._reload = kind
+
+    def spawn(self,slot:int):
+        # Signals stay blocked across the fork until the child has its own handlers.
+        signal.pthread_sigmask(signal.SIG_BLOCK,HANDLED_SIGNALS)
+        pid = os.fork()
+        if pid:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK,HANDLED_SIGNALS)
+            self.workers[pid] = slot
+            self.started[pid] = time.monotonic()
+            return pid
+
+        code = 0
+        try:
+            self._serve(slot)
+        except SystemExit as e:
+            code = e.code or 0
+        except BaseException as e:
+            logger.error('Worker %s failed : %s',slot,e)
+            code = 1
+        finally:
+            stop_listeners()
+            # Skips the master's atexit handlers and buffered state.
+            os._exit(code)
+
+    def _serve(self,slot:int):
+        # Runs in the forked child.
+        restart_listeners()
+        signal.signal(signal.SIGHUP,signal.SIG_DFL)
+        signal.signal(signal.SIGUSR1,signal.SIG_DFL)
+        # uvicorn replaces these while serving and re-raises the signal it got once
+        # shut down; exiting through SystemExit lets the logs flush.
+        for signum in (signal.SIGTERM,signal.SIGINT):
+            signal.signal(signum,_exit_worker)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK,HANDLED_SIGNALS)
+
+        master = os.getppid()
+        self.app.state.worker_id = slot
+        self.app.state.request_reload = lambda force: os.kill(master,signal.SIGHUP if force else signal.SIGUSR1)
+        limit = None
+        if self.max_requests > 0:
+            limit = self.max_requests + random.randint(0,max(self.max_requests_jitter,0))
+        server = WorkerServer(
+            self.app,
+            max_requests=limit,
+            drain_timeout_s=self.graceful_timeout_s,
+            access_log=False,
+            timeout_graceful_shutdown=self.graceful_timeout_s
+        )
+        logger.info('Worker %s started (pid %s, request budget %s)',slot,os.getpid(),limit)
+        server.run(sockets=[self.sock])
+
+    def reap(self):
+        while True:
+            try:
+                pid,status = os.waitpid(-1,os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            code = os.waitstatus_to_exitcode(status)
+            uptime_s = time.monotonic() - self.started.pop(pid,time.monotonic())
+            if self.retiring.pop(pid,None) is not None:
+                continue
+            slot = self.workers.pop(pid,None)
+            if slot is None or self._stopping:
+                continue
+            if code == 0:
+                logger.info('Worker %s (pid %s) exited after %.0fs, replacing it',slot,pid,uptime_s)
+            else:
+                logger.error('Worker %s (pid %s) exited with code %s after %.1fs, replacing it',slot,pid,code,uptime_s)
+                if uptime_s < MIN_UPTIME_S:
+                    time.sleep(1)
+            self.spawn(slot)
+
+    def check_model(self,force:bool = False):
+        try:
+            result = asyncio.run(self.reloader.check(force=force))
+        except Exception as e:
+            logger.error('Model reload check failed : %s',e)
+            return
+        if result['reloaded']:
+            freeze_heap()
+            self.replace_workers()
+
+    def replace_workers(self):
+        # One slot at a time: fork the replacement first, then stop the old worker
+        # and wait for it, so capacity never drops by more than one worker.
+        for pid,slot in list(self.workers.items()):
+            if self._stopping:
+                return
+            self.spawn(slot)
+            self.retire([pid])
+            self.wait_retired(self.graceful_timeout_s + 5)
+
+    def retire(self,pids:list):
+        for pid in pids:
+            self.retiring[pid] = self.workers.pop(pid)
+            try:
+                os.kill(pid,signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def wait_retired(self,timeout_s:float):
+        deadline = time.monotonic() + timeout_s
+        while self.retiring and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.retiring):
+            logger.warning('Worker pid %s did not stop within %ss, killing it',pid,timeout_s)
+            try:
+                os.kill(pid,signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        while self.retiring:
+            self.reap()
+            time.sleep(0.05)
+
+    def shutdown(self):
+        self._stopping = True
+        logger.info('Stopping %s workers',len(self.workers))
+        self.retire(list(self.workers))
+        self.wait_retired(self.graceful_timeout_s + 5)
+        if self.sock is not None:
+            self.sock.close()
+
+
+def _exit_worker(signum,frame):
+    raise SystemExit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the prediction API from preloaded, forked workers')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8000)
+    parser.add_argument('--workers',type=int,default=settings.server_workers,help='Worker processes (default WEB_CONCURRENCY, or one per CPU)')
+    parser.add_argument('--max-requests',type=int,default=settings.server_max_requests,help='Replace a worker after this many requests (0 = never)')
+    parser.add_argument('--max-requests-jitter',type=int,default=settings.server_max_requests_jitter,help='Random extra requests per worker, so workers are not replaced together')
+    parser.add_argument('--graceful-timeout',type=int,default=settings.server_graceful_timeout_s,help='Seconds a stopping worker gets to finish in-flight requests')
+    args = parser.parse_args()
+
+    server = PreforkServer(
+        args.host,
+        args.port,
+        args.workers or available_cpus(),
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout_s=args.graceful_timeout
+    )
+    server.run()
+
+
+if __name__ == '__main__':
+    main()
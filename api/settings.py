@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass
+
+
+def _env_bool(name:str,default:bool):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1','true','yes','on')
+
+
+def _env_list(name:str,cast = str):
+    value = os.getenv(name,'')
+    return tuple(cast(item.strip()) for item in value.split(',') if item.strip())
+
+
+@dataclass(frozen=True)
+class Settings:
+    batching_enabled : bool = True
+    batch_max_size : int = 64
+    batch_max_wait_us : int = 1000
+    prediction_cache : str = 'lru'
+    prediction_cache_size : int = 100_000
+    prediction_cache_ttl_s : float = 0
+    prediction_table_max_entries : int = 5_000_000
+    model_name : str = 'my_model'
+    model_stage : str = 'Production'
+    model_source : str = 'auto'
+    model_store_dir : str = './local_Storage/model_store'
+    model_store_max_age_s : float = 3600
+    model_format : str = 'auto'
+    model_reload_interval_s : float = 60
+    admin_token : str = ''
+    metrics_enabled : bool = True
+    access_log_sample_rate : float = 0.01
+    return_probabilities : bool = True
+    ensemble_models : tuple = ()
+    ensemble_weights : tuple = ()
+    shadow_models : tuple = ()
+    shadow_max_workers : int = 1
+    shadow_max_pending : int = 64
+    shadow_sample_rate : float = 1.0
+    shadow_log_path : str = './local_Storage/shadow/predictions.ndjson'
+    drift_enabled : bool = True
+    drift_interval_s : float = 60
+    drift_min_count : int = 200
+    drift_psi_threshold : float = 0.25
+    # api.server (preforked workers); 0 workers means one per available CPU.
+    server_workers : int = 0
+    server_max_requests : int = 0
+    server_max_requests_jitter : int = 0
+    server_graceful_timeout_s : int = 30
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            batching_enabled = _env_bool('PREDICT_BATCHING',cls.batching_enabled),
+            batch_max_size = int(os.getenv('PREDICT_MAX_BATCH_SIZE',cls.batch_max_size)),
+            batch_max_wait_us = int(os.getenv('PREDICT_MAX_WAIT_US',cls.batch_max_wait_us)),
+            prediction_cache = os.getenv('PREDICTION_CACHE',cls.prediction_cache).strip().lower(),
+            prediction_cache_size = int(os.getenv('PREDICTION_CACHE_SIZE',cls.prediction_cache_size)),
+            prediction_cache_ttl_s = float(os.getenv('PREDICTION_CACHE_TTL_S',cls.prediction_cache_ttl_s)),
+            prediction_table_max_entries = int(os.getenv('PREDICTION_TABLE_MAX_ENTRIES',cls.prediction_table_max_entries)),
+            model_name = os.getenv('MODEL_NAME',cls.model_name),
+            model_stage = os.getenv('MODEL_STAGE',cls.model_stage),
+            model_source = os.getenv('MODEL_SOURCE',cls.model_source).strip().lower(),
+            model_store_dir = os.getenv('MODEL_STORE_DIR',cls.model_store_dir),
+            model_store_max_age_s = float(os.getenv('MODEL_STORE_MAX_AGE_S',cls.model_store_max_age_s)),
+            model_format = os.getenv('MODEL_FORMAT',cls.model_format).strip().lower(),
+            model_reload_interval_s = float(os.getenv('MODEL_RELOAD_INTERVAL_S',cls.model_reload_interval_s)),
+            admin_token = os.getenv('ADMIN_TOKEN',cls.admin_token),
+            metrics_enabled = _env_bool('METRICS_ENABLED',cls.metrics_enabled),
+            access_log_sample_rate = float(os.getenv('ACCESS_LOG_SAMPLE_RATE',cls.access_log_sample_rate)),
+            return_probabilities = _env_bool('RETURN_PROBABILITIES',cls.return_probabilities),
+            ensemble_models = _env_list('ENSEMBLE_MODELS'),
+            ensemble_weights = _env_list('ENSEMBLE_WEIGHTS',float),
+            shadow_models = _env_list('SHADOW_MODELS'),
+            shadow_max_workers = int(os.getenv('SHADOW_MAX_WORKERS',cls.shadow_max_workers)),
+            shadow_max_pending = int(os.getenv('SHADOW_MAX_PENDING',cls.shadow_max_pending)),
+            shadow_sample_rate = float(os.getenv('SHADOW_SAMPLE_RATE',cls.shadow_sample_rate)),
+            shadow_log_path = os.getenv('SHADOW_LOG_PATH',cls.shadow_log_path),
+            drift_enabled = _env_bool('DRIFT_MONITOR',cls.drift_enabled),
+            drift_interval_s = float(os.getenv('DRIFT_INTERVAL_S',cls.drift_interval_s)),
+            drift_min_count = int(os.getenv('DRIFT_MIN_COUNT',cls.drift_min_count)),
+            drift_psi_threshold = float(os.getenv('DRIFT_PSI_THRESHOLD',cls.drift_psi_threshold)),
+            server_workers = int(os.getenv('WEB_CONCURRENCY',cls.server_workers)),
+            server_max_requests = int(os.getenv('SERVER_MAX_REQUESTS',cls.server_max_requests)),
+            server_max_requests_jitter = int(os.getenv('SERVER_MAX_REQUESTS_JITTER',cls.server_max_requests_jitter)),
+            server_graceful_timeout_s = int(os.getenv('SERVER_GRACEFUL_TIMEOUT_S',cls.server_graceful_timeout_s)),
+        )
+
+
+settings = Settings.from_env()
@@ -0,0 +1,153 @@
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+import numpy as np
+from api.inference import SharedFeatures
+from api.metrics import METRICS,SILENT_TIMER
+from config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def _record_logger(path:str):
+    # One JSON line per shadow-scored batch, kept apart from the application log.
+    records = logging.getLogger('shadow_predictions')
+    if not records.handlers:
+        os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+        handler = RotatingFileHandler(path,maxBytes=50 * 1024 * 1024,backupCount=5)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        records.addHandler(handler)
+        records.setLevel(logging.INFO)
+        records.propagate = False
+    return records
+
+
+def worker_log_path(path:str,worker_id = None):
+    # Preforked workers each append to their own file (predictions.w0.ndjson, ...)
+    # so no two processes rotate the same one.
+    if worker_id is None:
+        return path
+    root,ext = os.path.splitext(path)
+    return f'{root}.w{worker_id}{ext}'
+
+
+class ShadowRunner:
+    # Scores challenger models on the served model's traffic without delaying it.
+    # The request path only hands over the batch's SharedFeatures (whose encoded
+    # columns and scaled matrix are already built) and the served labels; the
+    # shadow models run on a small thread pool and their outputs are appended to
+    # log_path for offline comparison.
+    #
+    # Cost is bounded: at most max_workers threads, at most max_pending batches
+    # queued or in flight (further batches are dropped and counted), and
+    # sample_rate of the batches are shadowed at all. Per-model latency and
+    # agreement are exported as metrics.
+
+    def __init__(self,models:list,max_workers:int = 1,max_pending:int = 64,sample_rate:float = 1.0,
+                 log_path:str = './local_Storage/shadow/predictions.ndjson'):
+        self.models = models
+        self.max_pending = max(int(max_pending),1)
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self._records = _record_logger(log_path)
+        self._executor = ThreadPoolExecutor(max_workers=max(int(max_workers),1),thread_name_prefix='shadow')
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = {model.version : {'batches' : 0,'records' : 0,'agreed' : 0,'errors' : 0,'seconds' : 0.0} for model in models}
+
+    def submit(self,features,labels,primary_version:str):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.dropped += 1
+                METRICS['shadow_dropped'].inc()
+                return
+            self.pending += 1
+            self.submitted += 1
+        try:
+            self._executor.submit(self._score,features,np.asarray(labels),primary_version,time.time())
+        except RuntimeError:
+            # Executor already shut down.
+            with self._lock:
+                self.pending -= 1
+
+    def submit_records(self,records,labels,primary_version:str):
+        # Prediction cache hits: no SharedFeatures were built on the request path,
+        # so the shadow thread builds them from the validated records.
+        self.submit(functools.partial(SharedFeatures.from_records,list(records)),labels,primary_version)
+
+    def _score(self,features,labels,primary_version:str,received:float):
+        try:
+            if callable(features):
+                try:
+                    features = features()
+                except Exception as e:
+                    logger.error('Building shadow features failed : %s',e)
+                    return
+            for model in self.models:
+                start = time.perf_counter()
+                try:
+                    shadow_labels = np.asarray(model.scorer.predict_features(features,SILENT_TIMER))
+                except Exception as e:
+                    with self._lock:
+                        self.scored[model.version]['errors'] += 1
+                    METRICS['shadow_errors'].inc(model.version)
+                    logger.error('Shadow model v%s failed : %s',model.version,e)
+                    continue
+                elapsed = time.perf_counter() - start
+                agreed = int((shadow_labels == labels).sum())
+                with self._lock:
+                    stats = self.scored[model.version]
+                    stats['batches'] += 1
+                    stats['records'] += len(labels)
+                    stats['agreed'] += agreed
+                    stats['seconds'] += elapsed
+                METRICS['shadow_seconds'].observe(model.version,value=elapsed)
+                METRICS['shadow_records'].inc(model.version,'agree',amount=agreed)
+                METRICS['shadow_records'].inc(model.version,'disagree',amount=len(labels) - agreed)
+                self._records.info(json.dumps({
+                    'ts' : received,
+                    'primary_version' : primary_version,
+                    'shadow_version' : model.version,
+                    'latency_ms' : round(elapsed * 1000,3),
+                    'n' : len(labels),
+                    'agreed' : agreed,
+                    'inputs' : {column : values.tolist() for column,values in features.columns.items()},
+                    'primary' : labels.tolist(),
+                    'shadow' : shadow_labels.tolist(),
+                }))
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def stop(self):
+        # Lets queued batches finish so their outputs reach the log.
+        self._executor.shutdown(wait=True)
+        for handler in self._records.handlers:
+            handler.flush()
+
+    def stats(self):
+        return {
+            'models' : {
+                version : {
+                    **stats,
+                    'agreement' : round(stats['agreed'] / stats['records'],6) if stats['records'] else None,
+                    'mean_batch_ms' : round(stats['seconds'] / stats['batches'] * 1000,3) if stats['batches'] else None,
+                } for version,stats in self.scored.items()
+            },
+            'pending' : self.pending,
+            'max_pending' : self.max_pending,
+            'submitted' : self.submitted,
+            'dropped' : self.dropped,
+            'sample_rate' : self.sample_rate,
+            'log_path' : self.log_path,
+        }
@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from sklearn.svm import SVC
+from benchmarks.svc_approximation import make_data
+from src.calibration import calibrate,calibrated_labels,calibration_report
+from src.model_bundle import decision_function
+
+# Latency of calibrated probabilities over label-only prediction for the RBF SVC
+# in params.yaml, on the synthetic matrix of benchmarks.svc_approximation:
+#   label      : decision scores -> label (what the API computed before)
+#   sigmoid    : the same scores -> label + Platt-calibrated probabilities
+#   isotonic   : the same scores -> label + isotonic-calibrated probabilities
+#   platt_5fold: SVC(probability=True), sklearn's internal 5-fold Platt fit, predict + predict_proba
+# Each is timed on the sklearn estimator and on the NumPy array path the API and
+# bulk scoring use.
+#   python -m benchmarks.calibration --rows 5000 --batch-sizes 1 64 4096
+
+
+def timed(variants:dict,X,repeats:int):
+    # Variants run interleaved within each round, so drift on a shared machine
+    # affects all of them alike; the median round is reported.
+    times = {name : [] for name in variants}
+    for _ in range(repeats):
+        for name,fn in variants.items():
+            start = time.perf_counter()
+            fn(X)
+            times[name].append(time.perf_counter() - start)
+    return {name : float(np.median(values)) for name,values in times.items()}
+
+
+def svc_arrays(model):
+    arrays = {
+        'support_vectors' : np.ascontiguousarray(model.support_vectors_),
+        'dual_coef' : np.ascontiguousarray(model.dual_coef_[0]),
+        'intercept' : np.ascontiguousarray(model.intercept_),
+    }
+    manifest = {'kernel' : model.kernel,'gamma' : float(model._gamma),'coef0' : float(model.coef0),'degree' : int(model.degree)}
+    sv_sq_norms = (arrays['support_vectors'] ** 2).sum(axis=1)
+    return lambda X: decision_function(arrays,manifest,X,sv_sq_norms)
+
+
+def run(n_rows:int,svc_params:dict,holdout_size:float,batch_sizes:list,test_rows:int,repeats:int):
+    X,y = make_data(n_rows)
+    n_cal = int(n_rows * holdout_size)
+    X_fit,y_fit,X_cal,y_cal = X[n_cal:],y[n_cal:],X[:n_cal],y[:n_cal]
+    X_test,y_test = make_data(test_rows,seed=1)
+
+    start = time.perf_counter()
+    model = SVC(**svc_params).fit(X_fit,y_fit)
+    fit_s = {'label' : time.perf_counter() - start}
+    calibrated = {}
+    for method in ('sigmoid','isotonic'):
+        start = time.perf_counter()
+        calibrated[method] = calibrate(model,X_cal,y_cal,method)
+        fit_s[method] = fit_s['label'] + time.perf_counter() - start
+    start = time.perf_counter()
+    platt = SVC(**svc_params,probability=True,random_state=0).fit(X,y)
+    fit_s['platt_5fold'] = time.perf_counter() - start
+
+    scores = svc_arrays(model)
+    classes = model.classes_
+    variants = {
+        ('sklearn','label') : model.predict,
+        ('sklearn','sigmoid') : calibrated['sigmoid'].predict_with_proba,
+        ('sklearn','isotonic') : calibrated['isotonic'].predict_with_proba,
+        ('sklearn','platt_5fold') : lambda X: (platt.predict(X),platt.predict_proba(X)),
+        ('arrays','label') : lambda X: classes[(scores(X) > 0).astype(int)],
+    }
+    for method in ('sigmoid','isotonic'):
+        def with_proba(X,calibrator = calibrated[method].calibrator):
+            p = calibrator.predict(scores(X))
+            return calibrated_labels(classes,p),p
+        variants[('arrays',method)] = with_proba
+
+    results = []
+    for batch_size in batch_sizes:
+        batch = X_test[:batch_size]
+        # Fewer rounds for large batches; each already averages over many rows.
+        timings = timed(variants,batch,max(5,min(repeats,repeats * 64 // batch_size)))
+        baseline = {}
+        for (path,variant),seconds in timings.items():
+            baseline.setdefault(path,seconds)
+            results.append({
+                'path' : path,
+                'variant' : variant,
+                'batch_size' : batch_size,
+                'latency_us' : round(seconds * 1e6,1),
+                'overhead_pct' : round((seconds / baseline[path] - 1) * 100,1),
+                'fit_s' : round(fit_s[variant],3),
+            })
+            print(f'{path:>7} {variant:>11} batch {batch_size:>5}: {seconds * 1e6:10.1f}us  {results[-1]["overhead_pct"]:+6.1f}% vs label  fit {fit_s[variant]:.2f}s')
+        # The calibration step alone, on scores already computed: what the array
+        # path adds per batch once kernel noise is taken out.
+        batch_scores = scores(batch)
+        step = timed({method : calibrated[method].calibrator.predict for method in calibrated},batch_scores,repeats)
+        for method,seconds in step.items():
+            results.append({'path' : 'calibrator','variant' : method,'batch_size' : batch_size,'latency_us' : round(seconds * 1e6,2)})
+            print(f'calibrator {method:>8} batch {batch_size:>5}: {seconds * 1e6:10.2f}us')
+
+    quality = {method : calibration_report(y_test,calibrated[method].predict_proba(X_test)[:,1]) for method in calibrated}
+    quality['platt_5fold'] = calibration_report(y_test,platt.predict_proba(X_test)[:,1])
+    for method,report in quality.items():
+        print(f'{method:>11}: brier {report["brier_score"]:.4f}  log loss {report["log_loss"]:.4f}  ece {report["ece"]:.4f}')
+    return {'rows' : n_rows,'n_support_vectors' : int(model.support_vectors_.shape[0]),'latency' : results,'calibration' : quality}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark calibrated probabilities against label-only prediction')
+    parser.add_argument('--rows',type=int,default=5000,help='Training rows (calibration holdout included)')
+    parser.add_argument('--batch-sizes',type=int,nargs='+',default=[1,64,4096])
+    parser.add_argument('--test-rows',type=int,default=4096)
+    parser.add_argument('--repeats',type=int,default=200,help='Timing rounds for batches of up to 64 rows')
+    parser.add_argument('--params',default='params.yaml',help='Take the SVC and calibration parameters from this params file')
+    parser.add_argument('--output',default=None,help='Write the results as JSON to this path')
+    args = parser.parse_args()
+
+    import yaml
+    with open(args.params) as f:
+        training_params = yaml.safe_load(f)['model_training']
+    svc_params = {**training_params['svc'],'kernel' : 'rbf'}
+    holdout_size = (training_params.get('calibration') or {}).get('holdout_size',0.2)
+    results = run(args.rows,svc_params,holdout_size,args.batch_sizes,max(args.test_rows,max(args.batch_sizes)),args.repeats)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.',exist_ok=True)
+        with open(args.output,'w') as f:
+            json.dump(results,f,indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Replays a request corpus against the prediction API and reports throughput,
+# latency percentiles and per-process CPU and memory (RSS, USS, PSS).
+#
+#   python -m benchmarks.load_test --mode asgi --concurrency 1 8 64
+#   python -m benchmarks.load_test --mode uvicorn --workers 2 --corpus corpus.jsonl --output results.json
+#   python -m benchmarks.load_test --mode prefork --workers 2   (api.server: preload, then fork)
+#
+# Corpus format (JSON lines): either a bare /predict payload per line, or
+# {"method": "POST", "path": "/predict_batch", "body": [...]}. Without --corpus a
+# seeded corpus of /predict payloads is generated from the UserInput bounds.
+#
+# The model is served from a throwaway local model store populated from
+# --artifacts-dir, which stands in for the MLflow registry (MODEL_SOURCE=local),
+# so runs need no network or credentials.
+
+
+def load_corpus(path:str):
+    requests = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item,dict) and 'path' in item:
+                requests.append((item.get('method','POST').upper(),item['path'],item.get('body')))
+            else:
+                requests.append(('POST','/predict',item))
+    return requests
+
+
+def generate_corpus(n:int,seed:int = 0):
+    from api.app import UserInput
+    from api.inference import sample_records
+    return [('POST','/predict',record.model_dump()) for record in sample_records(UserInput,n,seed)]
+
+
+def registry_stub(artifacts_dir:str,model_name:str,stage:str):
+    # A local model store holding the current training artifacts as version 1.
+    from api.model_store import publish_artifacts
+    store_dir = tempfile.mkdtemp(prefix='load-test-store-')
+    publish_artifacts(artifacts_dir,store_dir,model_name,1,stage)
+    return store_dir
+
+
+def server_env(store_dir:str,model_name:str,stage:str,extra:dict):
+    env = {
+        'MODEL_SOURCE' : 'local',
+        'MODEL_STORE_DIR' : store_dir,
+        'MODEL_NAME' : model_name,
+        'MODEL_STAGE' : stage,
+        'MODEL_RELOAD_INTERVAL_S' : '0',
+    }
+    env.update(extra)
+    return env
+
+
+async def replay(client,corpus:list,total:int,concurrency:int):
+    latencies = np.zeros(total)
+    statuses = {}
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index
+        while next_index < total:
+            i = next_index
+            next_index += 1
+            method,path,body = corpus[i % len(corpus)]
+            start = time.perf_counter()
+            try:
+                response = await client.request(method,path,json=body)
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            latencies[i] = time.perf_counter() - start
+            statuses[status] = statuses.get(status,0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies,statuses,time.perf_counter() - start
+
+
+class ProcessSampler:
+    # CPU seconds consumed and memory at the end of the run, per process. RSS
+    # counts pages shared with other processes in full; USS is what the process
+    # alone holds (freed if it exits) and PSS splits shared pages evenly, so the
+    # PSS of all processes adds up to their combined footprint.
+
+    def __init__(self,processes:dict):
+        import psutil
+        self.processes = {role : psutil.Process(pid) for role,pid in processes.items()}
+        self.cpu_start = {role : self._cpu(p) for role,p in self.processes.items()}
+
+    @staticmethod
+    def _cpu(process):
+        times = process.cpu_times()
+        return times.user + times.system
+
+    def report(self,elapsed:float):
+        import psutil
+        report = []
+        for role,process in self.processes.items():
+            try:
+                cpu_s = self._cpu(process) - self.cpu_start[role]
+                memory = process.memory_full_info()
+            except psutil.NoSuchProcess:
+                # Worker recycled during the run (SERVER_MAX_REQUESTS).
+                continue
+            report.append({
+                'role' : role,
+                'pid' : process.pid,
+                'cpu_s' : round(cpu_s,3),
+                'cpu_percent' : round(100 * cpu_s / elapsed,1),
+                'rss_mb' : round(memory.rss / 2 ** 20,1),
+                'uss_mb' : round(memory.uss / 2 ** 20,1),
+                'pss_mb' : round(getattr(memory,'pss',memory.uss) / 2 ** 20,1),
+            })
+        return report
+
+
+def summarize(mode:str,concurrency:int,latencies,statuses:dict,elapsed:float,processes:list):
+    ms = latencies * 1000
+    ok = sum(count for status,count in statuses.items() if status.startswith('2'))
+    return {
+        'mode' : mode,
+        'concurrency' : concurrency,
+        'requests' : len(latencies),
+        'errors' : len(latencies) - ok,
+        'status_codes' : statuses,
+        'duration_s' : round(elapsed,3),
+        'throughput_rps' : round(len(latencies) / elapsed,1),
+        'latency_ms' : {
+            'mean' : round(float(ms.mean()),3),
+            'p50' : round(float(np.percentile(ms,50)),3),
+            'p95' : round(float(np.percentile(ms,95)),3),
+            'p99' : round(float(np.percentile(ms,99)),3),
+            'max' : round(float(ms.max()),3),
+        },
+        'processes' : processes,
+    }
+
+
+async def run_asgi(corpus:list,total:int,levels:list,warmup:int):
+    # In-process: the client and the app share one event loop and one process, so
+    # the process CPU figure includes the client.
+    import httpx
+    from api.app import app
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport,base_url='http://load-test') as client:
+            await replay(client,corpus,warmup,min(warmup,8) or 1)
+            for concurrency in levels:
+                sampler = ProcessSampler({'app+client' : os.getpid()})
+                latencies,statuses,elapsed = await replay(client,corpus,total,concurrency)
+                results.append(summarize('asgi',concurrency,latencies,statuses,elapsed,sampler.report(elapsed)))
+                print_result(results[-1])
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1',0))
+        return s.getsockname()[1]
+
+
+async def _wait_ready(client,process,timeout_s:float = 60):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            if (await client.get('/health')).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError('Server did not become healthy')
+
+
+async def run_server(mode:str,corpus:list,total:int,levels:list,warmup:int,workers:int,env:dict):
+    import httpx
+    import psutil
+
+    port = _free_port()
+    if mode == 'prefork':
+        command = ['api.server','--host','127.0.0.1','--port',str(port),'--workers',str(workers)]
+    else:
+        command = ['uvicorn','api.app:app','--host','127.0.0.1','--port',str(port),'--workers',str(workers),'--no-access-log']
+    process = subprocess.Popen([sys.executable,'-m',*command],env={**os.environ,**env})
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(levels),max_keepalive_connections=max(levels))
+        # The client disables Nagle so that a ~40ms latency floor (Nagle plus delayed
+        # ACK) in the results can only come from the server side.
+        transport = httpx.AsyncHTTPTransport(limits=limits,socket_options=[(socket.IPPROTO_TCP,socket.TCP_NODELAY,1)])
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}',transport=transport,timeout=30) as client:
+            await _wait_ready(client,process)
+            await replay(client,corpus,warmup,min(warmup,8) or 1)
+            for concurrency in levels:
+                roles = {'server' : process.pid}
+                if workers > 1 or mode == 'prefork':
+                    roles = {'master' : process.pid}
+                    children = [c for c in psutil.Process(process.pid).children(recursive=True) if 'resource_tracker' not in ' '.join(c.cmdline())]
+                    for i,child in enumerate(children):
+                        roles[f'worker_{i}'] = child.pid
+                sampler = ProcessSampler(roles)
+                latencies,statuses,elapsed = await replay(client,corpus,total,concurrency)
+                results.append(summarize(mode,concurrency,latencies,statuses,elapsed,sampler.report(elapsed)))
+                results[-1]['workers'] = workers
+                print_result(results[-1])
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return results
+
+
+def print_result(result:dict):
+    latency = result['latency_ms']
+    rss = ', '.join(f"{p['role']} rss {p['rss_mb']}MB pss {p['pss_mb']}MB/{p['cpu_percent']}%" for p in result['processes'])
+    print(
+        f"{result['mode']:>7} c={result['concurrency']:<4} {result['throughput_rps']:>9.1f} req/s  "
+        f"p50 {latency['p50']:.2f}ms p95 {latency['p95']:.2f}ms p99 {latency['p99']:.2f}ms  "
+        f"errors {result['errors']}  [{rss}]"
+    )
+
+
+def git_commit():
+    try:
+        repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output(['git','rev-parse','--short','HEAD'],cwd=repo_dir,stderr=subprocess.DEVNULL,text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the prediction API')
+    parser.add_argument('--mode',choices=('asgi','uvicorn','prefork'),default='asgi')
+    parser.add_argument('--corpus',default=None,help='JSON lines request corpus (default: generated)')
+    parser.add_argument('--corpus-size',type=int,default=5000,help='Size of the generated corpus')
+    parser.add_argument('--requests',type=int,default=5000,help='Requests per concurrency level')
+    parser.add_argument('--concurrency',type=int,nargs='+',default=[1,8,32,128])
+    parser.add_argument('--warmup',type=int,default=200)
+    parser.add_argument('--workers',type=int,default=1,help='uvicorn or api.server worker processes')
+    parser.add_argument('--artifacts-dir',default='./local_Storage/models')
+    parser.add_argument('--model-name',default='my_model')
+    parser.add_argument('--stage',default='Production')
+    parser.add_argument('--env',nargs='*',default=[],metavar='KEY=VALUE',help='Extra API settings, e.g. PREDICTION_CACHE=off')
+    parser.add_argument('--output',default=None,help='Write the results as JSON to this path')
+    args = parser.parse_args()
+
+    store_dir = registry_stub(args.artifacts_dir,args.model_name,args.stage)
+    env = server_env(store_dir,args.model_name,args.stage,dict(item.split('=',1) for item in args.env))
+    # api.settings reads the environment at import time.
+    os.environ.update(env)
+
+    corpus = load_corpus(args.corpus) if args.corpus else generate_corpus(args.corpus_size)
+    if args.mode == 'asgi':
+        results = asyncio.run(run_asgi(corpus,args.requests,args.concurrency,args.warmup))
+    else:
+        results = asyncio.run(run_server(args.mode,corpus,args.requests,args.concurrency,args.warmup,args.workers,env))
+
+    report = {
+        'commit' : git_commit(),
+        'timestamp' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cpu_count' : os.cpu_count(),
+        'corpus' : args.corpus or f'generated:{args.corpus_size}',
+        'settings' : env,
+        'results' : results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.',exist_ok=True)
+        with open(args.output,'w') as f:
+            json.dump(report,f,indent=4)
+
+
+if __name__ == '__main__':
+    main()
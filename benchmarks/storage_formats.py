@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from src.data_io import SUPPORTED_FORMATS,data_path,save_frame,load_frame
+
+# Compares write time, read time and on-disk size of the storage formats used
+# between pipeline stages, on a frame shaped like the preprocessed train set.
+#   python -m benchmarks.storage_formats --rows 10000 100000 1000000
+
+
+def make_frame(n_rows:int,n_features:int = 8,seed:int = 0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.standard_normal((n_rows,n_features)),columns=[f'num__f{i}' for i in range(n_features)])
+    df['target'] = rng.integers(0,2,n_rows)
+    return df
+
+
+def best_of(fn,repeats:int):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(rows:list,formats:list,compression:str,repeats:int,work_dir:str):
+    results = []
+    for n_rows in rows:
+        df = make_frame(n_rows)
+        for fmt in formats:
+            codec = compression if fmt == 'parquet' else None
+            path = data_path(work_dir,f'bench_{n_rows}',fmt)
+            write_s = best_of(lambda: save_frame(df,path,codec),repeats)
+            read_s = best_of(lambda: load_frame(path),repeats)
+            exact = bool(np.array_equal(load_frame(path).to_numpy(),df.to_numpy()))
+            results.append({
+                'rows' : n_rows,
+                'format' : fmt,
+                'compression' : codec or ('uncompressed' if fmt == 'feather' else None),
+                'write_s' : round(write_s,4),
+                'read_s' : round(read_s,4),
+                'size_bytes' : os.path.getsize(path),
+                'lossless' : exact,
+            })
+            os.remove(path)
+            print(f'{n_rows:>9} rows {fmt:>8}: write {write_s:.4f}s read {read_s:.4f}s size {results[-1]["size_bytes"]:>11} bytes lossless={exact}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CSV against Parquet and Feather for pipeline datasets')
+    parser.add_argument('--rows',type=int,nargs='+',default=[10000,100000,1000000])
+    parser.add_argument('--formats',nargs='+',default=list(SUPPORTED_FORMATS),choices=SUPPORTED_FORMATS)
+    parser.add_argument('--compression',default='zstd',help='Parquet codec')
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--output',default=None,help='Write the results as JSON to this path')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='storage-bench-')
+    try:
+        results = run(args.rows,args.formats,args.compression,args.repeats,work_dir)
+    finally:
+        shutil.rmtree(work_dir,ignore_errors=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.',exist_ok=True)
+        with open(args.output,'w') as f:
+            json.dump(results,f,indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from sklearn.metrics import accuracy_score
+from src.model_training import build_model
+
+# Exact RBF SVC against the Nystroem / random Fourier feature model types on a
+# synthetic preprocessed matrix (6 standardized numeric + 2 ordinal columns).
+#   python -m benchmarks.svc_approximation --rows 10000 100000 1000000
+
+
+def make_data(n_rows:int,seed:int = 0):
+    rng = np.random.default_rng(seed)
+    num = rng.standard_normal((n_rows,6))
+    cat = rng.integers(0,2,(n_rows,2)).astype(np.float64)
+    X = np.hstack([num,cat])
+    # Non-linear decision boundary with label noise, roughly as separable as the real data.
+    logit = 1.5 * num[:,0] - num[:,1] * num[:,2] + np.sin(2 * num[:,3]) + 2 * cat[:,0] - 1
+    y = (logit + 0.5 * rng.standard_normal(n_rows) > 0).astype(int)
+    return X,y
+
+
+def latency(model,X,repeats:int = 200):
+    # Median single-row predict latency plus batch throughput.
+    single = []
+    for i in range(repeats):
+        row = X[i % len(X)][None,:]
+        start = time.perf_counter()
+        model.predict(row)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    model.predict(X)
+    batch_s = time.perf_counter() - start
+    return float(np.median(single)) * 1e6,len(X) / batch_s
+
+
+def run(rows:list,model_params:dict,svc_max_rows:int,test_rows:int):
+    X_test,y_test = make_data(test_rows,seed=1)
+    results = []
+    for n_rows in rows:
+        X,y = make_data(n_rows)
+        for model_type,params in model_params.items():
+            if model_type == 'svc' and n_rows > svc_max_rows:
+                results.append({'rows' : n_rows,'model_type' : model_type,'skipped' : f'more than --svc-max-rows={svc_max_rows}'})
+                print(f'{n_rows:>9} rows {model_type:>13}: skipped')
+                continue
+            model = build_model(model_type,params)
+            start = time.perf_counter()
+            model.fit(X,y)
+            fit_s = time.perf_counter() - start
+            p50_us,rows_per_s = latency(model,X_test)
+            accuracy = accuracy_score(y_test,model.predict(X_test))
+            results.append({
+                'rows' : n_rows,
+                'model_type' : model_type,
+                'fit_s' : round(fit_s,3),
+                'predict_p50_us' : round(p50_us,1),
+                'predict_rows_per_s' : round(rows_per_s),
+                'accuracy' : round(float(accuracy),4),
+                'n_support_vectors' : int(model.support_vectors_.shape[0]) if model_type == 'svc' else None,
+            })
+            print(f'{n_rows:>9} rows {model_type:>13}: fit {fit_s:8.2f}s  p50 {p50_us:8.1f}us  {rows_per_s:>10.0f} rows/s  acc {accuracy:.4f}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark exact SVC against kernel-approximation model types')
+    parser.add_argument('--rows',type=int,nargs='+',default=[10000,100000,1000000])
+    parser.add_argument('--svc-max-rows',type=int,default=100000,help='Skip exact SVC above this size')
+    parser.add_argument('--test-rows',type=int,default=20000)
+    parser.add_argument('--params',default='params.yaml',help='Take model parameters from this params file')
+    parser.add_argument('--output',default=None,help='Write the results as JSON to this path')
+    args = parser.parse_args()
+
+    import yaml
+    with open(args.params) as f:
+        training_params = yaml.safe_load(f)['model_training']
+    model_params = {
+        'svc' : {**training_params['svc'],'kernel' : 'rbf'},
+        'svc_nystroem' : training_params['svc_nystroem'],
+        'svc_rff' : training_params['svc_rff'],
+    }
+    results = run(args.rows,model_params,args.svc_max_rows,args.test_rows)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or '.',exist_ok=True)
+        with open(args.output,'w') as f:
+            json.dump(results,f,indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,173 @@
 import os
-import logging
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
 import sys
-default_filename = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
+import json
+import queue
+import atexit
+import logging
+from datetime import datetime,timezone
+from logging.handlers import RotatingFileHandler,QueueHandler,QueueListener
+
+# Environment:
+#   APP_ENV=production   defaults below switch to INFO, JSON and async
+#   LOG_LEVEL            DEBUG|INFO|WARNING|... (default DEBUG, INFO in production)
+#   LOG_FORMAT           text|json (default text, json in production)
+#   LOG_ASYNC            1 to emit through a queue drained by a background thread
+#   LOG_TO_FILE          0 to log to stdout only
+#   LOG_DIR, LOG_FILE    rotating log file location (default logs/<start time>.log)
+#   LOG_QUEUE_SIZE       records buffered in async mode before new ones are dropped
+
+PRODUCTION = os.getenv('APP_ENV','development').strip().lower() == 'production'
+LOG_LEVEL = os.getenv('LOG_LEVEL','INFO' if PRODUCTION else 'DEBUG').strip().upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT','json' if PRODUCTION else 'text').strip().lower()
+LOG_ASYNC = os.getenv('LOG_ASYNC','1' if PRODUCTION else '0').strip().lower() in ('1','true','yes','on')
+LOG_TO_FILE = os.getenv('LOG_TO_FILE','1').strip().lower() in ('1','true','yes','on')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE',10000))
+
+default_filename = os.getenv('LOG_FILE',f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log")
+default_log_dir = os.getenv('LOG_DIR','logs')
+
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s - [%(name)s:%(lineno)d]  - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through `extra=`.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message','asctime','taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line; fields passed with `extra=` are kept as keys.
+
+    def format(self,record:logging.LogRecord):
+        entry = {
+            'ts' : datetime.fromtimestamp(record.created,timezone.utc).isoformat(timespec='milliseconds'),
+            'level' : record.levelname,
+            'logger' : record.name,
+            'line' : record.lineno,
+            'msg' : record.getMessage(),
+        }
+        for key,value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry,default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    # Hands the record to the listener thread as-is: message formatting and the
+    # handlers' I/O both happen off the calling thread. A full queue drops the
+    # record instead of blocking the caller.
+
+    def __init__(self,log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        # Set in a forked child with no listener thread: records go straight to
+        # these handlers until restart_listeners().
+        self.direct = None
+
+    def prepare(self,record:logging.LogRecord):
+        return record
+
+    def enqueue(self,record:logging.LogRecord):
+        if self.direct is not None:
+            for handler in self.direct:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# Handlers are shared by all loggers writing to the same file, so one file has
+# one RotatingFileHandler (and, in async mode, one listener thread).
+_handlers = {}
+_listeners = []
+
+
+def _formatter():
+    return JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
 
-def get_logger(name : str,log_dir = 'logs',log_file = default_filename):
 
-    os.makedirs(log_dir,exist_ok=True)
-    log_path = os.path.join(log_dir,log_file)
+def _build_handlers(log_dir:str,log_file:str):
+    handlers = []
+    if LOG_TO_FILE:
+        os.makedirs(log_dir,exist_ok=True)
+        fileHandler = RotatingFileHandler(os.path.join(log_dir,log_file),maxBytes=5 * 1024 * 1024, backupCount=3)
+        fileHandler.setFormatter(_formatter())
+        handlers.append(fileHandler)
+
+    consoleHandler = logging.StreamHandler(sys.stdout)
+    consoleHandler.setFormatter(_formatter())
+    handlers.append(consoleHandler)
+
+    if not LOG_ASYNC:
+        return handlers
+    queueHandler = _NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    listener = QueueListener(queueHandler.queue,*handlers,respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return [queueHandler]
+
+
+def _shared_handlers(log_dir:str,log_file:str):
+    key = (os.path.abspath(log_dir),log_file)
+    if key not in _handlers:
+        _handlers[key] = _build_handlers(log_dir,log_file)
+    return _handlers[key]
+
+
+def _queue_handlers():
+    return [h for handlers in _handlers.values() for h in handlers if isinstance(h,_NonBlockingQueueHandler)]
+
+
+def dropped_records():
+    return sum(h.dropped for h in _queue_handlers())
+
+
+@atexit.register
+def stop_listeners():
+    # Flushes whatever is still queued.
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def _detach_listeners():
+    # A forked child inherits the queue handlers but not the listener threads
+    # draining them. Its records are written synchronously instead, so pool
+    # workers (joblib/loky, ProcessPoolExecutor) that exit without running atexit
+    # lose nothing; long-lived children opt back in with restart_listeners().
+    for listener in _listeners:
+        for handler in _queue_handlers():
+            if handler.queue is listener.queue:
+                handler.direct = listener.handlers
+    _listeners.clear()
+
+
+def restart_listeners():
+    # Async logging in a forked child (api.server workers). Each handler gets a
+    # fresh queue, since the parent's may have been mid-operation at fork time;
+    # call stop_listeners() before the child exits.
+    for handler in _queue_handlers():
+        if handler.direct is not None:
+            log_queue = queue.Queue(LOG_QUEUE_SIZE)
+            listener = QueueListener(log_queue,*handler.direct,respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            handler.queue = log_queue
+            handler.direct = None
+
+
+if hasattr(os,'register_at_fork'):
+    os.register_at_fork(after_in_child=_detach_listeners)
+
+
+def get_logger(name : str,log_dir = default_log_dir,log_file = default_filename):
 
-    log_format = logging.Formatter("[%(asctime)s] %(levelname)s - [%(name)s:%(lineno)d]  - %(message)s")
-    
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(LOG_LEVEL)
 
     if not logger.handlers:
-        fileHandler = RotatingFileHandler(log_path,maxBytes=5 * 1024 * 1024, backupCount=3)
-        fileHandler.setFormatter(log_format)
-        logger.addHandler(fileHandler)
-
-        consoleHandler = logging.StreamHandler(sys.stdout)
-        consoleHandler.setFormatter(log_format)
-        logger.addHandler(consoleHandler)
+        for handler in _shared_handlers(log_dir,log_file):
+            logger.addHandler(handler)
 
-    return logger
\ No newline at end of file
+    return logger
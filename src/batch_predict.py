@@ -0,0 +1,233 @@
+from config.logging_config import get_logger
+from concurrent.futures import ProcessPoolExecutor,FIRST_COMPLETED,wait
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from src.data_io import SUPPORTED_FORMATS,iter_frames,save_frame
+from src.data_preprocessing import make_derieved_features
+from src.features import FEATURE_SPEC
+from src.model_bundle import read_array_bundle,decision_function,predict_labels,probability_map
+
+logger = get_logger(__name__)
+
+# Offline bulk scoring:
+#   python -m src.batch_predict --input users.parquet --output local_Storage/predictions
+# The input is streamed in chunks and each chunk is scored by a worker process
+# that writes its own part file. Part files are written atomically, so a rerun
+# with the same arguments skips the chunks that already have one.
+
+RAW_COLUMNS = FEATURE_SPEC.raw_columns
+SUMMARY_FILE = '_SUCCESS.json'
+RUN_FILE = '_RUN.json'
+# Everything load_artifacts may read; their digest identifies the model of a run.
+MODEL_FILES = ('preprocessing_pipeline.pkl','label_encoder.pkl','trained_model.pkl','model_bundle')
+HASH_BLOCK = 1 << 20
+
+# Loaded once per worker process by _init_worker.
+_artifacts = {}
+
+
+def load_artifacts(models_dir:str,probabilities:bool = False):
+    try:
+        artifacts = {
+            'preprocessing_pipeline' : joblib.load(os.path.join(models_dir,'preprocessing_pipeline.pkl')),
+            'label_encoder' : joblib.load(os.path.join(models_dir,'label_encoder.pkl')),
+        }
+        bundle_dir = os.path.join(models_dir,'model_bundle')
+        if os.path.isdir(bundle_dir):
+            arrays,manifest = read_array_bundle(bundle_dir,mmap=True)
+            # Calibrated and logistic bundles give probabilities from the same
+            # decision scores as the labels.
+            if manifest.get('verified',False) and (not probabilities or probability_map(manifest) is not None):
+                artifacts['arrays'],artifacts['manifest'] = arrays,manifest
+                artifacts['probability'] = probability_map(manifest)
+                return artifacts
+
+        with open(os.path.join(models_dir,'trained_model.pkl'),'rb') as file:
+            artifacts['model'] = pickle.load(file)
+        if probabilities and not hasattr(artifacts['model'],'predict_proba'):
+            raise ValueError(f"{type(artifacts['model']).__name__} does not expose predict_proba")
+        return artifacts
+    except Exception as e:
+        logger.error('Error loading scoring artifacts from %s: %s',models_dir,e)
+        raise
+
+
+def _init_worker(models_dir:str,probabilities:bool):
+    _artifacts.update(load_artifacts(models_dir,probabilities))
+
+
+def score_frame(df:pd.DataFrame,artifacts:dict,probabilities:bool = False):
+    # Rows with a missing input are reported with an empty prediction instead of
+    # failing the whole chunk.
+    valid = df[RAW_COLUMNS].notna().all(axis=1).to_numpy()
+    out = pd.DataFrame(index=df.index)
+    out['prediction'] = pd.Series(None,index=df.index,dtype=object)
+    if not valid.any():
+        return out
+
+    features = make_derieved_features(df.loc[valid,RAW_COLUMNS].copy())
+    X = artifacts['preprocessing_pipeline'].transform(features)
+    label_encoder = artifacts['label_encoder']
+
+    if 'arrays' in artifacts:
+        scores = decision_function(artifacts['arrays'],artifacts['manifest'],X)
+        labels = np.array(artifacts['manifest']['labels'],dtype=object)
+        p = artifacts['probability'](scores) if probabilities else None
+        predicted = predict_labels(labels,artifacts['manifest'],scores,p)
+        if probabilities:
+            for label,values in zip(labels,(1.0 - p,p)):
+                out[f'proba_{label}'] = np.nan
+                out.loc[valid,f'proba_{label}'] = values
+    else:
+        model = artifacts['model']
+        if hasattr(model,'feature_names_in_'):
+            X = pd.DataFrame(X,columns=model.feature_names_in_)
+        if probabilities and hasattr(model,'predict_with_proba'):
+            # Calibrated model: both from one decision_function call.
+            pred,proba = model.predict_with_proba(X)
+        else:
+            pred = model.predict(X)
+            proba = model.predict_proba(X) if probabilities else None
+        predicted = label_encoder.inverse_transform(pred)
+        if probabilities:
+            for j,label in enumerate(label_encoder.classes_[np.asarray(model.classes_).astype(int)]):
+                out[f'proba_{label}'] = np.nan
+                out.loc[valid,f'proba_{label}'] = proba[:,j]
+    out.loc[valid,'prediction'] = predicted
+    return out
+
+
+def part_path(output_dir:str,index:int,fmt:str):
+    return os.path.join(output_dir,f'part-{index:05d}.{fmt}')
+
+
+def _score_chunk(index:int,offset:int,df:pd.DataFrame,output_dir:str,fmt:str,id_column:str,probabilities:bool):
+    out = score_frame(df,_artifacts,probabilities)
+    if id_column:
+        out.insert(0,id_column,df[id_column].to_numpy())
+    else:
+        out.insert(0,'row',np.arange(offset,offset + len(df)))
+
+    path = part_path(output_dir,index,fmt)
+    tmp_path = os.path.join(output_dir,f'.tmp-{os.getpid()}-{os.path.basename(path)}')
+    save_frame(out.reset_index(drop=True),tmp_path)
+    os.replace(tmp_path,path)
+    return len(df)
+
+
+def model_digest(models_dir:str):
+    digest = hashlib.sha256()
+    for name in MODEL_FILES:
+        path = os.path.join(models_dir,name)
+        if os.path.isfile(path):
+            paths = [path]
+        else:
+            paths = sorted(os.path.join(root,file) for root,_,files in os.walk(path) for file in files)
+        for path in paths:
+            digest.update(os.path.relpath(path,models_dir).encode())
+            with open(path,'rb') as f:
+                for block in iter(lambda: f.read(HASH_BLOCK),b''):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+def prepare_output(output_dir:str,run_config:dict):
+    # Part numbers only line up with the input, and parts only agree with each
+    # other, if a resumed run uses the same input, chunk size, output layout and
+    # model as the one that wrote them; otherwise the run starts over.
+    os.makedirs(output_dir,exist_ok=True)
+    run_path = os.path.join(output_dir,RUN_FILE)
+    previous = None
+    if os.path.exists(run_path):
+        with open(run_path) as f:
+            previous = json.load(f)
+    if previous == run_config:
+        logger.info('Resuming into %s',output_dir)
+    else:
+        if previous is not None:
+            changed = sorted(key for key in set(previous) | set(run_config) if previous.get(key) != run_config.get(key))
+            logger.warning('%s holds parts from a different run (%s changed); starting over',output_dir,', '.join(changed))
+        with open(run_path,'w') as f:
+            json.dump(run_config,f,indent=4)
+    for name in os.listdir(output_dir):
+        if name.startswith('.tmp-') or (previous != run_config and (name.startswith('part-') or name == SUMMARY_FILE)):
+            os.remove(os.path.join(output_dir,name))
+
+
+def run(input_path:str,output_dir:str,models_dir:str,chunksize:int,workers:int,fmt:str = 'parquet',id_column:str = None,probabilities:bool = False):
+    try:
+        prepare_output(output_dir,{
+            'input' : os.path.abspath(input_path),
+            'chunksize' : chunksize,
+            'format' : fmt,
+            'id_column' : id_column,
+            'probabilities' : probabilities,
+            'model' : model_digest(models_dir),
+        })
+        workers = workers or os.cpu_count() or 1
+        start = time.perf_counter()
+        rows_scored = rows_skipped = parts = 0
+        pending = set()
+
+        with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(models_dir,probabilities)) as pool:
+            offset = 0
+            for index,chunk in enumerate(iter_frames(input_path,chunksize)):
+                parts += 1
+                if os.path.exists(part_path(output_dir,index,fmt)):
+                    rows_skipped += len(chunk)
+                else:
+                    # Bound the chunks in flight so memory stays flat on huge inputs.
+                    if len(pending) >= 2 * workers:
+                        done,pending = wait(pending,return_when=FIRST_COMPLETED)
+                        rows_scored += sum(f.result() for f in done)
+                    pending.add(pool.submit(_score_chunk,index,offset,chunk,output_dir,fmt,id_column,probabilities))
+                offset += len(chunk)
+                if parts % 50 == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info('%s chunks read, %s rows scored (%.0f rows/s)',parts,rows_scored,rows_scored / elapsed)
+            done,_ = wait(pending)
+            rows_scored += sum(f.result() for f in done)
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            'input' : input_path,
+            'parts' : parts,
+            'rows' : offset,
+            'rows_scored' : rows_scored,
+            'rows_skipped' : rows_skipped,
+            'workers' : workers,
+            'elapsed_s' : round(elapsed,3),
+            'rows_per_s' : round(rows_scored / elapsed,1) if elapsed > 0 else None,
+        }
+        with open(os.path.join(output_dir,SUMMARY_FILE),'w') as f:
+            json.dump(summary,f,indent=4)
+        logger.info("Scored %s rows (%s already done) in %.1fs : %s rows/s",rows_scored,rows_skipped,elapsed,summary['rows_per_s'])
+        return summary
+    except Exception as e:
+        logger.error('Batch prediction failed: %s',e)
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score stored user records in bulk')
+    parser.add_argument('--input',required=True,help='CSV, Parquet or Feather file with the raw input columns')
+    parser.add_argument('--output',default='./local_Storage/predictions',help='Directory for the part files')
+    parser.add_argument('--models-dir',default='./local_Storage/models')
+    parser.add_argument('--chunksize',type=int,default=100000)
+    parser.add_argument('--workers',type=int,default=0,help='Worker processes (default: all cores)')
+    parser.add_argument('--format',default='parquet',choices=SUPPORTED_FORMATS)
+    parser.add_argument('--id-column',default=None,help='Input column copied to the output instead of the row number')
+    parser.add_argument('--probabilities',action='store_true',help='Add proba_<label> columns (calibrated when the model has a calibrator)')
+    args = parser.parse_args()
+    run(args.input,args.output,args.models_dir,args.chunksize,args.workers,args.format,args.id_column,args.probabilities)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+from config.logging_config import get_logger
+import numpy as np
+from scipy.optimize import minimize
+from sklearn.isotonic import IsotonicRegression
+
+logger = get_logger(__name__)
+
+# Probability calibration for binary classifiers that only expose decision
+# scores (e.g. an SVC built without probability=True, which would otherwise run
+# an internal 5-fold Platt fit and a slower predict). A Calibrator maps the
+# decision score of labels[1] to its probability:
+#
+#   sigmoid  : Platt scaling, p = 1 / (1 + exp(a * s + b))
+#   isotonic : monotone piecewise-linear interpolation between fitted breakpoints
+#
+# Both are a few floats or two short arrays, so the compiled scorer and bulk
+# scoring apply them in NumPy to the scores they already computed.
+
+METHODS = ('sigmoid','isotonic')
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _fit_platt(scores,y):
+    # Platt's smoothed targets and L-BFGS on the log loss, as sklearn's
+    # CalibratedClassifierCV(method='sigmoid') does.
+    n_pos = float(y.sum())
+    n_neg = len(y) - n_pos
+    t = np.where(y == 1,(n_pos + 1) / (n_pos + 2),1 / (n_neg + 2))
+
+    def loss(ab):
+        z = ab[0] * scores + ab[1]
+        value = (t * np.logaddexp(0,z) + (1 - t) * np.logaddexp(0,-z)).sum()
+        g = _sigmoid(z) - (1 - t)
+        return value,np.array([(g * scores).sum(),g.sum()])
+
+    result = minimize(loss,np.array([0.0,np.log((n_neg + 1) / (n_pos + 1))]),jac=True,method='L-BFGS-B')
+    return float(result.x[0]),float(result.x[1])
+
+
+class Calibrator:
+
+    def __init__(self,method:str,a:float = None,b:float = None,x = None,y = None):
+        if method not in METHODS:
+            raise ValueError(f'Calibration method must be one of {METHODS}, got {method}')
+        self.method = method
+        self.a = a
+        self.b = b
+        self.x = np.asarray(x,dtype=np.float64) if x is not None else None
+        self.y = np.asarray(y,dtype=np.float64) if y is not None else None
+
+    @classmethod
+    def fit(cls,method:str,scores,y):
+        # y is 1 where the true class is labels[1] (the class positive scores predict).
+        scores = np.asarray(scores,dtype=np.float64)
+        if scores.ndim != 1:
+            raise NotImplementedError('Calibration supports binary decision scores only')
+        y = np.asarray(y,dtype=np.int64)
+        if method == 'sigmoid':
+            return cls(method,*_fit_platt(scores,y))
+        if method == 'isotonic':
+            iso = IsotonicRegression(out_of_bounds='clip',y_min=0.0,y_max=1.0).fit(scores,y)
+            return cls(method,x=iso.X_thresholds_,y=iso.y_thresholds_)
+        raise ValueError(f'Calibration method must be one of {METHODS}, got {method}')
+
+    def predict(self,scores):
+        scores = np.asarray(scores,dtype=np.float64)
+        if self.method == 'sigmoid':
+            return _sigmoid(-(self.a * scores + self.b))
+        # np.interp holds the end values outside the breakpoints, like out_of_bounds='clip'.
+        return np.interp(scores,self.x,self.y)
+
+    def to_dict(self):
+        if self.method == 'sigmoid':
+            return {'method' : self.method,'a' : self.a,'b' : self.b}
+        return {'method' : self.method,'x' : self.x.tolist(),'y' : self.y.tolist()}
+
+    @classmethod
+    def from_dict(cls,config:dict):
+        return cls(config['method'],config.get('a'),config.get('b'),config.get('x'),config.get('y'))
+
+
+def calibrated_labels(classes,p):
+    # The more probable class under the calibrator. A calibrator fitted on held-out
+    # rows need not map score 0 to p = 0.5, so the sign of the raw score could
+    # return a label whose own probability is below 0.5. Ties go to classes[0],
+    # as argmax does.
+    return np.asarray(classes)[(np.asarray(p) > 0.5).astype(int)]
+
+
+class CalibratedModel:
+    # A fitted binary classifier plus the Calibrator for its decision scores.
+    # predict and predict_proba both come from one decision_function call, so the
+    # label is always the class with the higher calibrated probability. Other
+    # attributes (classes_, feature_names_in_, n_features_in_, ...) are the
+    # wrapped model's.
+
+    def __init__(self,model,calibrator:Calibrator):
+        self.model = model
+        self.calibrator = calibrator
+
+    def __getattr__(self,name):
+        # Only called for attributes not found on the wrapper itself; 'model' is
+        # excluded so unpickling (which looks up attributes before __dict__ is
+        # restored) does not recurse.
+        if name == 'model':
+            raise AttributeError(name)
+        return getattr(self.model,name)
+
+    def predict(self,X):
+        return self.predict_with_proba(X)[0]
+
+    def decision_function(self,X):
+        return self.model.decision_function(X)
+
+    def predict_proba(self,X):
+        return self.predict_with_proba(X)[1]
+
+    def predict_with_proba(self,X):
+        scores = self.model.decision_function(X)
+        p = self.calibrator.predict(scores)
+        return calibrated_labels(self.model.classes_,p),np.column_stack([1.0 - p,p])
+
+
+def calibrate(model,X,y,method:str):
+    # Fits the calibrator on a split the model was not trained on.
+    scores = model.decision_function(X)
+    calibrator = Calibrator.fit(method,scores,np.asarray(y) == model.classes_[1])
+    logger.info('Fitted %s calibration on %s held-out rows',method,len(scores))
+    return CalibratedModel(model,calibrator)
+
+
+def calibration_report(y_true,proba,n_bins:int = 10):
+    # Brier score, log loss and expected calibration error (equal-width bins) of
+    # P(class 1).
+    y_true = np.asarray(y_true,dtype=np.float64)
+    proba = np.clip(np.asarray(proba,dtype=np.float64),1e-15,1 - 1e-15)
+    bins = np.minimum((proba * n_bins).astype(int),n_bins - 1)
+    counts = np.bincount(bins,minlength=n_bins)
+    gaps = np.abs(np.bincount(bins,weights=proba,minlength=n_bins) - np.bincount(bins,weights=y_true,minlength=n_bins))
+    return {
+        'brier_score' : round(float(((proba - y_true) ** 2).mean()),6),
+        'log_loss' : round(float(-(y_true * np.log(proba) + (1 - y_true) * np.log(1 - proba)).mean()),6),
+        'ece' : round(float(gaps.sum() / counts.sum()),6),
+        'n_bins' : n_bins,
+    }
@@ -1,21 +1,58 @@
 from config.logging_config import get_logger
+from collections import Counter
 import pandas as pd
+import numpy as np
 import os
+import yaml
+from src.data_io import storage_config,data_path,save_frame,FrameWriter
+from src.profiling import profiled,profile_stage,add_rows
 
 logger = get_logger(__name__)
 
+# Explicit column types for chunked ingestion: the bounded counts fit in a nullable
+# Int8 and the Yes/No answers and target are categoricals.
+RAW_SCHEMA = {
+    'Time_spent_Alone' : 'Int8',
+    'Stage_fear' : 'category',
+    'Social_event_attendance' : 'Int8',
+    'Going_outside' : 'Int8',
+    'Drained_after_socializing' : 'category',
+    'Friends_circle_size' : 'Int8',
+    'Post_frequency' : 'Int8',
+    'Personality' : 'category',
+}
+
+
+def load_params(params_path:str):
+    try:
+        with open(params_path,'r') as f:
+            params = yaml.safe_load(f)
+        logger.info('Parameter retrieved from %s',params_path)
+        return params
+    except FileNotFoundError:
+        logger.error('File not found: %s', params_path)
+        raise
+    except yaml.YAMLError as e:
+        logger.error('YAML error: %s', e)
+        raise
+    except Exception as e:
+        logger.error('Unexpected error: %s', e)
+        raise
+
+@profiled
 def load_data(data_url:str):
     try:
         df = pd.read_csv(data_url,sep=',')
-        logger.info(f'Data loaded from {data_url}')
+        logger.info('Data loaded from %s',data_url)
         return df
     except pd.errors.ParserError as e:
-        logger.error(f'Failed to parse the CSV file : {e}')
+        logger.error('Failed to parse the CSV file : %s',e)
         raise
     except Exception as e:
-        logger.error(f'An unexpected error occured while loading data {e}')
+        logger.error('An unexpected error occured while loading data %s',e)
         raise
 
+@profiled
 def preprocessing(df:pd.DataFrame):
     try:
         logger.info('Pre-processing ...')
@@ -29,40 +66,151 @@ def preprocessing(df:pd.DataFrame):
         for i in cat_cols:
             final_df.loc[:,i] = final_df[i].fillna(df[i].mode()[0])
 
-        logger.info(f'Data Shape after preprocessing : {final_df.shape}')
+        logger.info('Data Shape after preprocessing : %s',final_df.shape)
         logger.info('Data Preprocessing Completed')
         return final_df
     
     except KeyError as e:
-        logger.error(f'Missing column in dataframe : {e}')
+        logger.error('Missing column in dataframe : %s',e)
         raise
     
     except Exception as e:
-        logger.error(f'An unexpected error occured during preprocessing : {e}') 
+        logger.error('An unexpected error occured during preprocessing : %s',e) 
         raise
 
-def save_data(df:pd.DataFrame,destination_path:str):
+@profiled
+def save_data(df:pd.DataFrame,destination_path:str,fmt:str = 'csv',compression:str = None):
     try:
         raw_data_path = os.path.join(destination_path,'raw')
         os.makedirs(raw_data_path,exist_ok=True)
-        logger.info(f'Saving Data to {raw_data_path}')
-        df.to_csv(os.path.join(raw_data_path,'raw_data.csv'),index=False)
-        logger.debug(f'Raw Processed data saved to {raw_data_path}')
+        logger.info('Saving Data to %s',raw_data_path)
+        save_frame(df,data_path(raw_data_path,'raw_data',fmt),compression)
+        logger.debug('Raw Processed data saved to %s',raw_data_path)
 
     except Exception as e:
-        logger.error(f'An unexpected error occured while saving the data : {e}')
+        logger.error('An unexpected error occured while saving the data : %s',e)
         raise
 
-def main():
+def stream_data(data_url:str,chunksize:int):
+    try:
+        return pd.read_csv(data_url,sep=',',dtype=RAW_SCHEMA,chunksize=chunksize)
+    except Exception as e:
+        logger.error('An unexpected error occured while opening %s for streaming %s',data_url,e)
+        raise
+
+
+def _median_from_counts(counts:Counter):
+    # Same definition as Series.median(): middle value, or mean of the two middle
+    # values for an even number of observations.
+    n = sum(counts.values())
+    if n == 0:
+        return np.nan
+    values = sorted(counts)
+    cumulative = np.cumsum([counts[v] for v in values])
+    lower = values[int(np.searchsorted(cumulative,(n - 1) // 2,side='right'))]
+    upper = values[int(np.searchsorted(cumulative,n // 2,side='right'))]
+    return (float(lower) + float(upper)) / 2
+
+
+def _mode_from_counts(counts:Counter):
+    # Same tie-break as Series.mode()[0]: smallest of the most frequent values.
+    if not counts:
+        return np.nan
+    top = max(counts.values())
+    return min(value for value,count in counts.items() if count == top)
+
+
+@profiled
+def compute_fill_values(data_url:str,chunksize:int):
+    # First pass: exact value histograms per column. The columns are bounded counts
+    # and Yes/No answers, so each histogram holds a handful of entries regardless
+    # of how many rows are streamed.
     try:
-        df = load_data(data_url='https://raw.githubusercontent.com/AkHiLdEvGoD/Datasets/refs/heads/main/personality_dataset.csv')
-        final_df = preprocessing(df)
-        save_data(final_df,destination_path='./local_Storage/data')
-        logger.info('Data Ingestion Completed')
+        counts = {}
+        kinds = {}
+        rows = 0
+        for chunk in stream_data(data_url,chunksize):
+            rows += len(chunk)
+            add_rows(len(chunk))
+            for column in chunk.columns:
+                series = chunk[column]
+                if column not in kinds:
+                    kinds[column] = 'num' if pd.api.types.is_numeric_dtype(series.dtype) else 'cat'
+                    counts[column] = Counter()
+                counts[column].update(series.dropna().value_counts().to_dict())
 
+        fill_values = {}
+        for column,kind in kinds.items():
+            fill_values[column] = _median_from_counts(counts[column]) if kind == 'num' else _mode_from_counts(counts[column])
+        logger.info('Fill values computed over %s rows : %s',rows,fill_values)
+        return fill_values,kinds
     except Exception as e:
-        logger.error(f'Failed to complete data ingestion process : {e}')
-        print('error',e)
+        logger.error('An unexpected error occured while computing fill values %s',e)
+        raise
+
+
+@profiled
+def ingest_chunked(data_url:str,destination_path:str,chunksize:int,fmt:str = 'csv',compression:str = None):
+    # Second pass: drop rows whose digest was already seen, fill missing values and
+    # append each chunk to the raw_data file. Only one chunk plus the set of 64-bit
+    # row digests is held in memory.
+    try:
+        fill_values,kinds = compute_fill_values(data_url,chunksize)
+
+        raw_data_path = os.path.join(destination_path,'raw')
+        os.makedirs(raw_data_path,exist_ok=True)
+        output_path = data_path(raw_data_path,'raw_data',fmt)
+        logger.info('Streaming data to %s',output_path)
+
+        seen = set()
+        rows_in = 0
+        with FrameWriter(output_path,compression) as writer:
+            for chunk in stream_data(data_url,chunksize):
+                rows_in += len(chunk)
+                add_rows(len(chunk))
+                digests = pd.util.hash_pandas_object(chunk,index=False).to_numpy()
+                keep = np.zeros(len(chunk),dtype=bool)
+                for j,digest in enumerate(digests.tolist()):
+                    if digest not in seen:
+                        seen.add(digest)
+                        keep[j] = True
+                chunk = chunk[keep]
+
+                out = {}
+                for column in chunk.columns:
+                    if kinds[column] == 'num':
+                        out[column] = chunk[column].astype('float64').fillna(fill_values[column])
+                    else:
+                        out[column] = chunk[column].astype(object).where(chunk[column].notna(),fill_values[column])
+                out = pd.DataFrame(out,columns=chunk.columns)
+                writer.write(out)
+
+        logger.info('Data Shape after preprocessing : (%s, %s) from %s streamed rows',writer.rows,len(kinds),rows_in)
+        logger.info('Data Preprocessing Completed')
+    except Exception as e:
+        logger.error('An unexpected error occured during chunked ingestion : %s',e)
+        raise
+
+
+def main():
+    with profile_stage('data_ingestion'):
+        try:
+            params = load_params(params_path='./params.yaml')
+            ingestion_params = params.get('data_ingestion',{})
+            fmt,compression = storage_config(params)
+            data_url = 'https://raw.githubusercontent.com/AkHiLdEvGoD/Datasets/refs/heads/main/personality_dataset.csv'
+
+            if ingestion_params.get('chunked',False):
+                ingest_chunked(data_url,'./local_Storage/data',ingestion_params.get('chunksize',50000),fmt,compression)
+            else:
+                df = load_data(data_url=data_url)
+                final_df = preprocessing(df)
+                save_data(final_df,destination_path='./local_Storage/data',fmt=fmt,compression=compression)
+            logger.info('Data Ingestion Completed')
+
+        except Exception as e:
+            logger.error('Failed to complete data ingestion process : %s',e)
+            print('error',e)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
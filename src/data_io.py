@@ -0,0 +1,123 @@
+from config.logging_config import get_logger
+import pandas as pd
+import os
+
+logger = get_logger(__name__)
+
+SUPPORTED_FORMATS = ('csv','parquet','feather')
+
+
+def storage_config(params:dict):
+    storage = params.get('storage',{}) or {}
+    fmt = storage.get('format','csv')
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f'Unsupported storage format: {fmt}')
+    return fmt,storage.get('compression')
+
+
+def data_path(directory:str,name:str,fmt:str):
+    return os.path.join(directory,f'{name}.{fmt}')
+
+
+def format_from_path(path:str):
+    fmt = os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f'Cannot infer storage format from {path}')
+    return fmt
+
+
+def save_frame(df:pd.DataFrame,path:str,compression:str = None):
+    try:
+        fmt = format_from_path(path)
+        os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+        if fmt == 'csv':
+            df.to_csv(path,index=False)
+        elif fmt == 'parquet':
+            df.to_parquet(path,index=False,compression=compression or 'zstd')
+        else:
+            # Uncompressed IPC files can be memory-mapped and read without copying.
+            df.reset_index(drop=True).to_feather(path,compression=compression or 'uncompressed')
+        logger.debug('Saved %s frame to %s',df.shape,path)
+    except Exception as e:
+        logger.error('Unexpected error occured while saving %s : %s',path,e)
+        raise
+
+
+def load_frame(path:str,columns:list = None):
+    try:
+        fmt = format_from_path(path)
+        if fmt == 'csv':
+            df = pd.read_csv(path,usecols=columns)
+        elif fmt == 'parquet':
+            df = pd.read_parquet(path,columns=columns)
+        else:
+            import pyarrow.feather as feather
+            df = feather.read_table(path,columns=columns,memory_map=True).to_pandas()
+        logger.debug('Loaded %s frame from %s',df.shape,path)
+        return df
+    except pd.errors.ParserError as e:
+        logger.error('Failed to parse the CSV file %s : %s',path,e)
+        raise
+    except Exception as e:
+        logger.error('Unexpected error occured while loading %s : %s',path,e)
+        raise
+
+
+def iter_frames(path:str,chunksize:int,columns:list = None):
+    # Yields DataFrames of at most `chunksize` rows so callers can process a file
+    # of any size with bounded memory. Feather files are memory-mapped and sliced.
+    try:
+        fmt = format_from_path(path)
+        if fmt == 'csv':
+            yield from pd.read_csv(path,usecols=columns,chunksize=chunksize)
+        elif fmt == 'parquet':
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize,columns=columns):
+                yield batch.to_pandas()
+        else:
+            import pyarrow.feather as feather
+            table = feather.read_table(path,columns=columns,memory_map=True)
+            for offset in range(0,table.num_rows,chunksize):
+                yield table.slice(offset,chunksize).to_pandas()
+    except Exception as e:
+        logger.error('Unexpected error occured while streaming %s : %s',path,e)
+        raise
+
+
+class FrameWriter:
+    # Appends DataFrame chunks to a single file of any supported format, so
+    # streaming stages keep only one chunk in memory.
+
+    def __init__(self,path:str,compression:str = None):
+        self.path = path
+        self.fmt = format_from_path(path)
+        self.compression = compression
+        self._writer = None
+        self._schema = None
+        self.rows = 0
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.',exist_ok=True)
+        return self
+
+    def write(self,df:pd.DataFrame):
+        if self.fmt == 'csv':
+            df.to_csv(self.path,mode='w' if self.rows == 0 else 'a',header=self.rows == 0,index=False)
+        else:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df,schema=self._schema,preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                if self.fmt == 'parquet':
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self.path,self._schema,compression=self.compression or 'zstd')
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression=None if self.compression in (None,'uncompressed') else self.compression)
+                    self._writer = pa.ipc.new_file(self.path,self._schema,options=options)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def __exit__(self,exc_type,exc,tb):
+        if self._writer is not None:
+            self._writer.close()
+        return False
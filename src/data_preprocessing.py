@@ -3,18 +3,27 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, OrdinalEncoder,LabelEncoder
 from sklearn.compose import ColumnTransformer
 import pandas as pd
+import argparse
 import joblib
 import os
 import yaml
+from src.data_io import storage_config,data_path,load_frame,save_frame
+from src.features import FEATURE_SPEC
+from src.stage_cache import StageCache
+from src.profiling import profiled,profile_stage,section,add_rows
+from src.drift import build_profile,save_profile,REFERENCE_PROFILE_FILE
 
 logger = get_logger(__name__)
 
+# Source files whose changes invalidate cached preprocessing outputs.
+CACHE_CODE = [os.path.join(os.path.dirname(os.path.abspath(__file__)),name) for name in ('data_preprocessing.py','features.py','data_io.py','drift.py')]
+
 
 def load_params(params_path:str):
     try:
         with open(params_path,'r') as f:
             params = yaml.safe_load(f)
-        logger.info(f'Parameter retrieved from {params_path}')
+        logger.info('Parameter retrieved from %s',params_path)
         return params
     
     except FileNotFoundError:
@@ -28,16 +37,18 @@ def load_params(params_path:str):
         raise
 
 
+@profiled
 def make_derieved_features(df:pd.DataFrame):
     try:
-        df['Offline_social_activity'] = df['Social_event_attendance'] * df['Going_outside']
-        logger.info(f'Derived feature added. Shape of dataframe : {df.shape}')
+        df = FEATURE_SPEC.add_derived(df)
+        logger.info('Derived feature added. Shape of dataframe : %s',df.shape)
         return df
     except Exception as e:
-        logger.error(f'Unexpected error occured while making derived features : {e}')
+        logger.error('Unexpected error occured while making derived features : %s',e)
         raise
 
 
+@profiled
 def preprocess_and_split(df:pd.DataFrame,target_col:str,test_size:float,save_dir:str):
     try:
         os.makedirs(save_dir,exist_ok=True)
@@ -59,25 +70,31 @@ def preprocess_and_split(df:pd.DataFrame,target_col:str,test_size:float,save_dir
             ]
         )
 
-        X_train_processed = preprocessing_pipeline.fit_transform(X_train)
-        X_test_processed = preprocessing_pipeline.transform(X_test)
+        # Keep the transformed feature names so they survive the stage boundary.
+        feature_names = preprocessing_pipeline.fit(X_train).get_feature_names_out()
+        X_train_processed = pd.DataFrame(preprocessing_pipeline.transform(X_train),columns=feature_names,index=X_train.index)
+        X_test_processed = pd.DataFrame(preprocessing_pipeline.transform(X_test),columns=feature_names,index=X_test.index)
         
         joblib.dump(preprocessing_pipeline,os.path.join(save_dir,'preprocessing_pipeline.pkl'))
         joblib.dump(le,os.path.join(save_dir,'label_encoder.pkl'))
-        logger.info(f'Preprocessing_pipeline saved to path : {save_dir}')
+        logger.info('Preprocessing_pipeline saved to path : %s',save_dir)
+
+        # Raw training distribution the API compares served traffic against.
+        save_profile(build_profile(X_train,le.inverse_transform(y_train)),os.path.join(save_dir,REFERENCE_PROFILE_FILE))
 
         logger.info('Preprocessing and splitting done.')
         return X_train_processed,X_test_processed,y_train,y_test
     
     except KeyError as e:
-        logger.error(f'Missing column in dataframe : {e}')
+        logger.error('Missing column in dataframe : %s',e)
         raise
     
     except Exception as e:
-        logger.error(f'Unexpected error occured while Encoding Categorical features : {e}')
+        logger.error('Unexpected error occured while Encoding Categorical features : %s',e)
         raise
 
-def save_preprocessed_data(X_train,X_test,y_train,y_test,destination_path:str):
+@profiled
+def save_preprocessed_data(X_train,X_test,y_train,y_test,destination_path:str,fmt:str = 'csv',compression:str = None):
     try:
         # train_df = pd.concat([pd.DataFrame(X_train),pd.Series(y_train,name='target')],axis=1)
         # test_df = pd.concat([pd.DataFrame(X_test),pd.Series(y_test,name='target')],axis=1)
@@ -92,34 +109,60 @@ def save_preprocessed_data(X_train,X_test,y_train,y_test,destination_path:str):
 
         test_df = pd.concat([X_test_df, y_test_series], axis=1)
 
+        # Columnar formats need string column names.
+        train_df.columns = train_df.columns.astype(str)
+        test_df.columns = test_df.columns.astype(str)
+
         processed_data_path = os.path.join(destination_path,'processed')
         os.makedirs(processed_data_path,exist_ok=True)
-        train_df.to_csv(os.path.join(processed_data_path,'train.csv'),index=False)
-        test_df.to_csv(os.path.join(processed_data_path,'test.csv'),index=False)
-        logger.info(f'Train and test data saved to path : {processed_data_path}')
-        logger.debug(f"Train shape: {train_df.shape} | Test shape: {test_df.shape}")
+        save_frame(train_df,data_path(processed_data_path,'train',fmt),compression)
+        save_frame(test_df,data_path(processed_data_path,'test',fmt),compression)
+        logger.info('Train and test data saved to path : %s',processed_data_path)
+        logger.debug("Train shape: %s | Test shape: %s",train_df.shape,test_df.shape)
 
     except Exception as e:
-        logger.error(f'Unexpected error occured while saving preprocessed data : {e}')
+        logger.error('Unexpected error occured while saving preprocessed data : %s',e)
         raise
 
 def main():
-    try:
-        params = load_params(params_path='./params.yaml')
-        test_size = params['data_preprocessing']['test_size']
-
-        df = pd.read_csv('./local_Storage/data/raw/raw_data.csv')
-
-
-        featured_df = make_derieved_features(df)
-        X_train,X_test,y_train,y_test = preprocess_and_split(featured_df,'Personality',test_size,'./local_Storage/models')
-        save_preprocessed_data(X_train,X_test,y_train,y_test,destination_path='./local_Storage/data/')
-        logger.info('Data Preprocessing Completed')
+    parser = argparse.ArgumentParser(description='Preprocess the raw data and split it into train and test sets')
+    parser.add_argument('--no-cache',action='store_true',help='Recompute even if the stage cache has these outputs')
+    args = parser.parse_args()
+
+    with profile_stage('data_preprocessing'):
+        try:
+            params = load_params(params_path='./params.yaml')
+            test_size = params['data_preprocessing']['test_size']
+            fmt,compression = storage_config(params)
+            raw_path = data_path('./local_Storage/data/raw','raw_data',fmt)
+
+            cache = StageCache.from_params(params,args.no_cache)
+            outputs = {
+                'train' : data_path('./local_Storage/data/processed','train',fmt),
+                'test' : data_path('./local_Storage/data/processed','test',fmt),
+                'preprocessing_pipeline' : './local_Storage/models/preprocessing_pipeline.pkl',
+                'label_encoder' : './local_Storage/models/label_encoder.pkl',
+                'reference_profile' : './local_Storage/models/reference_profile.json',
+            }
+            key = cache.key('data_preprocessing',[raw_path],
+                            {'data_preprocessing' : params['data_preprocessing'],'storage' : params.get('storage')},CACHE_CODE)
+            if cache.restore('data_preprocessing',key,outputs):
+                logger.info('Data Preprocessing restored from the stage cache')
+                return
+
+            with section('load_frame'):
+                df = load_frame(raw_path)
+                add_rows(len(df))
+
+
+            featured_df = make_derieved_features(df)
+            X_train,X_test,y_train,y_test = preprocess_and_split(featured_df,'Personality',test_size,'./local_Storage/models')
+            save_preprocessed_data(X_train,X_test,y_train,y_test,destination_path='./local_Storage/data/',fmt=fmt,compression=compression)
+            cache.store('data_preprocessing',key,outputs)
+            logger.info('Data Preprocessing Completed')
     
-    except Exception as e:
-        logger.error(f'Failed to complete data ingestion process : {e}')
+        except Exception as e:
+            logger.error('Failed to complete data ingestion process : %s',e)
 
 if __name__ == '__main__':
     main()
-
-
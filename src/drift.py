@@ -0,0 +1,102 @@
+from config.logging_config import get_logger
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from src.features import FEATURE_SPEC
+
+logger = get_logger(__name__)
+
+# Reference profile of the training split for drift monitoring (api/drift.py).
+# Every raw feature gets fixed bins: one per distinct value when it has at most
+# max_bins of them (all features of this dataset), otherwise max_bins quantile
+# bins. A bin is addressed by searchsorted(edges, value, side='right'), so the
+# serving side can count live values into the same bins in O(1) memory.
+#
+#   {"features" : {"Time_spent_Alone" : {"field", "kind", "edges", "counts", "missing"}, ...},
+#    "predictions" : {"classes" : [...], "counts" : [...]}}  <- training labels
+
+REFERENCE_PROFILE_FILE = 'reference_profile.json'
+PROFILE_VERSION = 1
+# Proportions are floored at this before taking logs, so an empty bin on one
+# side gives a large but finite PSI.
+PSI_EPSILON = 1e-4
+
+
+def feature_edges(values,max_bins:int = 20):
+    values = np.asarray(values,dtype=np.float64)
+    uniques = np.unique(values)
+    if len(uniques) <= max_bins:
+        return (uniques[:-1] + uniques[1:]) / 2
+    return np.unique(np.quantile(values,np.linspace(0,1,max_bins + 1)[1:-1]))
+
+
+def bin_counts(edges,values):
+    edges = np.asarray(edges,dtype=np.float64)
+    return np.bincount(np.searchsorted(edges,values,side='right'),minlength=len(edges) + 1)
+
+
+def build_profile(X:pd.DataFrame,labels,max_bins:int = 20,feature_spec = FEATURE_SPEC):
+    # X holds the raw columns of the training split; labels are its class names.
+    features = {}
+    for feature in feature_spec.raw:
+        column = X[feature['name']]
+        missing = column.isna().to_numpy()
+        present = column[~missing]
+        if feature['kind'] == 'binary':
+            values = (present == feature['values'][1]).to_numpy(dtype=np.float64)
+            edges = np.array([0.5])
+        else:
+            values = present.to_numpy(dtype=np.float64)
+            edges = feature_edges(values,max_bins)
+        features[feature['name']] = {
+            'field' : feature['field'],
+            'kind' : feature['kind'],
+            'edges' : edges.tolist(),
+            'counts' : bin_counts(edges,values).tolist(),
+            'missing' : int(missing.sum()),
+        }
+    classes,counts = np.unique(np.asarray(labels).astype(str),return_counts=True)
+    return {
+        'version' : PROFILE_VERSION,
+        'created_at' : time.time(),
+        'rows' : len(X),
+        'features' : features,
+        'predictions' : {'classes' : classes.tolist(),'counts' : counts.tolist()},
+    }
+
+
+def save_profile(profile:dict,path:str):
+    try:
+        os.makedirs(os.path.dirname(path) or '.',exist_ok=True)
+        with open(path,'w') as f:
+            json.dump(profile,f,indent=4)
+        logger.info('Reference profile of %s rows saved to %s',profile['rows'],path)
+    except Exception as e:
+        logger.error('Unexpected error occured while saving the reference profile : %s',e)
+        raise
+
+
+def load_profile(path:str):
+    with open(path) as f:
+        profile = json.load(f)
+    if profile.get('version') != PROFILE_VERSION:
+        raise ValueError(f"Unsupported reference profile version: {profile.get('version')}")
+    return profile
+
+
+def psi(reference,live,epsilon:float = PSI_EPSILON):
+    # Population stability index of two count vectors over the same bins.
+    p = np.maximum(np.asarray(reference,dtype=np.float64) / max(np.sum(reference),1),epsilon)
+    q = np.maximum(np.asarray(live,dtype=np.float64) / max(np.sum(live),1),epsilon)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks(reference,live):
+    # Largest gap between the two binned CDFs: the two-sample Kolmogorov-Smirnov
+    # statistic when every distinct value has its own bin, a lower bound on it
+    # with quantile bins.
+    p = np.cumsum(reference) / max(np.sum(reference),1)
+    q = np.cumsum(live) / max(np.sum(live),1)
+    return float(np.max(np.abs(p - q)))
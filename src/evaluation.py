@@ -0,0 +1,157 @@
+from config.logging_config import get_logger
+import numpy as np
+import pandas as pd
+
+logger = get_logger(__name__)
+
+# Binary classification metrics derived from confusion matrices. Every function
+# takes counts shaped (..., 2, 2) (rows = true class, columns = predicted class),
+# so one call scores a single matrix, a stack of bootstrap resamples or a stack
+# of slices. The positive class is label 1, matching sklearn's pos_label default;
+# undefined ratios are 0, matching its zero_division default.
+
+METRICS = ('accuracy','precision','recall','f1_score')
+
+
+def confusion_matrix(y_true,y_pred,n_classes:int = 2):
+    y_true = np.asarray(y_true,dtype=np.int64)
+    y_pred = np.asarray(y_pred,dtype=np.int64)
+    return np.bincount(y_true * n_classes + y_pred,minlength=n_classes * n_classes).reshape(n_classes,n_classes)
+
+
+def _ratio(num,den):
+    num = np.asarray(num,dtype=np.float64)
+    den = np.asarray(den,dtype=np.float64)
+    return np.divide(num,den,out=np.zeros(np.broadcast(num,den).shape),where=den != 0)
+
+
+def metrics_from_confusion(cm):
+    cm = np.asarray(cm)
+    tn,fp,fn,tp = cm[...,0,0],cm[...,0,1],cm[...,1,0],cm[...,1,1]
+    return {
+        'accuracy' : _ratio(tp + tn,tn + fp + fn + tp),
+        'precision' : _ratio(tp,tp + fp),
+        'recall' : _ratio(tp,tp + fn),
+        'f1_score' : _ratio(2 * tp,2 * tp + fp + fn),
+    }
+
+
+def bootstrap_confusions(cm,n_resamples:int,rng:np.random.Generator):
+    # Resampling n (y_true, y_pred) pairs with replacement and recounting them is
+    # the same as drawing the four cell counts from Multinomial(n, cm / n), so all
+    # resamples come from one draw of shape (n_resamples, 2, 2) without ever
+    # materialising the resampled indices.
+    cm = np.asarray(cm)
+    n = int(cm.sum())
+    if n == 0:
+        return np.zeros((n_resamples,) + cm.shape,dtype=np.int64)
+    return rng.multinomial(n,cm.ravel() / n,size=n_resamples).reshape((n_resamples,) + cm.shape)
+
+
+def confidence_intervals(cm,n_resamples:int,confidence:float,rng:np.random.Generator):
+    # Percentile bootstrap intervals for every metric.
+    resampled = metrics_from_confusion(bootstrap_confusions(cm,n_resamples,rng))
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for name,values in resampled.items():
+        low,high = np.quantile(values,[alpha,1 - alpha])
+        intervals[name] = {'low' : float(low),'high' : float(high)}
+    return intervals
+
+
+def bucket_labels(values:pd.Series,spec):
+    # spec 'categorical' keeps the values as buckets; a list of edges gives
+    # half-open numeric bins [lo, hi) labelled 'lo-hi'.
+    if spec == 'categorical':
+        return values.astype(str).to_numpy(dtype=object)
+    edges = np.asarray(spec,dtype=np.float64)
+    names = np.array([f'{lo:g}-{hi:g}' for lo,hi in zip(edges[:-1],edges[1:])] + ['other'],dtype=object)
+    index = np.searchsorted(edges,values.to_numpy(dtype=np.float64),side='right') - 1
+    index[(index < 0) | (index >= len(edges) - 1)] = len(edges) - 1
+    return names[index]
+
+
+def _bucket_order(name:str,spec):
+    # Numeric bins in edge order with 'other' last; categorical buckets by name.
+    if spec == 'categorical':
+        return (0,name)
+    return (1,0.0) if name == 'other' else (0,float(name.split('-')[0]))
+
+
+def slice_confusions(y_true,y_pred,buckets):
+    # One bincount over (bucket, true, predicted) gives every slice's confusion
+    # matrix at once.
+    names,codes = np.unique(buckets,return_inverse=True)
+    y_true = np.asarray(y_true,dtype=np.int64)
+    y_pred = np.asarray(y_pred,dtype=np.int64)
+    counts = np.bincount(codes * 4 + y_true * 2 + y_pred,minlength=len(names) * 4)
+    return names,counts.reshape(len(names),2,2)
+
+
+def _rounded(metrics:dict):
+    return {name : round(float(value),6) for name,value in metrics.items()}
+
+
+def evaluate_predictions(y_true,y_pred,features:pd.DataFrame = None,slices:dict = None,
+                         n_resamples:int = 2000,confidence:float = 0.95,random_state:int = 42,class_names:list = None):
+    rng = np.random.default_rng(random_state)
+    cm = confusion_matrix(y_true,y_pred)
+    report = _rounded(metrics_from_confusion(cm))
+    class_names = [str(c) for c in (class_names if class_names is not None else range(cm.shape[0]))]
+    report['confusion_matrix'] = {
+        'labels' : class_names,
+        'matrix' : cm.tolist(),
+    }
+    report['support'] = int(cm.sum())
+    if n_resamples:
+        report['confidence_intervals'] = {
+            'method' : 'percentile bootstrap',
+            'confidence' : confidence,
+            'n_resamples' : n_resamples,
+            **confidence_intervals(cm,n_resamples,confidence,rng),
+        }
+
+    report['slices'] = {}
+    for column,spec in (slices or {}).items():
+        names,cms = slice_confusions(y_true,y_pred,bucket_labels(features[column],spec))
+        per_slice = metrics_from_confusion(cms)
+        report['slices'][column] = {}
+        for i in sorted(range(len(names)),key=lambda i: _bucket_order(names[i],spec)):
+            name = names[i]
+            entry = {'support' : int(cms[i].sum()),**_rounded({metric : values[i] for metric,values in per_slice.items()})}
+            if n_resamples:
+                entry['confidence_intervals'] = confidence_intervals(cms[i],n_resamples,confidence,rng)
+            report['slices'][column][str(name)] = entry
+    return report
+
+
+def raw_feature_frame(X:pd.DataFrame,preprocessing_pipeline):
+    # Undo the fitted ColumnTransformer (StandardScaler on numeric columns,
+    # OrdinalEncoder on binary ones) so slices are defined on raw values.
+    raw = {}
+    for name,transformer,columns in preprocessing_pipeline.transformers_:
+        if name == 'remainder' or transformer == 'drop':
+            continue
+        encoded = X[[f'{name}__{column}' for column in columns]].to_numpy()
+        decoded = transformer.inverse_transform(encoded)
+        for j,column in enumerate(columns):
+            raw[column] = decoded[:,j]
+    return pd.DataFrame(raw,index=X.index)
+
+
+def flatten_report(report:dict):
+    # Scalar metrics for MLflow, whose metric names allow letters, digits and _-./ only.
+    flat = {name : report[name] for name in METRICS}
+    for name in METRICS:
+        interval = report.get('confidence_intervals',{}).get(name)
+        if interval:
+            flat[f'{name}_ci_low'] = interval['low']
+            flat[f'{name}_ci_high'] = interval['high']
+    for name in ('brier_score','log_loss','ece'):
+        if name in report.get('calibration',{}):
+            flat[f'calibration_{name}'] = report['calibration'][name]
+    for column,buckets in report.get('slices',{}).items():
+        for bucket,entry in buckets.items():
+            for name in METRICS:
+                flat[f'slice/{column}/{bucket}/{name}'] = entry[name]
+    return flat
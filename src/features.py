@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+# Single declaration of the model inputs shared by training (data_preprocessing,
+# batch_predict) and serving (api). Raw columns are listed in the order of the raw
+# dataset, derived features are appended after them. `field` is the API name of
+# a raw column. Binary columns are stored as their `values` ([false, true]) in the
+# datasets and as booleans on the serving path.
+FEATURE_SPEC_DICT = {
+    'version' : 1,
+    'raw' : [
+        {'name' : 'Time_spent_Alone','field' : 'time_spend_alone','kind' : 'numeric'},
+        {'name' : 'Stage_fear','field' : 'stage_fear','kind' : 'binary','values' : ['No','Yes']},
+        {'name' : 'Social_event_attendance','field' : 'social_event_attendance','kind' : 'numeric'},
+        {'name' : 'Going_outside','field' : 'going_outside','kind' : 'numeric'},
+        {'name' : 'Drained_after_socializing','field' : 'drained_after_socializing','kind' : 'binary','values' : ['No','Yes']},
+        {'name' : 'Friends_circle_size','field' : 'friends_circle_size','kind' : 'numeric'},
+        {'name' : 'Post_frequency','field' : 'post_frequency','kind' : 'numeric'},
+    ],
+    'derived' : [
+        {'name' : 'Offline_social_activity','op' : 'product','inputs' : ['Social_event_attendance','Going_outside']},
+    ],
+}
+
+# Vectorized operations a derived feature may use; all take float64 arrays.
+OPS = {
+    'product' : lambda a,b: a * b,
+    'sum' : lambda a,b: a + b,
+    'difference' : lambda a,b: a - b,
+    'ratio' : lambda a,b: np.divide(a,b,out=np.zeros_like(a),where=b != 0),
+}
+
+
+class FeatureSpec:
+
+    def __init__(self,spec:dict):
+        self.spec = spec
+        self.raw = spec['raw']
+        self.derived = spec['derived']
+        for feature in self.derived:
+            if feature['op'] not in OPS:
+                raise ValueError(f"Unsupported derived feature op: {feature['op']}")
+        self.numeric_columns = [f['name'] for f in self.raw if f['kind'] == 'numeric']
+        self.binary_columns = [f['name'] for f in self.raw if f['kind'] == 'binary']
+        self.raw_columns = [f['name'] for f in self.raw]
+        self.derived_columns = [f['name'] for f in self.derived]
+        self.columns = self.raw_columns + self.derived_columns
+        self.numeric_fields = {f['field'] : f['name'] for f in self.raw if f['kind'] == 'numeric'}
+        self.binary_fields = {f['field'] : f['name'] for f in self.raw if f['kind'] == 'binary'}
+        self.binary_values = {f['name'] : f['values'] for f in self.raw if f['kind'] == 'binary'}
+
+    @classmethod
+    def from_dict(cls,spec:dict):
+        return cls(spec)
+
+    def to_dict(self):
+        return self.spec
+
+    def derive(self,columns:dict):
+        # Adds the derived features to a dict of float64 arrays keyed by column.
+        for feature in self.derived:
+            inputs = [np.asarray(columns[name],dtype=np.float64) for name in feature['inputs']]
+            columns[feature['name']] = OPS[feature['op']](*inputs)
+        return columns
+
+    def encode(self,columns:dict):
+        # Raw columns (numbers, and booleans or their string values) -> float64
+        # numeric arrays, bool binary arrays and the derived features.
+        out = {}
+        for name in self.numeric_columns:
+            out[name] = np.asarray(columns[name],dtype=np.float64)
+        for name in self.binary_columns:
+            value = np.asarray(columns[name])
+            out[name] = value == self.binary_values[name][1] if value.dtype.kind in 'OUS' else value.astype(bool)
+        return self.derive(out)
+
+    def to_frame(self,encoded:dict):
+        # Encoded columns -> the DataFrame layout the sklearn preprocessing pipeline was fitted on.
+        frame = dict(encoded)
+        for name in self.binary_columns:
+            no,yes = self.binary_values[name]
+            frame[name] = np.where(encoded[name],yes,no).astype(object)
+        return pd.DataFrame(frame,columns=self.columns)
+
+    def add_derived(self,df:pd.DataFrame):
+        derived = self.derive({name : df[name].to_numpy(dtype=np.float64) for f in self.derived for name in f['inputs']})
+        for name in self.derived_columns:
+            df[name] = derived[name]
+        return df
+
+
+FEATURE_SPEC = FeatureSpec(FEATURE_SPEC_DICT)
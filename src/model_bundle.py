@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.kernel_approximation import Nystroem,RBFSampler
+from sklearn.linear_model import LogisticRegression,SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder
+from sklearn.svm import SVC
+from src.features import FEATURE_SPEC
+from src.calibration import Calibrator,CalibratedModel,calibrated_labels
+
+# Array bundle layout: one raw .npy file per numeric array (loadable with
+# np.load(mmap_mode='r') so every worker maps the same page-cache pages) plus a
+# small manifest.json with the scalar parameters, column order, labels and the
+# feature spec (src.features) the model was trained with.
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+
+def extract_arrays(preprocessing_pipeline,model,label_encoder,feature_spec = FEATURE_SPEC):
+    if not isinstance(preprocessing_pipeline,ColumnTransformer):
+        raise NotImplementedError(f'Unsupported preprocessing pipeline: {type(preprocessing_pipeline).__name__}')
+
+    arrays = {}
+    manifest = {'format_version' : FORMAT_VERSION,'num_columns' : [],'cat_columns' : [],'num_first' : True}
+    if isinstance(model,CalibratedModel):
+        manifest['calibration'] = model.calibrator.to_dict()
+        model = model.model
+    yes_codes,no_codes = [],[]
+    for name,transformer,columns in preprocessing_pipeline.transformers_:
+        if (isinstance(transformer,str) and transformer == 'drop') or len(columns) == 0:
+            continue
+        if isinstance(transformer,StandardScaler) and not manifest['num_columns']:
+            manifest['num_columns'] = list(columns)
+            arrays['scaler_mean'] = transformer.mean_ if transformer.with_mean else np.zeros(len(columns))
+            arrays['scaler_scale'] = transformer.scale_ if transformer.with_std else np.ones(len(columns))
+        elif isinstance(transformer,OrdinalEncoder) and not manifest['cat_columns']:
+            manifest['cat_columns'] = list(columns)
+            manifest['num_first'] = bool(manifest['num_columns'])
+            for column,categories in zip(columns,transformer.categories_):
+                categories = list(categories)
+                no,yes = feature_spec.binary_values.get(column,(None,None))
+                if yes not in categories or no not in categories:
+                    raise NotImplementedError(f'Unsupported categories for {column}: {categories}')
+                yes_codes.append(categories.index(yes))
+                no_codes.append(categories.index(no))
+        else:
+            raise NotImplementedError(f'Unsupported transformer {name}: {transformer}')
+    arrays['yes_codes'] = np.array(yes_codes,dtype=np.float64)
+    arrays['no_codes'] = np.array(no_codes,dtype=np.float64)
+
+    classes = np.asarray(model.classes_)
+    feature_map = scaler = None
+    if isinstance(model,Pipeline):
+        # A feature map (Nystroem / random Fourier features) or an extra scaler
+        # followed by a linear model.
+        if len(model.steps) != 2:
+            raise NotImplementedError(f'Unsupported pipeline: {[name for name,_ in model.steps]}')
+        feature_map,model = model.steps[0][1],model.steps[1][1]
+        if isinstance(feature_map,StandardScaler):
+            scaler,feature_map = feature_map,None
+
+    if isinstance(feature_map,Nystroem):
+        if feature_map.kernel not in ('linear','rbf','poly','sigmoid'):
+            raise NotImplementedError(f'Unsupported Nystroem kernel: {feature_map.kernel}')
+        n_features = len(manifest['num_columns']) + len(manifest['cat_columns'])
+        manifest['feature_map'] = 'nystroem'
+        manifest['feature_kernel'] = feature_map.kernel
+        manifest['gamma'] = float(feature_map.gamma if feature_map.gamma is not None else 1.0 / n_features)
+        manifest['coef0'] = float(feature_map.coef0 if feature_map.coef0 is not None else 1.0)
+        manifest['degree'] = int(feature_map.degree if feature_map.degree is not None else 3)
+        arrays['components'] = feature_map.components_
+        arrays['normalization'] = feature_map.normalization_
+    elif isinstance(feature_map,RBFSampler):
+        manifest['feature_map'] = 'rff'
+        arrays['random_weights'] = feature_map.random_weights_
+        arrays['random_offset'] = feature_map.random_offset_
+    elif feature_map is not None:
+        raise NotImplementedError(f'Unsupported feature map: {type(feature_map).__name__}')
+
+    if isinstance(model,SVC):
+        if 'feature_map' in manifest or scaler is not None or len(model.classes_) != 2 or model.kernel not in ('linear','rbf','poly','sigmoid'):
+            raise NotImplementedError(f'Unsupported SVC: kernel={model.kernel}, classes={len(model.classes_)}')
+        manifest['kernel'] = model.kernel
+        manifest['gamma'] = float(model._gamma)
+        manifest['coef0'] = float(model.coef0)
+        manifest['degree'] = int(model.degree)
+        arrays['support_vectors'] = model.support_vectors_
+        arrays['dual_coef'] = model.dual_coef_[0]
+        arrays['intercept'] = model.intercept_
+    elif hasattr(model,'coef_') and hasattr(model,'intercept_'):
+        manifest['kernel'] = 'linear_model'
+        coef,intercept = model.coef_,model.intercept_
+        if scaler is not None:
+            # Fold the scaler into the weights: w.(x - m)/s + b = (w/s).x + (b - w.m/s)
+            mean = scaler.mean_ if scaler.with_mean else np.zeros(coef.shape[1])
+            scale = scaler.scale_ if scaler.with_std else np.ones(coef.shape[1])
+            coef,intercept = coef / scale,intercept - (coef * (mean / scale)).sum(axis=1)
+        arrays['coef'] = coef
+        arrays['intercept'] = intercept
+        if len(classes) == 2 and (isinstance(model,LogisticRegression) or (isinstance(model,SGDClassifier) and model.loss == 'log_loss')):
+            # P(labels[1]) = sigmoid(decision score), as in predict_proba.
+            manifest['probability'] = 'logistic'
+    else:
+        raise NotImplementedError(f'Unsupported model: {type(model).__name__}')
+
+    manifest['labels'] = [str(label) for label in label_encoder.classes_[classes.astype(int)]]
+    manifest['feature_spec'] = feature_spec.to_dict()
+    arrays = {name : np.ascontiguousarray(value,dtype=np.float64) for name,value in arrays.items()}
+    return arrays,manifest
+
+
+def kernel_matrix(X,Y,kernel:str,gamma:float,coef0:float,degree:int,y_sq_norms = None):
+    if kernel == 'rbf':
+        if y_sq_norms is None:
+            y_sq_norms = (Y * Y).sum(axis=1)
+        sq_dist = (X * X).sum(axis=1)[:,None] + y_sq_norms[None,:] - 2.0 * (X @ Y.T)
+        return np.exp(-gamma * np.maximum(sq_dist,0.0))
+    elif kernel == 'linear':
+        return X @ Y.T
+    elif kernel == 'poly':
+        return (gamma * (X @ Y.T) + coef0) ** degree
+    return np.tanh(gamma * (X @ Y.T) + coef0)
+
+
+def transform_features(arrays:dict,manifest:dict,X,sq_norms = None):
+    # Applies the kernel approximation step of a pipeline model, if any.
+    feature_map = manifest.get('feature_map')
+    if feature_map == 'nystroem':
+        K = kernel_matrix(X,arrays['components'],manifest['feature_kernel'],manifest['gamma'],manifest['coef0'],manifest['degree'],sq_norms)
+        return K @ arrays['normalization'].T
+    elif feature_map == 'rff':
+        projection = X @ arrays['random_weights'] + arrays['random_offset']
+        np.cos(projection,out=projection)
+        projection *= np.sqrt(2.0 / projection.shape[1])
+        return projection
+    return X
+
+
+def decision_function(arrays:dict,manifest:dict,X,sv_sq_norms = None):
+    # sv_sq_norms are the precomputed squared row norms of the support vectors or
+    # Nystroem components, whichever the model carries.
+    kernel = manifest['kernel']
+    if kernel == 'linear_model':
+        X = transform_features(arrays,manifest,X,sv_sq_norms)
+        scores = X @ arrays['coef'].T + arrays['intercept']
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    K = kernel_matrix(X,arrays['support_vectors'],kernel,manifest['gamma'],manifest['coef0'],manifest['degree'],sv_sq_norms)
+    return K @ arrays['dual_coef'] + arrays['intercept'][0]
+
+
+def probability_map(manifest:dict):
+    # Maps binary decision scores to P(labels[1]): the fitted calibrator if the
+    # bundle has one, else the logistic link of a logistic model; None otherwise.
+    if 'calibration' in manifest:
+        return Calibrator.from_dict(manifest['calibration']).predict
+    if manifest.get('probability') == 'logistic':
+        return lambda scores: 1.0 / (1.0 + np.exp(-scores))
+    return None
+
+
+def verify_arrays(arrays:dict,manifest:dict,model,X):
+    # Number of rows of the (already preprocessed) matrix X on which the exported
+    # arrays and the fitted estimator predict different classes.
+    scores = decision_function(arrays,manifest,np.asarray(X,dtype=np.float64))
+    predicted = predict_labels(np.asarray(model.classes_),manifest,scores)
+    return int((predicted != np.asarray(model.predict(X))).sum())
+
+
+def predict_labels(labels,manifest:dict,scores,p = None):
+    # Labels for decision scores; calibrated bundles take the more probable class
+    # (p, if the caller already has it, is P(labels[1])).
+    if scores.ndim != 1:
+        return labels[scores.argmax(axis=1)]
+    if 'calibration' in manifest:
+        return calibrated_labels(labels,p if p is not None else probability_map(manifest)(scores))
+    return labels[(scores > 0).astype(int)]
+
+
+def write_array_bundle(bundle_dir:str,arrays:dict,manifest:dict):
+    parent = os.path.dirname(os.path.abspath(bundle_dir))
+    os.makedirs(parent,exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent,prefix='.tmp-')
+    os.chmod(tmp_dir,0o755)
+    try:
+        manifest = dict(manifest,arrays={})
+        for name,value in arrays.items():
+            path = os.path.join(tmp_dir,f'{name}.npy')
+            np.save(path,value,allow_pickle=False)
+            with open(path,'rb') as f:
+                checksum = hashlib.sha256(f.read()).hexdigest()
+            manifest['arrays'][name] = {'shape' : list(value.shape),'dtype' : str(value.dtype),'sha256' : checksum}
+        with open(os.path.join(tmp_dir,MANIFEST_FILE),'w') as f:
+            json.dump(manifest,f,indent=4)
+        if os.path.isdir(bundle_dir):
+            shutil.rmtree(bundle_dir)
+        os.replace(tmp_dir,bundle_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir,ignore_errors=True)
+        raise
+
+
+def read_array_bundle(bundle_dir:str,mmap:bool = True):
+    with open(os.path.join(bundle_dir,MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported array bundle format: {manifest.get('format_version')}")
+    arrays = {}
+    for name,meta in manifest['arrays'].items():
+        value = np.load(os.path.join(bundle_dir,f'{name}.npy'),mmap_mode='r' if mmap else None,allow_pickle=False)
+        if list(value.shape) != meta['shape']:
+            raise ValueError(f'Array {name} has shape {value.shape}, manifest says {meta["shape"]}')
+        arrays[name] = value
+    return arrays,manifest
@@ -1,38 +1,25 @@
 from config.logging_config import get_logger
-from sklearn.metrics import accuracy_score,recall_score,f1_score,precision_score
 import pickle
+import joblib
 import mlflow
-import mlflow.sklearn
-import dagshub
 import os
 import json
+import numpy as np
 import pandas as pd
 import yaml
+from src.data_io import storage_config,load_frame
+from src.evaluation import evaluate_predictions,raw_feature_frame,flatten_report
+from src.calibration import calibration_report
+from src.tracking import configure_tracking,set_experiment,log_batch,upload_artifacts
+from src.profiling import profiled,profile_stage,section
 
 logger = get_logger(__name__)
 
-# mlflow.set_tracking_uri("https://dagshub.com/AkHiLdEvGoD/Personality-Prediction.mlflow")
-# dagshub.init(repo_owner='AkHiLdEvGoD', repo_name='Personality-Prediction', mlflow=True)
-
-dagshub_token = os.getenv("PERSONALITY_TEST")
-if not dagshub_token:
-    raise EnvironmentError("PERSONALITY_TEST environment variable is not set")
-
-os.environ["MLFLOW_TRACKING_USERNAME"] = dagshub_token
-os.environ["MLFLOW_TRACKING_PASSWORD"] = dagshub_token
-
-dagshub_url = "https://dagshub.com"
-repo_owner = "AkHiLdEvGoD"
-repo_name = "Personality-Prediction"
-
-mlflow.set_tracking_uri(f'{dagshub_url}/{repo_owner}/{repo_name}.mlflow')
-
-
 def load_params(params_path:str):
     try:
         with open(params_path,'r') as f:
             params = yaml.safe_load(f)
-        logger.info(f'Parameter retrieved from {params_path}')
+        logger.info('Parameter retrieved from %s',params_path)
         return params
     except FileNotFoundError:
         logger.error('File not found: %s', params_path)
@@ -44,6 +31,7 @@ def load_params(params_path:str):
         logger.error('Unexpected error: %s', e)
         raise
 
+@profiled
 def load_model(model_path:str):
     try:
         with open(model_path,'rb') as f:
@@ -52,63 +40,73 @@ def load_model(model_path:str):
         return model
     
     except FileNotFoundError:
-        logger.error(f'Model not found at {model_path}')
+        logger.error('Model not found at %s',model_path)
         raise
 
     except Exception as e:
-        logger.error(f'Unexpected error occured while loading the model {e}')
+        logger.error('Unexpected error occured while loading the model %s',e)
         raise
 
+@profiled
 def load_data(data_path:str):
     try:
-        df = pd.read_csv(data_path)
-        logger.info(f'Data loaded from path {data_path}')
+        df = load_frame(data_path)
+        logger.info('Data loaded from path %s',data_path)
         return df
     
     except pd.errors.ParserError as e:
-        logger.error(f'Failed to parse the CSV file: {e}')
+        logger.error('Failed to parse the CSV file: %s',e)
         raise
     
     except Exception as e:
-        logger.error(f'Unexpected error occurred while loading the data: {e}')
+        logger.error('Unexpected error occurred while loading the data: %s',e)
         raise
 
-def evaluate_model(model,df:pd.DataFrame):
+@profiled
+def evaluate_model(model,df:pd.DataFrame,eval_params:dict = None,preprocessing_pipeline = None,label_encoder = None):
     try:
+        eval_params = eval_params or {}
         X = df.drop(columns = ['target'])
         y = df['target']
 
         y_pred = model.predict(X)
 
-        accuracy = accuracy_score(y,y_pred)
-        precision = precision_score(y,y_pred)
-        recall = recall_score(y,y_pred)
-        f1 = f1_score(y,y_pred)
-
-        metric_dict = {
-            'accuracy' : accuracy,
-            'precision' : precision,
-            'recall' : recall,
-            'f1_score' : f1
-        }
-
-        logger.info('All metrics of model evaluated')
-        return metric_dict
+        # Slices are defined on raw feature values, recovered from the transformed test set.
+        slices = eval_params.get('slices') or {}
+        features = raw_feature_frame(X,preprocessing_pipeline) if slices and preprocessing_pipeline is not None else None
+        if features is None:
+            slices = {}
+
+        report = evaluate_predictions(
+            y.to_numpy(),np.asarray(y_pred),features,slices,
+            n_resamples=eval_params.get('n_bootstrap',2000),
+            confidence=eval_params.get('confidence',0.95),
+            random_state=eval_params.get('random_state',42),
+            class_names=list(label_encoder.classes_) if label_encoder is not None else None,
+        )
+
+        if hasattr(model,'predict_proba') and len(np.unique(y)) <= 2:
+            # Quality of P(class 1) on the test set (calibrated or native probabilities).
+            report['calibration'] = calibration_report(y.to_numpy(),model.predict_proba(X)[:,1],eval_params.get('calibration_bins',10))
+
+        logger.info('All metrics of model evaluated : accuracy %.4f, bootstrap CI %s',report['accuracy'],report.get('confidence_intervals',{}).get('accuracy'))
+        return report
     
     except Exception as e:
-        logger.error(f'Unexpected error occured while evaluating model {e}')
+        logger.error('Unexpected error occured while evaluating model %s',e)
         raise
 
+@profiled
 def save_metrics(metric_dict,save_path):
     try:
         os.makedirs(save_path,exist_ok=True)
         metric_save_path = os.path.join(save_path,'metrics.json')
         with open(metric_save_path,'w') as f:
             json.dump(metric_dict,f,indent=4)
-        logger.info(f'Metrics saved at {metric_save_path}')
+        logger.info('Metrics saved at %s',metric_save_path)
     
     except Exception as e:
-        logger.error(f'Unexpected error occured while saving metrics : {e}')
+        logger.error('Unexpected error occured while saving metrics : %s',e)
         raise
 
 def save_model_info(run_id,model_path,file_path):
@@ -118,44 +116,46 @@ def save_model_info(run_id,model_path,file_path):
         model_info = {'run_id': run_id, 'model_path': model_path}
         with open(info_file_path, 'w') as file:
             json.dump(model_info, file, indent=4)
-        logger.debug(f'Model info saved to {file_path}')
+        logger.debug('Model info saved to %s',file_path)
     except Exception as e:
-        logger.error(f'Error occurred while saving the model info: {e}')
+        logger.error('Error occurred while saving the model info: %s',e)
         raise
 
 def main():
-    mlflow.set_experiment('dvc_pipeline')
-    with mlflow.start_run() as run:
+    with profile_stage('model_evaluation'):
         try:
             params = load_params('./params.yaml')
-            model = load_model('./local_Storage/models/trained_model.pkl')
-            df = load_data('./local_Storage/data/processed/test.csv')
-
-            metrics = evaluate_model(model,df)
-
-            save_metrics(metrics,'./local_Storage/metrics')
-
-            mlflow.log_metrics(metrics)
+            tracking = params.get('tracking',{})
+            with section('mlflow_setup'):
+                uri = configure_tracking(tracking)
+                set_experiment('dvc_pipeline',tracking)
+
+            with mlflow.start_run() as run:
+                model_path = './local_Storage/models/trained_model.pkl'
+                model = load_model(model_path)
+                fmt,_ = storage_config(params)
+                df = load_data(os.path.join('./local_Storage/data/processed',f'test.{fmt}'))
+
+                preprocessing_pipeline = joblib.load('./local_Storage/models/preprocessing_pipeline.pkl')
+                label_encoder = joblib.load('./local_Storage/models/label_encoder.pkl')
+                report = evaluate_model(model,df,params.get('model_evaluation',{}),preprocessing_pipeline,label_encoder)
+
+                save_metrics(report,'./local_Storage/metrics')
+
+                with section('mlflow_logging'):
+                    run_params = {'Model_type' : params['model_training']['model_type']}
+                    if hasattr(model,'get_params'):
+                        run_params.update(model.get_params())
+                    log_batch(run.info.run_id,params=run_params,metrics=flatten_report(report))
+                    upload_artifacts(run.info.run_id,uri,model_path,['./local_Storage/metrics/metrics.json'],tracking.get('background_uploads',True))
+
+                save_model_info(run.info.run_id,'./local_Storage/models','./local_Storage/model_info')
             
-            model_type = params['model_training']['model_type']
-            mlflow.log_param('Model_type',model_type)
-
-            if hasattr(model,'get_params'):
-                params = model.get_params()
-                for param_name, param_value in params.items():
-                    mlflow.log_param(param_name, param_value)
-            
-            mlflow.sklearn.log_model(model,'model')
-
-            mlflow.log_artifact('./local_Storage/metrics/metrics.json')
-
-            save_model_info(run.info.run_id,'./local_Storage/models','./local_Storage/model_info')
-            
-            logger.info('Model Evaluation logged and Completed')
+                logger.info('Model Evaluation logged and Completed')
 
         except Exception as e:
-            logger.error(f'Unexpected error occure during Model Evaluation : {e}')
-    
+            logger.error('Unexpected error occure during Model Evaluation : %s',e)
+
 if __name__ == '__main__':
     main()
 
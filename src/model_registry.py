@@ -1,44 +1,31 @@
 from config.logging_config import get_logger
 import json
 import mlflow
-import dagshub
-import os
+import yaml
 import warnings
+from src.profiling import profiled,profile_stage
+from src.tracking import configure_tracking,wait_for_upload
 warnings.simplefilter("ignore", UserWarning)
 warnings.filterwarnings("ignore")
 
 logger = get_logger(__name__)
 
-# mlflow.set_tracking_uri("https://dagshub.com/AkHiLdEvGoD/Personality-Prediction.mlflow")
-# dagshub.init(repo_owner='AkHiLdEvGoD', repo_name='Personality-Prediction', mlflow=True)
-
-dagshub_token = os.getenv("PERSONALITY_TEST")
-if not dagshub_token:
-    raise EnvironmentError("PERSONALITY_TEST environment variable is not set")
-
-os.environ["MLFLOW_TRACKING_USERNAME"] = dagshub_token
-os.environ["MLFLOW_TRACKING_PASSWORD"] = dagshub_token
-
-dagshub_url = "https://dagshub.com"
-repo_owner = "AkHiLdEvGoD"
-repo_name = "Personality-Prediction"
-
-mlflow.set_tracking_uri(f'{dagshub_url}/{repo_owner}/{repo_name}.mlflow')
-
+@profiled
 def load_model_info(file_path: str):
     try:
         with open(file_path, 'r') as file:
             model_info = json.load(file)
-        logger.debug(f'Model info loaded from {file_path}')
+        logger.debug('Model info loaded from %s',file_path)
         return model_info
     except FileNotFoundError:
-        logger.error(f'File not found: {file_path}')
+        logger.error('File not found: %s',file_path)
         raise
     except Exception as e:
-        logger.error(f'Unexpected error occurred while loading the model info: {e}')
+        logger.error('Unexpected error occurred while loading the model info: %s',e)
         raise
 
 
+@profiled
 def register_model(model_name: str, model_info: dict):
     try:
         model_uri = f"runs:/{model_info['run_id']}/model"
@@ -51,22 +38,30 @@ def register_model(model_name: str, model_info: dict):
             version=model_version.version,
             stage="Staging"
         )
-        logger.info(f'Model {model_name} version {model_version.version} registered and transitioned to Staging.')
+        logger.info('Model %s version %s registered and transitioned to Staging.',model_name,model_version.version)
     
     except Exception as e:
-        logger.error(f'Error during model registration: {e}')
+        logger.error('Error during model registration: %s',e)
         raise
 
 def main():
-    try:
-        model_info_path = './local_Storage/model_info/model_info.json'
-        model_info = load_model_info(model_info_path)
-        
-        model_name = "my_model"
-        register_model(model_name, model_info)
-    except Exception as e:
-        logger.error(f'Failed to complete the model registration process: {e}')
-        print(f"Error: {e}")
+    with profile_stage('model_registry'):
+        try:
+            with open('./params.yaml') as f:
+                tracking = (yaml.safe_load(f) or {}).get('tracking',{})
+            configure_tracking(tracking)
+
+            model_info_path = './local_Storage/model_info/model_info.json'
+            model_info = load_model_info(model_info_path)
+
+            # The evaluation stage uploads the model in the background.
+            wait_for_upload(model_info['run_id'],tracking.get('upload_timeout_s',600))
+
+            model_name = "my_model"
+            register_model(model_name, model_info)
+        except Exception as e:
+            logger.error('Failed to complete the model registration process: %s',e)
+            print(f"Error: {e}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,223 @@
+from config.logging_config import get_logger
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+import numpy as np
+from joblib import Parallel,delayed
+from scipy import stats
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedKFold,ParameterGrid,ParameterSampler
+
+logger = get_logger(__name__)
+
+STRATEGIES = ('grid','random','halving')
+DISTRIBUTIONS = {
+    'uniform' : lambda lo,hi: stats.uniform(lo,hi - lo),
+    'loguniform' : stats.loguniform,
+    'randint' : stats.randint,
+}
+
+
+def _parse_space(space:dict):
+    # params.yaml values are either a list of choices or a single-key mapping
+    # such as {loguniform: [0.001, 10]} for random search.
+    parsed = {}
+    for name,value in space.items():
+        if isinstance(value,dict):
+            (kind,args), = value.items()
+            if kind not in DISTRIBUTIONS:
+                raise ValueError(f'Unsupported distribution for {name}: {kind}')
+            parsed[name] = DISTRIBUTIONS[kind](*args)
+        else:
+            parsed[name] = value if isinstance(value,list) else [value]
+    return parsed
+
+
+def generate_candidates(search_params:dict,base_params:dict):
+    strategy = search_params.get('strategy','grid')
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unsupported search strategy: {strategy}')
+
+    candidates = []
+    for model_type,space in search_params['space'].items():
+        space = _parse_space(space or {})
+        has_distributions = any(not isinstance(v,list) for v in space.values())
+        if strategy == 'random' or has_distributions:
+            sampled = ParameterSampler(space,n_iter=search_params.get('n_iter',20),random_state=search_params.get('random_state',42))
+        else:
+            sampled = ParameterGrid(space)
+        for params in sampled:
+            params = {k : v.item() if isinstance(v,np.generic) else v for k,v in params.items()}
+            candidates.append((model_type,{**base_params.get(model_type,{}),**params}))
+    return candidates
+
+
+class FoldCache:
+    # Stratified fold splits materialized once as .npy files keyed on the data and
+    # the split settings. Workers memory-map them, so no candidate recomputes a
+    # split or receives a pickled copy of the fold matrices. Splits of other data
+    # are evicted least recently used first once the cache exceeds max_size_mb.
+
+    def __init__(self,cache_dir:str,X,y,cv:int,random_state:int,max_size_mb:float = 1024):
+        X = np.ascontiguousarray(X,dtype=np.float64)
+        y = np.ascontiguousarray(y)
+        digest = hashlib.sha256()
+        for part in (X.tobytes(),y.tobytes(),str(X.shape).encode(),f'{cv}:{random_state}'.encode()):
+            digest.update(part)
+        self.cache_dir = cache_dir
+        self.dir = os.path.join(cache_dir,digest.hexdigest()[:16])
+        self.cv = cv
+        self.max_bytes = int(max_size_mb * 2 ** 20)
+        done = os.path.join(self.dir,'done')
+
+        if os.path.exists(done):
+            # The marker's mtime records the last use.
+            os.utime(done)
+            logger.info('Reusing cached fold matrices from %s',self.dir)
+            self.evict()
+            return
+
+        os.makedirs(self.dir,exist_ok=True)
+        rng = np.random.default_rng(random_state)
+        splitter = StratifiedKFold(n_splits=cv,shuffle=True,random_state=random_state)
+        for k,(train_idx,val_idx) in enumerate(splitter.split(X,y)):
+            # Shuffled once so that successive halving can take a prefix as a random subsample.
+            train_idx = rng.permutation(train_idx)
+            for name,value in (('X_train',X[train_idx]),('y_train',y[train_idx]),('X_val',X[val_idx]),('y_val',y[val_idx])):
+                np.save(os.path.join(self.dir,f'{name}_{k}.npy'),value,allow_pickle=False)
+        open(done,'w').close()
+        logger.info('Cached %s fold matrices in %s',cv,self.dir)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir,name)
+            done = os.path.join(path,'done')
+            if os.path.exists(done):
+                size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                entries.append((os.path.getmtime(done),path,size))
+        entries.sort()
+        total = sum(size for _,_,size in entries)
+        evicted = 0
+        for _,path,size in entries:
+            if total <= self.max_bytes:
+                break
+            if path == self.dir:
+                continue
+            shutil.rmtree(path,ignore_errors=True)
+            total -= size
+            evicted += 1
+        if evicted:
+            logger.info('Evicted %s cached fold splits, %.1f MB left',evicted,total / 2 ** 20)
+        return evicted
+
+    def n_train(self,fold:int):
+        return np.load(os.path.join(self.dir,f'y_train_{fold}.npy'),mmap_mode='r').shape[0]
+
+
+def _fit_and_score(estimator,fold_dir:str,fold:int,n_rows:int,scoring:str):
+    load = lambda name: np.load(os.path.join(fold_dir,f'{name}_{fold}.npy'),mmap_mode='r')
+    X_train,y_train = load('X_train'),load('y_train')
+    if n_rows is not None:
+        X_train,y_train = X_train[:n_rows],y_train[:n_rows]
+
+    start = time.perf_counter()
+    estimator.fit(np.asarray(X_train),np.asarray(y_train))
+    fit_time = time.perf_counter() - start
+    score = get_scorer(scoring)(estimator,np.asarray(load('X_val')),np.asarray(load('y_val')))
+    return score,fit_time
+
+
+def evaluate(candidates:list,build_model,folds:FoldCache,scoring:str,n_jobs:int,n_rows:int = None):
+    # One task per (candidate, fold) so the process pool stays busy even when the
+    # candidate count is small compared to the number of cores.
+    tasks = [(i,k) for i in range(len(candidates)) for k in range(folds.cv)]
+    estimators = [build_model(model_type,params) for model_type,params in candidates]
+    results = Parallel(n_jobs=n_jobs,backend='loky')(
+        delayed(_fit_and_score)(clone(estimators[i]),folds.dir,k,n_rows,scoring) for i,k in tasks
+    )
+
+    rows = []
+    for i,(model_type,params) in enumerate(candidates):
+        scores = [results[t][0] for t,(j,_) in enumerate(tasks) if j == i]
+        fit_times = [results[t][1] for t,(j,_) in enumerate(tasks) if j == i]
+        rows.append({
+            'model_type' : model_type,
+            'params' : params,
+            'mean_score' : float(np.mean(scores)),
+            'std_score' : float(np.std(scores)),
+            'mean_fit_time_s' : float(np.mean(fit_times)),
+            'n_train_rows' : n_rows,
+        })
+    return rows
+
+
+def successive_halving(candidates:list,build_model,folds:FoldCache,scoring:str,n_jobs:int,factor:int,min_resources:int):
+    # Every rung scores the survivors on `factor` times more training rows than the
+    # previous one and keeps the best 1/factor; the last rung uses all rows.
+    max_resources = min(folds.n_train(k) for k in range(folds.cv))
+    n_rungs = 1 + int(math.floor(math.log(len(candidates),factor))) if len(candidates) > 1 else 1
+    n_rungs = max(1,min(n_rungs,1 + int(math.floor(math.log(max(max_resources / min_resources,1),factor)))))
+
+    leaderboard = []
+    survivors = candidates
+    for rung in range(n_rungs):
+        n_rows = max_resources // factor ** (n_rungs - 1 - rung)
+        rows = evaluate(survivors,build_model,folds,scoring,n_jobs,n_rows)
+        for row in rows:
+            row['rung'] = rung
+        rows.sort(key=lambda row: row['mean_score'],reverse=True)
+        leaderboard.extend(rows)
+        logger.info('Halving rung %s: %s candidates on %s rows, best %.4f',rung,len(survivors),n_rows,rows[0]["mean_score"])
+        survivors = [(row['model_type'],row['params']) for row in rows[:max(1,math.ceil(len(rows) / factor))]]
+    return leaderboard
+
+
+def run_search(X,y,search_params:dict,base_params:dict,build_model,cache_dir:str):
+    try:
+        strategy = search_params.get('strategy','grid')
+        scoring = search_params.get('scoring','accuracy')
+        n_jobs = search_params.get('n_jobs',-1)
+        candidates = generate_candidates(search_params,base_params)
+        logger.info('%s search over %s candidates with n_jobs=%s',strategy,len(candidates),n_jobs)
+
+        start = time.perf_counter()
+        folds = FoldCache(cache_dir,X,y,search_params.get('cv',5),search_params.get('random_state',42),search_params.get('fold_cache_max_mb',1024))
+        if strategy == 'halving':
+            leaderboard = successive_halving(
+                candidates,build_model,folds,scoring,n_jobs,
+                search_params.get('factor',3),search_params.get('min_resources',100)
+            )
+            final_rung = max(row['rung'] for row in leaderboard)
+            ranked = sorted([row for row in leaderboard if row['rung'] == final_rung],key=lambda row: row['mean_score'],reverse=True)
+        else:
+            leaderboard = evaluate(candidates,build_model,folds,scoring,n_jobs)
+            ranked = sorted(leaderboard,key=lambda row: row['mean_score'],reverse=True)
+        elapsed = time.perf_counter() - start
+
+        best = ranked[0]
+        leaderboard.sort(key=lambda row: (-row.get('rung',0),-row['mean_score']))
+        for rank,row in enumerate(leaderboard,start=1):
+            row['rank'] = rank
+        logger.info('Best candidate %s %s with %s=%.4f in %.1fs',best["model_type"],best["params"],scoring,best["mean_score"],elapsed)
+        summary = {'strategy' : strategy,'scoring' : scoring,'cv' : folds.cv,'n_jobs' : n_jobs,'elapsed_s' : round(elapsed,3),'best' : best,'leaderboard' : leaderboard}
+        return best,summary
+    except Exception as e:
+        logger.error('Error during hyperparameter search: %s',e)
+        raise
+
+
+def save_leaderboard(summary:dict,file_path:str):
+    try:
+        os.makedirs(os.path.dirname(file_path),exist_ok=True)
+        with open(file_path,'w') as f:
+            json.dump(summary,f,indent=4)
+        logger.info('Search leaderboard saved to %s',file_path)
+    except Exception as e:
+        logger.error('Error occurred while saving the leaderboard: %s',e)
+        raise
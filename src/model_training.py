@@ -1,18 +1,34 @@
 from config.logging_config import get_logger
-import pandas as pd
+import argparse
 import os
 import pickle
-from sklearn.linear_model import LogisticRegression
+import shutil
+import joblib
+from sklearn.linear_model import LogisticRegression,SGDClassifier
+from sklearn.kernel_approximation import Nystroem,RBFSampler
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+import numpy as np
 from sklearn.svm import SVC
+from sklearn.model_selection import train_test_split
 import yaml
+from src.model_bundle import extract_arrays,verify_arrays,write_array_bundle
+from src.data_io import storage_config,data_path,load_frame,iter_frames
+from src.model_search import run_search,save_leaderboard
+from src.profiling import profiled,profile_stage
+from src.stage_cache import StageCache
+from src.calibration import calibrate
 
 logger = get_logger(__name__)
 
+# Source files whose changes invalidate a cached model.
+CACHE_CODE = [os.path.join(os.path.dirname(os.path.abspath(__file__)),name) for name in ('model_training.py','model_search.py','model_bundle.py','calibration.py','features.py','data_io.py')]
+
 def load_params(params_path:str):
     try:
         with open(params_path,'r') as f:
             params = yaml.safe_load(f)
-        logger.info(f'Parameter retrieved from {params_path}')
+        logger.info('Parameter retrieved from %s',params_path)
         return params
     except FileNotFoundError:
         logger.error('File not found: %s', params_path)
@@ -24,39 +40,171 @@ def load_params(params_path:str):
         logger.error('Unexpected error: %s', e)
         raise
 
+@profiled
 def load_data(train_path):
     try:
-        df = pd.read_csv(train_path)
+        df = load_frame(train_path)
         X = df.drop(columns=['target'])
         y = df['target']
-        logger.info(f"Train data loaded with shape: {df.shape}")
+        logger.info("Train data loaded with shape: %s",df.shape)
         return X, y
     except Exception as e:
-        logger.error(f"Error loading training data: {e}")
+        logger.error("Error loading training data: %s",e)
         raise
 
+# Approximate RBF SVCs: an explicit feature map followed by a linear SGD classifier,
+# so training is linear in the number of rows and prediction cost is fixed by
+# n_components instead of the number of support vectors.
+KERNEL_APPROXIMATIONS = {
+    'svc_nystroem' : Nystroem,
+    'svc_rff' : RBFSampler,
+}
+
+def split_step_params(model_params:dict,feature_keys,classifier_keys):
+    # features__<key> / classifier__<key> target one step. An unprefixed key goes
+    # to every step that accepts it (random_state, n_jobs) unless a prefixed key
+    # overrides it, and one that neither step accepts is an error rather than
+    # silently dropped.
+    feature_params,classifier_params = {},{}
+    for key,value in sorted(model_params.items(),key=lambda item: '__' in item[0]):
+        step,_,name = key.rpartition('__')
+        if step == 'features' and name in feature_keys:
+            feature_params[name] = value
+        elif step == 'classifier' and name in classifier_keys:
+            classifier_params[name] = value
+        elif not step and (key in feature_keys or key in classifier_keys):
+            if key in feature_keys:
+                feature_params[key] = value
+            if key in classifier_keys:
+                classifier_params[key] = value
+        else:
+            raise ValueError(f'Unknown parameter {key} for the feature map or the SGD classifier')
+    return feature_params,classifier_params
+
+def build_model(model_type:str,model_params:dict):
+    if model_type == 'logistic_regression':
+        return LogisticRegression(**model_params)
+    elif model_type == "svc":
+        return SVC(**model_params)
+    elif model_type in KERNEL_APPROXIMATIONS:
+        feature_map = KERNEL_APPROXIMATIONS[model_type]
+        feature_params,classifier_params = split_step_params(model_params,feature_map().get_params(),SGDClassifier().get_params())
+        return Pipeline([
+            ('features',feature_map(**feature_params)),
+            ('classifier',SGDClassifier(**classifier_params))
+        ])
+    elif model_type == 'sgd_incremental':
+        return Pipeline([
+            ('scaler',StandardScaler()),
+            ('classifier',SGDClassifier(**model_params))
+        ])
+    raise ValueError(f"Unsupported model_type: {model_type}")
+
+@profiled
 def train_model(X,y,params):
     try:
         model_type = params['model_training']['model_type']
+        model_params = params['model_training'].get(model_type,{})
+        model = build_model(model_type,model_params)
 
-        if model_type == 'logistic_regression':
-            model_params = params['model_training']['logistic_regression']
-            model = LogisticRegression(**model_params)
-        
-        elif model_type == "svc":
-            model_params = params['model_training']["svc"]
-            model = SVC(**model_params)
+        model.fit(X, y)
+        logger.info("Model training completed")
+        return model
+    except Exception as e:
+        logger.error("Error during model training: %s",e)
+        raise
 
-        else:
-            raise ValueError(f"Unsupported model_type: {model_type}")
+def load_resumable_model(model_path:str):
+    try:
+        with open(model_path,'rb') as file:
+            model = pickle.load(file)
+        if isinstance(model,Pipeline) and isinstance(model[0],StandardScaler) and hasattr(model[-1],'partial_fit'):
+            logger.info('Resuming incremental training from %s',model_path)
+            return model
+        logger.warning('%s holds a %s, not an incremental model; starting from scratch',model_path,type(model).__name__)
+    except FileNotFoundError:
+        logger.info('No model at %s to resume from; starting from scratch',model_path)
+    return None
+
+@profiled
+def train_incremental(train_path:str,params,label_encoder_path:str,model_path:str):
+    # Streams the training file chunk by chunk: one pass updates the scaler
+    # statistics, then n_epochs passes call partial_fit on the classifier. Peak
+    # memory is one chunk plus the model, whatever the size of the file.
+    try:
+        training_params = params['model_training']
+        incremental = training_params.get('incremental',{})
+        chunksize = incremental.get('chunksize',50000)
+        n_epochs = incremental.get('n_epochs',1)
+
+        model = load_resumable_model(model_path) if incremental.get('resume',False) else None
+        if model is None:
+            model = build_model('sgd_incremental',training_params.get('sgd_incremental',{}))
+        scaler,classifier = model[0],model[-1]
+        classes = np.arange(len(joblib.load(label_encoder_path).classes_))
+
+        rows = 0
+        sample = None
+        for chunk in iter_frames(train_path,chunksize):
+            scaler.partial_fit(chunk.drop(columns=['target']))
+            rows += len(chunk)
+            if sample is None:
+                sample = chunk.drop(columns=['target'])
+        if rows == 0:
+            raise ValueError(f'No training rows in {train_path}')
+
+        for epoch in range(n_epochs):
+            for chunk in iter_frames(train_path,chunksize):
+                X = scaler.transform(chunk.drop(columns=['target']))
+                classifier.partial_fit(X,chunk['target'].to_numpy(),classes=classes)
+            logger.info('Incremental epoch %s/%s done over %s rows',epoch + 1,n_epochs,rows)
 
-        model.fit(X, y)
         logger.info("Model training completed")
+        return model,sample
+    except Exception as e:
+        logger.error("Error during incremental training: %s",e)
+        raise
+
+@profiled
+def search_model(X,y,params,leaderboard_path:str,cache_dir:str):
+    try:
+        training_params = params['model_training']
+        best,summary = run_search(X,y,training_params['search'],training_params,build_model,cache_dir)
+        save_leaderboard(summary,leaderboard_path)
+
+        model = build_model(best['model_type'],best['params'])
+        model.fit(X, y)
+        logger.info("Best %s refitted on the full training set",best['model_type'])
         return model
     except Exception as e:
-        logger.error(f"Error during model training: {e}")
+        logger.error("Error during hyperparameter search: %s",e)
+        raise
+
+@profiled
+def split_calibration(X,y,calibration_params:dict):
+    # Rows held out for the calibrator; the model is fitted on the rest.
+    try:
+        X_fit,X_cal,y_fit,y_cal = train_test_split(
+            X,y,
+            test_size=calibration_params.get('holdout_size',0.2),
+            stratify=y,
+            random_state=calibration_params.get('random_state',42)
+        )
+        logger.info('Holding out %s of %s training rows for calibration',len(X_cal),len(X))
+        return X_fit,X_cal,y_fit,y_cal
+    except Exception as e:
+        logger.error('Error splitting off the calibration set: %s',e)
+        raise
+
+@profiled(rows=None)
+def calibrate_model(model,X,y,method:str):
+    try:
+        return calibrate(model,X,y,method)
+    except Exception as e:
+        logger.error('Error calibrating the model: %s',e)
         raise
 
+@profiled
 def save_model(model,save_path:str):
     try:
         os.makedirs(save_path,exist_ok=True)
@@ -68,15 +216,89 @@ def save_model(model,save_path:str):
         logger.error('Error occurred while saving the model: %s', e)
         raise
 
-def main():
+@profiled
+def export_model_bundle(model,X,artifacts_dir:str,bundle_dir:str):
     try:
-        params = load_params('./params.yaml')
-        X, y = load_data('./local_Storage/data/processed/train.csv')
-        model = train_model(X,y,params)
-        save_model(model, './local_Storage/models')
-        logger.info('Model training done and model saved')
+        preprocessing_pipeline = joblib.load(os.path.join(artifacts_dir,'preprocessing_pipeline.pkl'))
+        label_encoder = joblib.load(os.path.join(artifacts_dir,'label_encoder.pkl'))
+        arrays,manifest = extract_arrays(preprocessing_pipeline,model,label_encoder)
+
+        mismatches = verify_arrays(arrays,manifest,model,X)
+        manifest['verified'] = mismatches == 0
+        if mismatches:
+            logger.warning('Array bundle disagrees with the fitted model on %s/%s training rows',mismatches,len(X))
+
+        write_array_bundle(bundle_dir,arrays,manifest)
+        logger.info('Array bundle exported to %s', bundle_dir)
+    except NotImplementedError as e:
+        # A bundle left by an earlier run would be served in place of this model.
+        shutil.rmtree(bundle_dir,ignore_errors=True)
+        logger.warning('Skipping array bundle export, model not supported : %s',e)
     except Exception as e:
-        logger.error(f"Training pipeline failed: {e}")
+        logger.error('Error occurred while exporting the array bundle: %s', e)
+        raise
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the model and export the array bundle')
+    parser.add_argument('--no-cache',action='store_true',help='Retrain even if the stage cache has this model')
+    args = parser.parse_args()
+
+    with profile_stage('model_training'):
+        try:
+            params = load_params('./params.yaml')
+            fmt,_ = storage_config(params)
+            train_path = data_path('./local_Storage/data/processed','train',fmt)
+            training_params = params['model_training']
+            model_type = training_params['model_type']
+            leaderboard_path = './local_Storage/metrics/leaderboard.json'
+
+            # Resumed incremental training depends on the previous model, which
+            # the cache key does not cover.
+            resume = model_type == 'sgd_incremental' and training_params.get('incremental',{}).get('resume',False)
+            cache = StageCache.from_params(params,args.no_cache or resume)
+            outputs = {
+                'trained_model' : './local_Storage/models/trained_model.pkl',
+                'model_bundle' : './local_Storage/models/model_bundle',
+                'leaderboard' : leaderboard_path,
+            }
+            key = cache.key('model_training',
+                            [train_path,'./local_Storage/models/preprocessing_pipeline.pkl','./local_Storage/models/label_encoder.pkl'],
+                            {'model_training' : training_params,'storage' : params.get('storage')},CACHE_CODE)
+            if cache.restore('model_training',key,outputs):
+                logger.info('Trained model restored from the stage cache')
+                return
+
+            calibration = training_params.get('calibration') or {}
+            method = calibration.get('method') or 'none'
+            if method != 'none' and model_type == 'sgd_incremental' and not training_params.get('search',{}).get('enabled',False):
+                # Streamed training never holds the train set, so there is no held-out split.
+                logger.warning('Calibration is not supported for sgd_incremental, skipping it')
+                method = 'none'
+
+            if training_params.get('search',{}).get('enabled',False):
+                X, y = load_data(train_path)
+                if method != 'none':
+                    X,X_cal,y,y_cal = split_calibration(X,y,calibration)
+                model = search_model(X,y,params,leaderboard_path,'./local_Storage/cache/folds')
+            else:
+                if model_type == 'sgd_incremental':
+                    # X is only the first chunk, kept to verify the exported arrays.
+                    model,X = train_incremental(train_path,params,'./local_Storage/models/label_encoder.pkl','./local_Storage/models/trained_model.pkl')
+                else:
+                    X, y = load_data(train_path)
+                    if method != 'none':
+                        X,X_cal,y,y_cal = split_calibration(X,y,calibration)
+                    model = train_model(X,y,params)
+                # Keep the DVC output present when the search is switched off.
+                save_leaderboard({'strategy' : None,'best' : {'model_type' : model_type,'params' : training_params.get(model_type,{})},'leaderboard' : []},leaderboard_path)
+            if method != 'none':
+                model = calibrate_model(model,X_cal,y_cal,method)
+            save_model(model, './local_Storage/models')
+            export_model_bundle(model, X, './local_Storage/models', './local_Storage/models/model_bundle')
+            cache.store('model_training',key,outputs)
+            logger.info('Model training done and model saved')
+        except Exception as e:
+            logger.error("Training pipeline failed: %s",e)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,216 @@
+from config.logging_config import get_logger
+from contextlib import contextmanager
+import functools
+import json
+import os
+import time
+import tracemalloc
+import pandas as pd
+import numpy as np
+
+logger = get_logger(__name__)
+
+# Per-stage instrumentation for the DVC pipeline. A stage's main() runs inside
+# profile_stage(name); functions decorated with @profiled (or blocks wrapped in
+# section(name)) are timed while a stage is active and cost one attribute check
+# otherwise (batch_predict, the API and the tests call the same functions).
+#
+# Each stage writes local_Storage/metrics/stage_timings/<stage>.json, declared as
+# a DVC metric, so `dvc metrics diff` compares wall/CPU time, peak traced memory
+# and rows per function across commits.
+#
+#   PIPELINE_TRACEMALLOC=0            skip tracemalloc (it slows allocation-heavy code)
+#   PIPELINE_PROFILE=cprofile         also dump local_Storage/profiles/<stage>.prof
+#   PIPELINE_PROFILE=pyinstrument     ... or <stage>.html (needs pyinstrument)
+
+TIMINGS_DIR = './local_Storage/metrics/stage_timings'
+PROFILES_DIR = './local_Storage/profiles'
+PROFILERS = ('off','cprofile','pyinstrument')
+
+
+class _Stage:
+
+    def __init__(self,name:str,trace_memory:bool):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.functions = {}
+        self.stack = []
+        self.extra = {}
+
+
+_active = None
+
+
+def _traced_peak():
+    return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+
+
+def _count_rows(result):
+    if isinstance(result,tuple) and result:
+        result = result[0]
+    if isinstance(result,(pd.DataFrame,pd.Series,np.ndarray)):
+        return len(result)
+    return 0
+
+
+def add_rows(n:int):
+    # For functions that stream their input and return nothing useful to count.
+    if _active is not None and _active.stack:
+        _active.stack[-1]['rows'] += int(n)
+
+
+def annotate(**fields):
+    # Extra top-level fields for the stage's timings file (e.g. cache hits). The
+    # file is a DVC metric, so values must be numbers.
+    for name,value in fields.items():
+        if isinstance(value,bool) or not isinstance(value,(int,float)):
+            raise TypeError(f'Timing field {name} must be an int or float, got {value!r}')
+    if _active is not None:
+        _active.extra.update(fields)
+
+
+@contextmanager
+def section(name:str):
+    stage = _active
+    if stage is None:
+        yield
+        return
+
+    # Nested sections reset the tracemalloc peak, so the parent keeps the highest
+    # peak seen before and inside each child.
+    if stage.stack:
+        stage.stack[-1]['peak'] = max(stage.stack[-1]['peak'],_traced_peak())
+    if stage.trace_memory:
+        tracemalloc.reset_peak()
+    frame = {'rows' : 0,'peak' : 0}
+    stage.stack.append(frame)
+    wall,cpu = time.perf_counter(),time.process_time()
+    try:
+        yield frame
+    finally:
+        wall,cpu = time.perf_counter() - wall,time.process_time() - cpu
+        stage.stack.pop()
+        peak = max(frame['peak'],_traced_peak())
+        if stage.stack:
+            stage.stack[-1]['peak'] = max(stage.stack[-1]['peak'],peak)
+
+        record = stage.functions.setdefault(name,{'calls' : 0,'wall_s' : 0.0,'cpu_s' : 0.0,'peak_mb' : 0.0,'rows' : 0})
+        record['calls'] += 1
+        record['wall_s'] += wall
+        record['cpu_s'] += cpu
+        record['peak_mb'] = max(record['peak_mb'],peak / 2 ** 20)
+        record['rows'] += frame['rows']
+
+
+def profiled(fn=None,*,name:str = None,rows=_count_rows):
+    # rows(result) -> rows processed; the default counts the first DataFrame,
+    # Series or array returned.
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args,**kwargs):
+            if _active is None:
+                return fn(*args,**kwargs)
+            with section(label) as frame:
+                result = fn(*args,**kwargs)
+                frame['rows'] += rows(result) if rows is not None else 0
+                return result
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+
+def _start_profiler(kind:str):
+    if kind == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    if kind == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            raise ImportError('PIPELINE_PROFILE=pyinstrument needs `pip install pyinstrument`')
+        profiler = Profiler()
+        profiler.start()
+        return profiler
+    return None
+
+
+def _dump_profiler(profiler,kind:str,stage:str,profiles_dir:str):
+    os.makedirs(profiles_dir,exist_ok=True)
+    if kind == 'cprofile':
+        profiler.disable()
+        path = os.path.join(profiles_dir,f'{stage}.prof')
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = os.path.join(profiles_dir,f'{stage}.html')
+        with open(path,'w') as f:
+            f.write(profiler.output_html())
+    logger.info('%s profile for %s written to %s',kind,stage,path)
+
+
+def _max_rss_mb():
+    try:
+        import resource
+        import sys
+        # ru_maxrss is in KiB on Linux and bytes on macOS.
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+    except ImportError:
+        return None
+
+
+@contextmanager
+def profile_stage(stage:str,timings_dir:str = TIMINGS_DIR,profiles_dir:str = PROFILES_DIR):
+    global _active
+    kind = os.getenv('PIPELINE_PROFILE','off').lower()
+    if kind not in PROFILERS:
+        raise ValueError(f'PIPELINE_PROFILE must be one of {PROFILERS}, got {kind}')
+    trace_memory = os.getenv('PIPELINE_TRACEMALLOC','1') != '0'
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _active = _Stage(stage,trace_memory)
+    profiler = _start_profiler(kind)
+    try:
+        with section(stage):
+            yield
+    finally:
+        if profiler is not None:
+            _dump_profiler(profiler,kind,stage,profiles_dir)
+        functions,extra,_active = _active.functions,_active.extra,None
+        if started_tracing:
+            tracemalloc.stop()
+
+        total = functions.pop(stage)
+        max_rss = _max_rss_mb()
+        # Only numbers, so `dvc metrics diff` compares every field; measurements
+        # that were not taken are left out rather than written as null.
+        timings = {
+            'wall_s' : round(total['wall_s'],4),
+            'cpu_s' : round(total['cpu_s'],4),
+            'peak_mb' : round(total['peak_mb'],2) if trace_memory else None,
+            'max_rss_mb' : round(max_rss,2) if max_rss is not None else None,
+            'rows' : max((f['rows'] for f in functions.values()),default=0),
+            **extra,
+        }
+        timings = {k : v for k,v in timings.items() if v is not None}
+        timings['functions'] = {
+            name : {
+                'calls' : f['calls'],
+                'wall_s' : round(f['wall_s'],4),
+                'cpu_s' : round(f['cpu_s'],4),
+                **({'peak_mb' : round(f['peak_mb'],2)} if trace_memory else {}),
+                'rows' : f['rows'],
+            } for name,f in functions.items()
+        }
+        os.makedirs(timings_dir,exist_ok=True)
+        path = os.path.join(timings_dir,f'{stage}.json')
+        with open(path,'w') as f:
+            json.dump(timings,f,indent=4)
+        slowest = sorted(timings['functions'].items(),key=lambda item: -item[1]['wall_s'])[:3]
+        logger.info('%s: %ss wall, %ss CPU, peak %s MB; %s',stage,timings['wall_s'],timings['cpu_s'],timings.get('peak_mb'),
+                    ', '.join(f"{name} {f['wall_s']}s" for name,f in slowest))
@@ -0,0 +1,207 @@
+from config.logging_config import get_logger
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+import sklearn
+from src.profiling import annotate
+
+logger = get_logger(__name__)
+
+# Content-addressed cache of stage outputs for runs outside `dvc repro`
+# (notebooks, CI, batch jobs). An entry is keyed on the SHA-256 of the stage's
+# input files, the params it reads and its source files (plus the Python and
+# sklearn versions), and holds copies of everything the stage writes. A hit copies
+# the outputs back instead of recomputing them. Entries are evicted least recently
+# used first once the cache exceeds stage_cache.max_size_mb.
+#
+#   stage_cache:
+#     enabled: true
+#     dir: ./local_Storage/cache/stages
+#     max_size_mb: 2048
+#
+# `python -m src.data_preprocessing --no-cache` (or STAGE_CACHE=0) bypasses it.
+
+HASH_BLOCK = 1 << 20
+
+
+def _dir_size(path:str):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root,name)) for root,_,files in os.walk(path) for name in files)
+
+
+def _copy(src:str,dst:str):
+    # Copies rather than hard links: stages rewrite their outputs in place, which
+    # would corrupt a linked cache entry.
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    os.makedirs(os.path.dirname(dst) or '.',exist_ok=True)
+    if os.path.isdir(src):
+        shutil.copytree(src,dst)
+    else:
+        shutil.copy2(src,dst)
+
+
+def _remove(path:str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class StageCache:
+
+    def __init__(self,root:str = './local_Storage/cache/stages',max_size_mb:float = 2048,enabled:bool = True):
+        self.root = root
+        self.max_bytes = int(max_size_mb * 2 ** 20)
+        self.enabled = enabled
+        self._hashes_path = os.path.join(root,'file_hashes.json')
+
+    @classmethod
+    def from_params(cls,params:dict,no_cache:bool = False):
+        config = params.get('stage_cache',{}) or {}
+        enabled = config.get('enabled',True) and not no_cache and os.getenv('STAGE_CACHE','1') != '0'
+        return cls(config.get('dir','./local_Storage/cache/stages'),config.get('max_size_mb',2048),enabled)
+
+    def _file_hashes(self):
+        try:
+            with open(self._hashes_path) as f:
+                return json.load(f)
+        except (FileNotFoundError,json.JSONDecodeError):
+            return {}
+
+    def file_hash(self,path:str,memo:dict = None):
+        # Hashes are memoised on (size, mtime) so unchanged multi-GB inputs are
+        # not re-read on every run.
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root,dirs,files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    full = os.path.join(root,name)
+                    digest.update(os.path.relpath(full,path).encode())
+                    digest.update(self.file_hash(full,memo).encode())
+            return digest.hexdigest()
+
+        stat = os.stat(path)
+        memo = memo if memo is not None else {}
+        key = os.path.abspath(path)
+        cached = memo.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+        digest = hashlib.sha256()
+        with open(path,'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK),b''):
+                digest.update(block)
+        memo[key] = {'size' : stat.st_size,'mtime_ns' : stat.st_mtime_ns,'sha256' : digest.hexdigest()}
+        return memo[key]['sha256']
+
+    def key(self,stage:str,inputs:list,params:dict,code:list):
+        if not self.enabled:
+            return None
+        memo = self._file_hashes()
+        description = {
+            'stage' : stage,
+            'inputs' : {path : self.file_hash(path,memo) for path in inputs},
+            'params' : params,
+            'code' : {os.path.basename(path) : self.file_hash(path,memo) for path in code},
+            'python' : sys.version.split()[0],
+            'sklearn' : sklearn.__version__,
+        }
+        os.makedirs(self.root,exist_ok=True)
+        with open(self._hashes_path + '.tmp','w') as f:
+            json.dump(memo,f)
+        os.replace(self._hashes_path + '.tmp',self._hashes_path)
+        return hashlib.sha256(json.dumps(description,sort_keys=True,default=str).encode()).hexdigest()
+
+    def _entry(self,stage:str,key:str):
+        return os.path.join(self.root,stage,key)
+
+    def restore(self,stage:str,key:str,outputs:dict):
+        # outputs maps a name to the path the stage writes it to.
+        if not self.enabled:
+            self._report(stage,'disabled')
+            return False
+        entry = self._entry(stage,key)
+        meta_path = os.path.join(entry,'meta.json')
+        if not os.path.exists(meta_path):
+            self._report(stage,'miss',key)
+            return False
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            # Outputs the stage did not produce (e.g. no array bundle for an
+            # unsupported model) were not stored; whatever an earlier run left at
+            # their paths is removed, as the stage itself would have done.
+            for name,path in outputs.items():
+                if name in meta['outputs']:
+                    _copy(os.path.join(entry,name),path)
+                else:
+                    _remove(path)
+            meta['last_used'] = time.time()
+            meta['hits'] = meta.get('hits',0) + 1
+            with open(meta_path,'w') as f:
+                json.dump(meta,f,indent=4)
+        except Exception as e:
+            logger.warning('Stage cache entry %s/%s unusable, recomputing : %s',stage,key[:12],e)
+            shutil.rmtree(entry,ignore_errors=True)
+            self._report(stage,'miss',key)
+            return False
+        self._report(stage,'hit',key)
+        return True
+
+    def store(self,stage:str,key:str,outputs:dict):
+        if not self.enabled:
+            return
+        try:
+            entry = self._entry(stage,key)
+            tmp = f'{entry}.tmp-{os.getpid()}'
+            shutil.rmtree(tmp,ignore_errors=True)
+            outputs = {name : path for name,path in outputs.items() if os.path.exists(path)}
+            for name,path in outputs.items():
+                _copy(path,os.path.join(tmp,name))
+            now = time.time()
+            with open(os.path.join(tmp,'meta.json'),'w') as f:
+                json.dump({'stage' : stage,'created' : now,'last_used' : now,'hits' : 0,'size' : _dir_size(tmp),'outputs' : outputs},f,indent=4)
+            shutil.rmtree(entry,ignore_errors=True)
+            os.replace(tmp,entry)
+            logger.info('Stored %s outputs in stage cache %s',stage,key[:12])
+            self.evict()
+        except Exception as e:
+            # A failed store only costs a future miss.
+            logger.warning('Could not store %s outputs in the stage cache : %s',stage,e)
+
+    def entries(self):
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        for stage in os.listdir(self.root):
+            stage_dir = os.path.join(self.root,stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for key in os.listdir(stage_dir):
+                meta_path = os.path.join(stage_dir,key,'meta.json')
+                if os.path.exists(meta_path):
+                    with open(meta_path) as f:
+                        found.append((os.path.join(stage_dir,key),json.load(f)))
+        return found
+
+    def evict(self):
+        entries = sorted(self.entries(),key=lambda entry: entry[1]['last_used'])
+        total = sum(meta['size'] for _,meta in entries)
+        evicted = 0
+        while entries and total > self.max_bytes:
+            path,meta = entries.pop(0)
+            shutil.rmtree(path,ignore_errors=True)
+            total -= meta['size']
+            evicted += 1
+        if evicted:
+            logger.info('Evicted %s stage cache entries, %.1f MB left',evicted,total / 2 ** 20)
+        return evicted
+
+    def _report(self,stage:str,result:str,key:str = None):
+        logger.info('Stage cache %s for %s%s',result,stage,f' ({key[:12]})' if key else '')
+        annotate(cache_hit=int(result == 'hit'),cache_enabled=int(result != 'disabled'))
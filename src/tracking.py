@@ -0,0 +1,284 @@
+from config.logging_config import get_logger
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from src.profiling import profiled
+
+logger = get_logger(__name__)
+
+# MLflow tracking backends for the pipeline:
+#   remote : the DagsHub MLflow server (needs PERSONALITY_TEST)
+#   file   : a local file store, for air-gapped machines and test runs
+#   sqlite : a local SQLite store (also supports the model registry)
+# TRACKING_BACKEND overrides `tracking.backend` in params.yaml.
+#
+# Params and metrics go out in log_batch calls instead of one request per key.
+# Artifacts (the model and metrics.json) are copied to a staging directory and
+# uploaded by a detached process, so the evaluation stage does not wait on the
+# network; model_registry waits for that upload before registering. Local runs
+# can be pushed to the remote server later:
+#
+#   python -m src.tracking sync
+#   python -m src.tracking upload --run-id <id>      # retry a failed upload
+
+DAGSHUB_URL = 'https://dagshub.com'
+REPO_OWNER = 'AkHiLdEvGoD'
+REPO_NAME = 'Personality-Prediction'
+BACKENDS = ('remote','file','sqlite')
+UPLOADS_DIR = './local_Storage/tracking/uploads'
+SYNC_TAG = 'sync.remote_run_id'
+
+# Server-side limits of a single log_batch request.
+MAX_PARAMS_PER_BATCH = 100
+MAX_ENTITIES_PER_BATCH = 1000
+MAX_PARAM_VALUE_LENGTH = 500
+
+
+def remote_uri():
+    dagshub_token = os.getenv("PERSONALITY_TEST")
+    if not dagshub_token:
+        raise EnvironmentError("PERSONALITY_TEST environment variable is not set")
+
+    os.environ["MLFLOW_TRACKING_USERNAME"] = dagshub_token
+    os.environ["MLFLOW_TRACKING_PASSWORD"] = dagshub_token
+    return f'{DAGSHUB_URL}/{REPO_OWNER}/{REPO_NAME}.mlflow'
+
+
+def tracking_backend(tracking:dict = None):
+    backend = os.getenv('TRACKING_BACKEND',(tracking or {}).get('backend','remote')).strip().lower()
+    if backend not in BACKENDS:
+        raise ValueError(f'Unsupported tracking backend: {backend}')
+    return backend
+
+
+def local_uri(tracking:dict = None,backend:str = None):
+    tracking = tracking or {}
+    backend = backend or tracking_backend(tracking)
+    if backend == 'sqlite':
+        return 'sqlite:///' + os.path.abspath(tracking.get('sqlite_path','./local_Storage/mlflow.db'))
+    # Newer MLflow releases refuse the file store unless explicitly allowed.
+    os.environ.setdefault('MLFLOW_ALLOW_FILE_STORE','true')
+    return 'file://' + os.path.abspath(tracking.get('file_dir','./local_Storage/mlruns'))
+
+
+def tracking_uri(tracking:dict = None):
+    backend = tracking_backend(tracking)
+    return remote_uri() if backend == 'remote' else local_uri(tracking,backend)
+
+
+def configure_tracking(tracking:dict = None):
+    import mlflow
+
+    uri = tracking_uri(tracking)
+    mlflow.set_tracking_uri(uri)
+    logger.info('MLflow tracking URI : %s',uri if tracking_backend(tracking) != 'remote' else 'remote')
+    return uri
+
+
+def set_experiment(name:str,tracking:dict = None):
+    # A SQLite store has no artifact root of its own; keep the artifacts next to it.
+    import mlflow
+
+    if tracking_backend(tracking) == 'sqlite' and mlflow.get_experiment_by_name(name) is None:
+        artifacts_dir = os.path.abspath((tracking or {}).get('artifacts_dir','./local_Storage/mlartifacts'))
+        mlflow.create_experiment(name,artifact_location='file://' + artifacts_dir)
+    return mlflow.set_experiment(name)
+
+
+@profiled(rows=None)
+def log_batch(run_id:str,params:dict = None,metrics = None,tags:dict = None,client = None):
+    # One request per MAX_ENTITIES_PER_BATCH entities instead of one per key.
+    # metrics is a {key: value} dict or a list of mlflow Metric entities.
+    import mlflow
+    from mlflow.entities import Metric,Param,RunTag
+
+    client = client or mlflow.MlflowClient()
+    if isinstance(metrics,dict):
+        timestamp = int(time.time() * 1000)
+        metrics = [Metric(str(k),float(v),timestamp,0) for k,v in metrics.items()]
+    metrics = list(metrics or [])
+    params = [Param(str(k),str(v)[:MAX_PARAM_VALUE_LENGTH]) for k,v in (params or {}).items()]
+    tags = [RunTag(str(k),str(v)) for k,v in (tags or {}).items()]
+
+    requests = 0
+    while params or metrics or tags:
+        param_chunk,params = params[:MAX_PARAMS_PER_BATCH],params[MAX_PARAMS_PER_BATCH:]
+        room = MAX_ENTITIES_PER_BATCH - len(param_chunk)
+        metric_chunk,metrics = metrics[:room],metrics[room:]
+        room -= len(metric_chunk)
+        tag_chunk,tags = tags[:room],tags[room:]
+        client.log_batch(run_id,metrics=metric_chunk,params=param_chunk,tags=tag_chunk)
+        requests += 1
+    return requests
+
+
+def _upload_dir(run_id:str,uploads_dir:str):
+    return os.path.join(uploads_dir,run_id)
+
+
+def _write_status(upload_dir:str,**status):
+    path = os.path.join(upload_dir,'status.json')
+    with open(path + '.tmp','w') as f:
+        json.dump(status,f,indent=4)
+    os.replace(path + '.tmp',path)
+
+
+def read_status(run_id:str,uploads_dir:str = UPLOADS_DIR):
+    try:
+        with open(os.path.join(_upload_dir(run_id,uploads_dir),'status.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def stage_artifacts(run_id:str,uri:str,model_path:str,artifact_paths:list,uploads_dir:str = UPLOADS_DIR):
+    # Snapshot what is to be uploaded, so the next pipeline run can overwrite the
+    # originals while an upload is still in progress.
+    upload_dir = _upload_dir(run_id,uploads_dir)
+    os.makedirs(os.path.join(upload_dir,'artifacts'),exist_ok=True)
+    if model_path:
+        shutil.copy2(model_path,os.path.join(upload_dir,'model.pkl'))
+    for path in artifact_paths:
+        shutil.copy2(path,os.path.join(upload_dir,'artifacts',os.path.basename(path)))
+    _write_status(upload_dir,state='pending',tracking_uri=uri,run_id=run_id)
+    return upload_dir
+
+
+def upload_staged(run_id:str,uploads_dir:str = UPLOADS_DIR):
+    import pickle
+    import mlflow
+    import mlflow.sklearn
+
+    upload_dir = _upload_dir(run_id,uploads_dir)
+    status = read_status(run_id,uploads_dir)
+    if status is None:
+        raise FileNotFoundError(f'No staged artifacts for run {run_id} in {uploads_dir}')
+    try:
+        start = time.perf_counter()
+        uri = status['tracking_uri']
+        if uri.startswith(f'{DAGSHUB_URL}/'):
+            remote_uri()
+        mlflow.set_tracking_uri(uri)
+        _write_status(upload_dir,**{**status,'state' : 'uploading','pid' : os.getpid()})
+        client = mlflow.MlflowClient()
+        model_path = os.path.join(upload_dir,'model.pkl')
+        if os.path.exists(model_path):
+            with open(model_path,'rb') as f:
+                model = pickle.load(f)
+            with mlflow.start_run(run_id=run_id):
+                mlflow.sklearn.log_model(model,'model',serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE)
+        client.log_artifacts(run_id,os.path.join(upload_dir,'artifacts'))
+        elapsed = round(time.perf_counter() - start,3)
+        _write_status(upload_dir,**{**status,'state' : 'done','elapsed_s' : elapsed})
+        logger.info('Uploaded artifacts of run %s in %.1fs',run_id,elapsed)
+    except Exception as e:
+        _write_status(upload_dir,**{**status,'state' : 'failed','error' : str(e)})
+        logger.error('Artifact upload for run %s failed : %s',run_id,e)
+        raise
+
+
+@profiled(rows=None)
+def upload_artifacts(run_id:str,uri:str,model_path:str,artifact_paths:list,background:bool = True,uploads_dir:str = UPLOADS_DIR):
+    try:
+        stage_artifacts(run_id,uri,model_path,artifact_paths,uploads_dir)
+        if not background:
+            upload_staged(run_id,uploads_dir)
+            return None
+        # A detached process outlives this stage; its output goes to a log file
+        # next to the staged artifacts.
+        log_file = open(os.path.join(_upload_dir(run_id,uploads_dir),'upload.log'),'w')
+        process = subprocess.Popen(
+            [sys.executable,'-m','src.tracking','upload','--run-id',run_id,'--uploads-dir',uploads_dir],
+            stdout=log_file,stderr=subprocess.STDOUT,stdin=subprocess.DEVNULL,start_new_session=True
+        )
+        log_file.close()
+        logger.info('Uploading artifacts of run %s in the background (pid %s)',run_id,process.pid)
+        return process
+    except Exception as e:
+        logger.error('Error starting the artifact upload for run %s : %s',run_id,e)
+        raise
+
+
+@profiled(rows=None)
+def wait_for_upload(run_id:str,timeout_s:float = 600,uploads_dir:str = UPLOADS_DIR):
+    # Runs logged before staged uploads existed have no status file: nothing to wait for.
+    deadline = time.time() + timeout_s
+    while True:
+        status = read_status(run_id,uploads_dir)
+        if status is None or status['state'] == 'done':
+            return status
+        if status['state'] == 'failed':
+            raise RuntimeError(f"Artifact upload for run {run_id} failed: {status.get('error')}; retry with python -m src.tracking upload --run-id {run_id}")
+        if time.time() > deadline:
+            raise TimeoutError(f"Artifact upload for run {run_id} still {status['state']} after {timeout_s}s")
+        time.sleep(1)
+
+
+def _search_all_runs(client,experiment_id:str):
+    page_token = None
+    while True:
+        page = client.search_runs([experiment_id],max_results=1000,page_token=page_token)
+        yield from page
+        page_token = page.token
+        if not page_token:
+            return
+
+
+def sync_runs(source_uri:str,dest_uri:str):
+    # Copies every local run without a sync tag (params, full metric history,
+    # tags, artifacts) to the remote server and tags it with the remote run id.
+    from mlflow import MlflowClient
+
+    source,dest = MlflowClient(source_uri),MlflowClient(dest_uri)
+    synced = 0
+    for experiment in source.search_experiments():
+        dest_experiment = dest.get_experiment_by_name(experiment.name)
+        dest_experiment_id = dest_experiment.experiment_id if dest_experiment else dest.create_experiment(experiment.name)
+        for run in _search_all_runs(source,experiment.experiment_id):
+            if SYNC_TAG in run.data.tags:
+                continue
+            remote = dest.create_run(dest_experiment_id,start_time=run.info.start_time,tags={**run.data.tags,'sync.source_run_id' : run.info.run_id})
+            remote_id = remote.info.run_id
+            metrics = [m for key in run.data.metrics for m in source.get_metric_history(run.info.run_id,key)]
+            log_batch(remote_id,params=run.data.params,metrics=metrics,client=dest)
+            with tempfile.TemporaryDirectory() as tmp:
+                local_dir = source.download_artifacts(run.info.run_id,'',tmp)
+                if os.listdir(local_dir):
+                    dest.log_artifacts(remote_id,local_dir)
+            dest.set_terminated(remote_id,run.info.status,end_time=run.info.end_time)
+            source.set_tag(run.info.run_id,SYNC_TAG,remote_id)
+            logger.info('Synced run %s -> %s',run.info.run_id,remote_id)
+            synced += 1
+    logger.info('Synced %s runs from %s',synced,source_uri)
+    return synced
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MLflow tracking utilities')
+    commands = parser.add_subparsers(dest='command',required=True)
+    upload = commands.add_parser('upload',help='Upload the staged artifacts of a run')
+    upload.add_argument('--run-id',required=True)
+    upload.add_argument('--uploads-dir',default=UPLOADS_DIR)
+    sync = commands.add_parser('sync',help='Push local runs to the remote tracking server')
+    sync.add_argument('--source',default=None,help='Local tracking URI (default: from params.yaml)')
+    sync.add_argument('--params',default='./params.yaml')
+    args = parser.parse_args()
+
+    if args.command == 'upload':
+        upload_staged(args.run_id,args.uploads_dir)
+    else:
+        import yaml
+        with open(args.params) as f:
+            tracking = (yaml.safe_load(f) or {}).get('tracking',{})
+        backend = tracking.get('backend','remote')
+        source = args.source or local_uri(tracking,backend if backend != 'remote' else 'file')
+        sync_runs(source,remote_uri())
+
+
+if __name__ == '__main__':
+    main()
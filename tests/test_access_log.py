@@ -0,0 +1,64 @@
+import unittest
+import asyncio
+from unittest import mock
+from api.access_log import AccessLogMiddleware
+
+def make_app(status:int):
+    async def app(scope,receive,send):
+        await send({'type' : 'http.response.start','status' : status,'headers' : []})
+        await send({'type' : 'http.response.body','body' : b''})
+    return app
+
+def request(middleware,path:str = '/predict'):
+    scope = {'type' : 'http','method' : 'POST','path' : path,'client' : ('127.0.0.1',5000)}
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope,None,send))
+    return sent
+
+class AccessLogMiddlewareTest(unittest.TestCase):
+
+    def logged(self,status:int,sample_rate:float,n:int = 20):
+        middleware = AccessLogMiddleware(make_app(status),sample_rate)
+        with mock.patch('api.access_log.logger') as logger:
+            for _ in range(n):
+                self.assertEqual(len(request(middleware)),2)
+        return logger.info.call_args_list
+
+    def test_rate_zero_logs_only_server_errors(self):
+        self.assertEqual(self.logged(200,0.0),[])
+        self.assertEqual(self.logged(404,0.0),[])
+        calls = self.logged(503,0.0)
+        self.assertEqual(len(calls),20)
+        extra = calls[0].kwargs['extra']
+        self.assertEqual((extra['method'],extra['path'],extra['status'],extra['client']),('POST','/predict',503,'127.0.0.1'))
+
+    def test_rate_one_logs_every_request(self):
+        self.assertEqual(len(self.logged(200,1.0)),20)
+
+    def test_partial_rate_samples(self):
+        with mock.patch('api.access_log.random.random',side_effect=[0.1,0.9,0.2,0.8]):
+            self.assertEqual(len(self.logged(200,0.5,n=4)),2)
+
+    def test_exception_is_logged_as_500(self):
+        async def failing(scope,receive,send):
+            raise RuntimeError('boom')
+        middleware = AccessLogMiddleware(failing,0.0)
+        with mock.patch('api.access_log.logger') as logger:
+            with self.assertRaises(RuntimeError):
+                request(middleware)
+        self.assertEqual(logger.info.call_args.kwargs['extra']['status'],500)
+
+    def test_non_http_scope_passes_through(self):
+        app = mock.AsyncMock()
+        middleware = AccessLogMiddleware(app,1.0)
+        with mock.patch('api.access_log.logger') as logger:
+            asyncio.run(middleware({'type' : 'lifespan'},None,None))
+        app.assert_awaited_once()
+        logger.info.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
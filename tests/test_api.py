@@ -1,5 +1,6 @@
 from api.app import app
 import unittest
+import json
 from fastapi.testclient import TestClient
 
 class FastAPITest(unittest.TestCase):
@@ -8,7 +9,8 @@ class FastAPITest(unittest.TestCase):
         with TestClient(app) as client:
             response = client.get("/health")
             self.assertEqual(response.status_code, 200)
-            self.assertEqual(response.json(), {"status": "up"})
+            self.assertEqual(response.json()["status"], "up")
+            self.assertIn("model_version", response.json())
 
     def test_predict_endpoint(self):
         payload = {
@@ -25,6 +27,34 @@ class FastAPITest(unittest.TestCase):
             response = client.post("/predict", json=payload)
             self.assertEqual(response.status_code, 200)
             self.assertIn("Predicted Personality", response.json())
+            self.assertIn("model_version", response.json())
+
+    def test_predict_batch_endpoint(self):
+        valid = {
+            'time_spend_alone': 4,
+            'stage_fear': False,
+            'social_event_attendance': 4,
+            'going_outside': 6,
+            'drained_after_socializing': False,
+            'friends_circle_size': 13,
+            'post_frequency': 5
+        }
+        invalid = dict(valid, going_outside=42)
+
+        with TestClient(app) as client:
+            response = client.post("/predict_batch", json=[valid, invalid, valid])
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertEqual(body['count'], 3)
+            self.assertIsNotNone(body['predictions'][0])
+            self.assertIsNone(body['predictions'][1])
+            self.assertEqual([e['index'] for e in body['errors']], [1])
+
+            ndjson = "\n".join(json.dumps(r) for r in [valid, valid])
+            response = client.post("/predict_batch", content=ndjson,
+                                   headers={"content-type": "application/x-ndjson"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['predictions']), 2)
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
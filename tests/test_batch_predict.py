@@ -0,0 +1,132 @@
+import unittest
+import os
+import pickle
+import shutil
+import tempfile
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder,LabelEncoder
+from src.features import FEATURE_SPEC
+from src.data_preprocessing import make_derieved_features
+from src.data_io import load_frame
+from src.batch_predict import load_artifacts,part_path,run,score_frame
+
+class BatchPredictTest(unittest.TestCase):
+    # Part files must add up to the same predictions whatever the number of
+    # workers, and a rerun must only score the chunks without a part file.
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        n = 250
+        raw = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+        })
+        target = np.where(raw['Time_spent_Alone'] > raw['Going_outside'],'Introvert','Extrovert')
+        train_df = make_derieved_features(raw.copy())
+        pipeline = ColumnTransformer(transformers=[
+            ('num',StandardScaler(),FEATURE_SPEC.numeric_columns + FEATURE_SPEC.derived_columns),
+            ('cat',OrdinalEncoder(),FEATURE_SPEC.binary_columns)
+        ]).fit(train_df)
+        label_encoder = LabelEncoder().fit(target)
+        model = LogisticRegression().fit(pipeline.transform(train_df),label_encoder.transform(target))
+
+        cls.models_dir = os.path.join(cls.tmp.name,'models')
+        os.makedirs(cls.models_dir)
+        joblib.dump(pipeline,os.path.join(cls.models_dir,'preprocessing_pipeline.pkl'))
+        joblib.dump(label_encoder,os.path.join(cls.models_dir,'label_encoder.pkl'))
+        with open(os.path.join(cls.models_dir,'trained_model.pkl'),'wb') as f:
+            pickle.dump(model,f)
+
+        # Rows with a missing input get an empty prediction.
+        inputs = raw.astype(object)
+        inputs.loc[[3,120],'Going_outside'] = np.nan
+        inputs.insert(0,'user_id',[f'u{i}' for i in range(n)])
+        cls.inputs = inputs
+        cls.input_path = os.path.join(cls.tmp.name,'users.csv')
+        inputs.to_csv(cls.input_path,index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def output_dir(self,name:str):
+        return os.path.join(self.tmp.name,self._testMethodName,name)
+
+    def predict(self,output_dir:str,workers:int):
+        return run(self.input_path,output_dir,self.models_dir,60,workers,fmt='parquet',id_column='user_id',probabilities=True)
+
+    def read_parts(self,output_dir:str):
+        parts = sorted(name for name in os.listdir(output_dir) if name.startswith('part-'))
+        return pd.concat([load_frame(os.path.join(output_dir,name)) for name in parts],ignore_index=True)
+
+    def test_parallel_matches_serial(self):
+        serial = self.predict(self.output_dir('serial'),1)
+        parallel = self.predict(self.output_dir('parallel'),3)
+        self.assertEqual((serial['parts'],serial['rows'],serial['rows_scored']),(5,250,250))
+        self.assertEqual((parallel['parts'],parallel['rows'],parallel['rows_scored']),(5,250,250))
+
+        out = self.read_parts(self.output_dir('parallel'))
+        pd.testing.assert_frame_equal(out,self.read_parts(self.output_dir('serial')))
+        self.assertEqual(out['user_id'].tolist(),self.inputs['user_id'].tolist())
+        self.assertEqual(out['prediction'].isna().sum(),2)
+
+        expected = score_frame(pd.read_csv(self.input_path),load_artifacts(self.models_dir,True),True).reset_index(drop=True)
+        self.assertEqual(out['prediction'].isna().tolist(),expected['prediction'].isna().tolist())
+        pd.testing.assert_frame_equal(out.drop(columns=['user_id']).dropna(),expected.dropna())
+
+    def test_rerun_scores_only_missing_parts(self):
+        output_dir = self.output_dir('out')
+        self.predict(output_dir,2)
+        expected = self.read_parts(output_dir)
+        kept = part_path(output_dir,0,'parquet')
+        os.utime(kept,(0,0))
+        os.remove(part_path(output_dir,2,'parquet'))
+        # A temporary file left by an interrupted worker is cleared on resume.
+        open(os.path.join(output_dir,'.tmp-1-part-00002.parquet'),'w').close()
+
+        summary = self.predict(output_dir,2)
+        self.assertEqual((summary['rows_scored'],summary['rows_skipped']),(60,190))
+        self.assertEqual(os.stat(kept).st_mtime,0)
+        self.assertFalse(any(name.startswith('.tmp-') for name in os.listdir(output_dir)))
+        pd.testing.assert_frame_equal(self.read_parts(output_dir),expected)
+
+    def test_rerun_with_different_config_starts_over(self):
+        output_dir = self.output_dir('out')
+        self.predict(output_dir,1)
+        summary = run(self.input_path,output_dir,self.models_dir,100,1,fmt='parquet',id_column='user_id',probabilities=True)
+        self.assertEqual((summary['parts'],summary['rows_scored'],summary['rows_skipped']),(3,250,0))
+        self.assertEqual(len([name for name in os.listdir(output_dir) if name.startswith('part-')]),3)
+
+    def test_new_model_is_not_mixed_with_old_parts(self):
+        # Parts scored by the previous model are dropped, not resumed into.
+        models_dir = os.path.join(self.tmp.name,self._testMethodName,'models')
+        shutil.copytree(self.models_dir,models_dir)
+        output_dir = self.output_dir('out')
+        run(self.input_path,output_dir,models_dir,60,1,fmt='parquet',id_column='user_id')
+        os.remove(part_path(output_dir,4,'parquet'))
+
+        with open(os.path.join(models_dir,'trained_model.pkl'),'rb') as f:
+            model = pickle.load(f)
+        model.coef_ = -model.coef_
+        model.intercept_ = -model.intercept_
+        with open(os.path.join(models_dir,'trained_model.pkl'),'wb') as f:
+            pickle.dump(model,f)
+
+        summary = run(self.input_path,output_dir,models_dir,60,1,fmt='parquet',id_column='user_id')
+        self.assertEqual((summary['rows_scored'],summary['rows_skipped']),(250,0))
+        expected = score_frame(pd.read_csv(self.input_path),load_artifacts(models_dir),False).reset_index(drop=True)
+        self.assertEqual(self.read_parts(output_dir)['prediction'].dropna().tolist(),expected['prediction'].dropna().tolist())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import asyncio
+import time
+from api.batcher import MicroBatcher
+
+class MicroBatcherTest(unittest.TestCase):
+    # Concurrent submissions are scored together, every caller gets its own
+    # record's result back, and a failing batch fails every caller in it.
+
+    def run_batcher(self,predict_fn,records,max_batch_size:int,max_wait_us:int):
+        sizes = []
+
+        def predict(batch):
+            sizes.append(len(batch))
+            return predict_fn(batch)
+
+        async def main():
+            batcher = MicroBatcher(predict,max_batch_size,max_wait_us)
+            await batcher.start()
+            try:
+                return await asyncio.wait_for(asyncio.gather(*[batcher.submit(r) for r in records],return_exceptions=True),5)
+            finally:
+                await batcher.stop()
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        return results,sizes,time.perf_counter() - start
+
+    def test_flushes_when_batch_is_full(self):
+        # A 10 s wait would time the test out, so only the size limit can flush.
+        results,sizes,elapsed = self.run_batcher(lambda batch: batch,list(range(8)),4,10_000_000)
+        self.assertEqual(sizes,[4,4])
+        self.assertLess(elapsed,5)
+
+    def test_flushes_after_max_wait(self):
+        results,sizes,elapsed = self.run_batcher(lambda batch: batch,list(range(3)),64,20_000)
+        self.assertEqual(sizes,[3])
+        self.assertGreaterEqual(elapsed,0.02)
+        self.assertLess(elapsed,2)
+
+    def test_results_map_back_to_their_request(self):
+        records = list(range(50))
+        results,sizes,_ = self.run_batcher(lambda batch: [r * 10 for r in batch],records,8,1000)
+        self.assertEqual(results,[r * 10 for r in records])
+        self.assertGreater(len(sizes),1)
+
+    def test_exception_reaches_every_waiter(self):
+        def fail(batch):
+            raise ValueError('model exploded')
+        results,sizes,_ = self.run_batcher(fail,list(range(5)),8,1000)
+        self.assertEqual(sizes,[5])
+        for result in results:
+            self.assertIsInstance(result,ValueError)
+
+if __name__ == "__main__":
+    unittest.main()
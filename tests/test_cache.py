@@ -0,0 +1,96 @@
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder,LabelEncoder
+from src.features import FEATURE_SPEC
+from src.data_preprocessing import make_derieved_features
+from api.app import UserInput
+from api.cache import PredictionCache
+from api.compiled import CompiledScorer
+from api.inference import SharedFeatures,records_to_columns,sample_records
+
+class PredictionCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n = 300
+        raw = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+        })
+        target = np.where(raw['Time_spent_Alone'] > raw['Going_outside'],'Introvert','Extrovert')
+        train_df = make_derieved_features(raw.copy())
+        pipeline = ColumnTransformer(transformers=[
+            ('num',StandardScaler(),FEATURE_SPEC.numeric_columns + FEATURE_SPEC.derived_columns),
+            ('cat',OrdinalEncoder(),FEATURE_SPEC.binary_columns)
+        ]).fit(train_df)
+        label_encoder = LabelEncoder().fit(target)
+        model = LogisticRegression().fit(pipeline.transform(train_df),label_encoder.transform(target))
+        cls.scorer = CompiledScorer.from_fitted(pipeline,model,label_encoder)
+        cls.records = sample_records(UserInput,200,seed=7)
+
+    def distinct(self,n:int):
+        # n records with pairwise different cache keys
+        cache = PredictionCache(UserInput)
+        unique = {cache.key(record) : record for record in self.records}
+        return list(unique.values())[:n]
+
+    def test_lru_evicts_least_recently_used(self):
+        cache = PredictionCache(UserInput,max_size=2)
+        cache.bind('1')
+        a,b,c = self.distinct(3)
+        cache.put('1',a,('A',None))
+        cache.put('1',b,('B',None))
+        self.assertEqual(cache.get('1',a),('A',None))
+        cache.put('1',c,('C',None))
+
+        self.assertIsNone(cache.get('1',b))
+        self.assertEqual(cache.get('1',a),('A',None))
+        self.assertEqual(cache.get('1',c),('C',None))
+        self.assertEqual(cache.stats()['evictions'],1)
+
+    def test_entries_expire_after_ttl(self):
+        cache = PredictionCache(UserInput,ttl_s=10)
+        cache.bind('1')
+        record = self.records[0]
+        with mock.patch('api.cache.time.monotonic',return_value=100.0):
+            cache.put('1',record,('A',None))
+        with mock.patch('api.cache.time.monotonic',return_value=109.0):
+            self.assertEqual(cache.get('1',record),('A',None))
+        with mock.patch('api.cache.time.monotonic',return_value=111.0):
+            self.assertIsNone(cache.get('1',record))
+        self.assertEqual(cache.stats()['expirations'],1)
+
+    def test_version_change_invalidates(self):
+        cache = PredictionCache(UserInput)
+        cache.bind('1')
+        record = self.records[0]
+        cache.put('1',record,('A',None))
+        self.assertIsNone(cache.get('2',record))
+        self.assertEqual(cache.version,'2')
+        # A late write for the old version is ignored.
+        cache.put('1',record,('A',None))
+        self.assertIsNone(cache.get('2',record))
+
+    def test_table_matches_scorer(self):
+        cache = PredictionCache(UserInput,mode='table')
+        cache.bind('1',self.scorer,probabilities=True)
+        self.assertEqual(cache.stats()['mode'],'table')
+
+        labels,proba = self.scorer.predict_with_proba(SharedFeatures(records_to_columns(self.records)))
+        for record,label,p in zip(self.records,labels,proba):
+            cached_label,cached_proba = cache.get('1',record)
+            self.assertEqual(cached_label,label)
+            np.testing.assert_allclose(cached_proba,p,rtol=1e-6)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.datasets import make_classification
+from sklearn.isotonic import IsotonicRegression
+from sklearn.svm import SVC
+from src.calibration import Calibrator,CalibratedModel,calibrate
+
+try:
+    from sklearn.frozen import FrozenEstimator
+except ImportError:
+    FrozenEstimator = None
+
+class CalibrationTest(unittest.TestCase):
+    # The NumPy calibrators must reproduce sklearn's sigmoid and isotonic
+    # calibration of a prefitted model.
+
+    @classmethod
+    def setUpClass(cls):
+        X,y = make_classification(n_samples=1500,n_features=6,flip_y=0.1,random_state=0)
+        cls.X_fit,cls.y_fit = X[:800],y[:800]
+        cls.X_cal,cls.y_cal = X[800:1200],y[800:1200]
+        cls.X_test = X[1200:]
+        cls.model = SVC(C=0.1).fit(cls.X_fit,cls.y_fit)
+
+    def sklearn_calibrated(self,method):
+        if FrozenEstimator is not None:
+            return CalibratedClassifierCV(FrozenEstimator(self.model),method=method).fit(self.X_cal,self.y_cal)
+        return CalibratedClassifierCV(self.model,method=method,cv='prefit').fit(self.X_cal,self.y_cal)
+
+    def test_sigmoid_matches_sklearn(self):
+        calibrated = calibrate(self.model,self.X_cal,self.y_cal,'sigmoid')
+        expected = self.sklearn_calibrated('sigmoid').predict_proba(self.X_test)
+        np.testing.assert_allclose(calibrated.predict_proba(self.X_test),expected,atol=1e-4)
+
+    def test_isotonic_matches_sklearn(self):
+        calibrated = calibrate(self.model,self.X_cal,self.y_cal,'isotonic')
+        scores = self.model.decision_function(self.X_test)
+        iso = IsotonicRegression(out_of_bounds='clip',y_min=0,y_max=1).fit(self.model.decision_function(self.X_cal),self.y_cal)
+        np.testing.assert_allclose(calibrated.predict_proba(self.X_test)[:,1],iso.predict(scores),atol=1e-12)
+
+    def test_labels_and_probabilities_from_one_pass(self):
+        calibrated = calibrate(self.model,self.X_cal,self.y_cal,'sigmoid')
+        labels,proba = calibrated.predict_with_proba(self.X_test)
+        np.testing.assert_array_equal(labels,self.sklearn_calibrated('sigmoid').predict(self.X_test))
+        np.testing.assert_array_equal(calibrated.predict(self.X_test),labels)
+        np.testing.assert_allclose(proba.sum(axis=1),1.0)
+
+        restored = Calibrator.from_dict(calibrated.calibrator.to_dict())
+        np.testing.assert_array_equal(restored.predict(np.linspace(-3,3,7)),calibrated.calibrator.predict(np.linspace(-3,3,7)))
+
+    def test_label_is_the_more_probable_class(self):
+        # This calibrator maps score 0 to p = 0.73, so rows with slightly negative
+        # scores are labelled classes_[1], the class their probability favours.
+        calibrated = CalibratedModel(self.model,Calibrator('sigmoid',a=-1.0,b=-1.0))
+        scores = self.model.decision_function(self.X_test)
+        labels,proba = calibrated.predict_with_proba(self.X_test)
+        self.assertTrue(((scores < 0) & (labels == 1)).any())
+        chosen = proba[np.arange(len(labels)),np.searchsorted(self.model.classes_,labels)]
+        self.assertTrue((chosen >= 0.5).all())
+        np.testing.assert_array_equal(calibrated.predict(self.X_test),labels)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression,SGDClassifier,RidgeClassifier
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder,LabelEncoder
+from sklearn.svm import SVC,LinearSVC
+from sklearn.tree import DecisionTreeClassifier
+from src.features import FEATURE_SPEC
+from src.data_preprocessing import make_derieved_features
+from src.calibration import Calibrator,CalibratedModel,calibrate
+from api.app import UserInput
+from api.compiled import CompiledScorer,SklearnScorer,build_scorer,verify_scorer
+from api.inference import SharedFeatures,records_to_columns,columns_to_frame,sample_records
+
+class CompiledScorerTest(unittest.TestCase):
+    # The compiled scorer must reproduce sklearn's decision scores and labels for
+    # every model it accepts, and build_scorer must fall back to sklearn for
+    # anything else.
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n = 400
+        raw = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+        })
+        noise = rng.normal(0,2,n)
+        cls.target = np.where(raw['Time_spent_Alone'] - raw['Going_outside'] + noise > 1,'Introvert','Extrovert')
+        cls.train_df = make_derieved_features(raw.copy())
+        cls.preprocessing_pipeline = ColumnTransformer(transformers=[
+            ('num',StandardScaler(),FEATURE_SPEC.numeric_columns + FEATURE_SPEC.derived_columns),
+            ('cat',OrdinalEncoder(),FEATURE_SPEC.binary_columns)
+        ]).fit(cls.train_df)
+        cls.label_encoder = LabelEncoder().fit(cls.target)
+        cls.X = cls.preprocessing_pipeline.transform(cls.train_df)
+        cls.y = cls.label_encoder.transform(cls.target)
+        cls.records = sample_records(UserInput,1000,seed=5)
+
+    def fit(self,model,y = None):
+        return model.fit(self.X,self.y if y is None else y)
+
+    def assert_matches_sklearn(self,model,label_encoder = None):
+        label_encoder = label_encoder or self.label_encoder
+        compiled = CompiledScorer.from_fitted(self.preprocessing_pipeline,model,label_encoder)
+        reference = SklearnScorer(self.preprocessing_pipeline,model,label_encoder)
+        columns = records_to_columns(self.records)
+        X = self.preprocessing_pipeline.transform(columns_to_frame(columns))
+        np.testing.assert_allclose(compiled.decision_function(compiled.transform_columns(columns)),model.decision_function(X),rtol=1e-9,atol=1e-9)
+        np.testing.assert_array_equal(compiled.predict_records(self.records),reference.predict_records(self.records))
+        self.assertEqual(verify_scorer(compiled,reference,UserInput,500)[0],0)
+
+    def test_svc_kernels(self):
+        for kernel in ('rbf','linear','poly','sigmoid'):
+            with self.subTest(kernel=kernel):
+                self.assert_matches_sklearn(self.fit(SVC(kernel=kernel,C=1.0,gamma='scale')))
+
+    def test_linear_models(self):
+        for model in (LogisticRegression(),SGDClassifier(loss='hinge',random_state=0),SGDClassifier(loss='log_loss',random_state=0),
+                      LinearSVC(),RidgeClassifier()):
+            with self.subTest(model=type(model).__name__):
+                self.assert_matches_sklearn(self.fit(model))
+
+    def test_multiclass_linear_model(self):
+        target = np.where(self.train_df['Going_outside'] > 5,'Ambivert',self.target)
+        label_encoder = LabelEncoder().fit(target)
+        self.assert_matches_sklearn(self.fit(LogisticRegression(),label_encoder.transform(target)),label_encoder)
+
+    def test_calibrated_labels_follow_the_probabilities(self):
+        model = self.fit(SVC(kernel='rbf',C=1.0,gamma='scale'))
+        for calibrated in (calibrate(model,self.X,self.y,'isotonic'),CalibratedModel(model,Calibrator('sigmoid',a=-1.0,b=-1.0))):
+            with self.subTest(method=calibrated.calibrator.method):
+                self.assert_matches_sklearn(calibrated)
+                compiled = CompiledScorer.from_fitted(self.preprocessing_pipeline,calibrated,self.label_encoder)
+                reference = SklearnScorer(self.preprocessing_pipeline,calibrated,self.label_encoder)
+                labels,proba = compiled.predict_with_proba(SharedFeatures.from_records(self.records))
+                np.testing.assert_array_equal(labels,compiled.predict_records(self.records))
+                np.testing.assert_array_equal(labels,reference.predict_records(self.records))
+                chosen = proba[np.arange(len(labels)),[list(compiled.labels).index(label) for label in labels]]
+                self.assertTrue((chosen >= 0.5).all())
+
+    def test_build_scorer_falls_back_for_unsupported_model(self):
+        model = self.fit(DecisionTreeClassifier(random_state=0))
+        scorer = build_scorer(self.preprocessing_pipeline,model,self.label_encoder,UserInput,200)
+        self.assertIsInstance(scorer,SklearnScorer)
+
+        model = self.fit(SVC(kernel='rbf',probability=False))
+        self.assertIsInstance(build_scorer(self.preprocessing_pipeline,model,self.label_encoder,UserInput,200),CompiledScorer)
+
+    def test_build_scorer_falls_back_on_mismatch(self):
+        model = self.fit(LogisticRegression())
+        decision_function = CompiledScorer.decision_function
+        # A compiled scorer that flips every score disagrees with sklearn.
+        with mock.patch.object(CompiledScorer,'decision_function',lambda self,X: -decision_function(self,X)):
+            scorer = build_scorer(self.preprocessing_pipeline,model,self.label_encoder,UserInput,200)
+        self.assertIsInstance(scorer,SklearnScorer)
+
+if __name__ == "__main__":
+    unittest.main()
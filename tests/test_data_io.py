@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.data_io import FrameWriter,SUPPORTED_FORMATS,iter_frames,load_frame,save_frame
+
+class DataIoTest(unittest.TestCase):
+    # Every storage format must give back the frame it was given, whether written
+    # in one piece or in chunks, and read whole or streamed.
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({
+            'x' : rng.standard_normal(25),
+            'n' : rng.integers(0,10,25),
+            'label' : rng.choice(['Yes','No'],25),
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self,fmt:str):
+        return os.path.join(self.tmp.name,'sub',f'frame.{fmt}')
+
+    def test_save_and_load_round_trip(self):
+        for fmt in SUPPORTED_FORMATS:
+            with self.subTest(fmt=fmt):
+                save_frame(self.df,self.path(fmt))
+                pd.testing.assert_frame_equal(load_frame(self.path(fmt)),self.df)
+                pd.testing.assert_frame_equal(load_frame(self.path(fmt),columns=['n','label']),self.df[['n','label']])
+
+    def test_iter_frames_chunks_the_file(self):
+        for fmt in SUPPORTED_FORMATS:
+            with self.subTest(fmt=fmt):
+                save_frame(self.df,self.path(fmt))
+                chunks = list(iter_frames(self.path(fmt),10))
+                self.assertEqual([len(chunk) for chunk in chunks],[10,10,5])
+                pd.testing.assert_frame_equal(pd.concat(chunks,ignore_index=True),self.df)
+
+    def test_frame_writer_appends_chunks(self):
+        for fmt in SUPPORTED_FORMATS:
+            with self.subTest(fmt=fmt):
+                with FrameWriter(self.path(fmt)) as writer:
+                    for start in range(0,len(self.df),8):
+                        writer.write(self.df.iloc[start:start + 8])
+                self.assertEqual(writer.rows,len(self.df))
+                pd.testing.assert_frame_equal(load_frame(self.path(fmt)),self.df)
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            save_frame(self.df,os.path.join(self.tmp.name,'frame.xlsx'))
+
+if __name__ == "__main__":
+    unittest.main()
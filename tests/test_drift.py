@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+import pandas as pd
+from api.drift import DriftMonitor
+from api.inference import records_to_columns
+from src.drift import build_profile,psi,ks
+from src.features import FEATURE_SPEC
+
+class Record:
+
+    def __init__(self,values:dict):
+        self.__dict__.update(values)
+
+def make_frame(n:int,seed:int,alone_high:float = 11):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Time_spent_Alone' : rng.integers(0,alone_high + 1,n).astype(float),
+        'Stage_fear' : rng.choice(['No','Yes'],n),
+        'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+        'Going_outside' : rng.integers(0,8,n).astype(float),
+        'Drained_after_socializing' : rng.choice(['No','Yes'],n),
+        'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+        'Post_frequency' : rng.integers(0,11,n).astype(float),
+    })
+
+def to_records(df:pd.DataFrame):
+    return [Record({f['field'] : (row[f['name']] == 'Yes') if f['kind'] == 'binary' else row[f['name']] for f in FEATURE_SPEC.raw})
+            for _,row in df.iterrows()]
+
+class DriftTest(unittest.TestCase):
+
+    def setUp(self):
+        reference = make_frame(5000,0)
+        labels = np.where(reference['Time_spent_Alone'] > 5,'Introvert','Extrovert')
+        self.profile = build_profile(reference,labels)
+
+    def test_profile_has_one_bin_per_value(self):
+        feature = self.profile['features']['Time_spent_Alone']
+        self.assertEqual(len(feature['counts']),12)
+        self.assertEqual(sum(feature['counts']),5000)
+        self.assertEqual(self.profile['features']['Stage_fear']['edges'],[0.5])
+        self.assertEqual(self.profile['predictions']['classes'],['Extrovert','Introvert'])
+
+    def test_statistics(self):
+        counts = [100,200,300]
+        self.assertAlmostEqual(psi(counts,[10,20,30]),0)
+        self.assertAlmostEqual(ks(counts,[10,20,30]),0)
+        self.assertGreater(psi(counts,[300,200,100]),0.25)
+        self.assertAlmostEqual(ks(counts,[300,200,100]),1/3)
+
+    def test_shift_is_flagged_and_batch_matches_single(self):
+        single = DriftMonitor(self.profile,min_count=500)
+        batch = DriftMonitor(self.profile,min_count=500)
+        for df in (make_frame(2000,1),make_frame(2000,2,alone_high=4)):
+            records = to_records(df)
+            labels = np.where(df['Time_spent_Alone'] > 5,'Introvert','Extrovert')
+            for record,label in zip(records,labels):
+                single.observe(record,label)
+            batch.observe_batch(records_to_columns(records),labels)
+            self.assertEqual(single.window,batch.window)
+
+            report = single.evaluate()
+            self.assertEqual(batch.evaluate()['features'],report['features'])
+            shifted = df['Time_spent_Alone'].max() <= 4
+            self.assertEqual('Time_spent_Alone' in report['drifted_features'],shifted)
+            self.assertEqual(report['prediction_drift'],shifted)
+            self.assertNotIn('Friends_circle_size',report['drifted_features'])
+
+    def test_small_window_keeps_accumulating(self):
+        monitor = DriftMonitor(self.profile,min_count=100)
+        records = to_records(make_frame(60,3))
+        for record in records:
+            monitor.observe(record,'Extrovert')
+        self.assertIsNone(monitor.evaluate())
+        for record in records:
+            monitor.observe(record,'Extrovert')
+        self.assertEqual(monitor.evaluate()['records'],120)
+        self.assertEqual(monitor.report()['current_window']['records'],0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score,precision_score,recall_score,f1_score
+from src.evaluation import evaluate_predictions
+
+class EvaluationTest(unittest.TestCase):
+    # Metrics derived from the confusion matrix must match sklearn's, overall and
+    # per slice.
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n = 3000
+        cls.y_true = rng.integers(0,2,n)
+        cls.y_pred = np.where(rng.random(n) < 0.8,cls.y_true,1 - cls.y_true)
+        cls.features = pd.DataFrame({
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+        })
+        cls.report = evaluate_predictions(
+            cls.y_true,cls.y_pred,cls.features,
+            {'Stage_fear' : 'categorical','Friends_circle_size' : [0,5,10,16]},
+            n_resamples=2000
+        )
+
+    def assert_matches_sklearn(self,metrics,y_true,y_pred):
+        self.assertAlmostEqual(metrics['accuracy'],accuracy_score(y_true,y_pred),places=6)
+        self.assertAlmostEqual(metrics['precision'],precision_score(y_true,y_pred),places=6)
+        self.assertAlmostEqual(metrics['recall'],recall_score(y_true,y_pred),places=6)
+        self.assertAlmostEqual(metrics['f1_score'],f1_score(y_true,y_pred),places=6)
+
+    def test_overall_metrics_match_sklearn(self):
+        self.assert_matches_sklearn(self.report,self.y_true,self.y_pred)
+        self.assertEqual(sum(map(sum,self.report['confusion_matrix']['matrix'])),len(self.y_true))
+
+    def test_slices_match_sklearn(self):
+        for bucket,mask in (('Yes',self.features['Stage_fear'] == 'Yes'),('No',self.features['Stage_fear'] == 'No')):
+            self.assert_matches_sklearn(self.report['slices']['Stage_fear'][bucket],self.y_true[mask],self.y_pred[mask])
+        mask = ((self.features['Friends_circle_size'] >= 5) & (self.features['Friends_circle_size'] < 10)).to_numpy()
+        entry = self.report['slices']['Friends_circle_size']['5-10']
+        self.assertEqual(entry['support'],int(mask.sum()))
+        self.assert_matches_sklearn(entry,self.y_true[mask],self.y_pred[mask])
+
+    def test_confidence_intervals_bracket_estimates(self):
+        intervals = self.report['confidence_intervals']
+        for name in ('accuracy','precision','recall','f1_score'):
+            self.assertLess(intervals[name]['low'],self.report[name])
+            self.assertGreater(intervals[name]['high'],self.report[name])
+        # Binomial standard error of accuracy is ~0.0073 here, so the 95% interval is ~0.029 wide.
+        self.assertAlmostEqual(intervals['accuracy']['high'] - intervals['accuracy']['low'],0.029,delta=0.005)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder,LabelEncoder
+from src.features import FEATURE_SPEC
+from src.data_preprocessing import make_derieved_features
+from api.app import UserInput
+from api.compiled import CompiledScorer,SklearnScorer,VotingScorer
+from api.inference import SharedFeatures,records_to_columns,columns_to_frame,sample_records
+
+class FeatureSpecTest(unittest.TestCase):
+    # The training path (raw Yes/No frame -> make_derieved_features -> fitted
+    # ColumnTransformer) and the serving path (validated records -> feature spec
+    # -> NumPy transform) must produce the same model inputs.
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n = 500
+        raw = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+        })
+        target = np.where(raw['Time_spent_Alone'] > 5,'Introvert','Extrovert')
+
+        cls.train_df = make_derieved_features(raw.copy())
+        cls.preprocessing_pipeline = ColumnTransformer(transformers=[
+            ('num',StandardScaler(),FEATURE_SPEC.numeric_columns + FEATURE_SPEC.derived_columns),
+            ('cat',OrdinalEncoder(),FEATURE_SPEC.binary_columns)
+        ]).fit(cls.train_df)
+        cls.label_encoder = LabelEncoder().fit(target)
+        cls.model = LogisticRegression().fit(
+            cls.preprocessing_pipeline.transform(cls.train_df),cls.label_encoder.transform(target)
+        )
+        cls.challenger = LogisticRegression(C=0.01).fit(
+            cls.preprocessing_pipeline.transform(cls.train_df),cls.label_encoder.transform(target)
+        )
+        cls.records = sample_records(UserInput,1000,seed=3)
+
+    def test_training_columns_match_spec(self):
+        self.assertEqual(list(self.train_df.columns),FEATURE_SPEC.columns)
+        np.testing.assert_array_equal(
+            self.train_df['Offline_social_activity'].to_numpy(),
+            self.train_df['Social_event_attendance'].to_numpy() * self.train_df['Going_outside'].to_numpy()
+        )
+
+    def test_serving_frame_matches_training_frame(self):
+        serving = columns_to_frame(records_to_columns(self.records))
+        training = make_derieved_features(serving[FEATURE_SPEC.raw_columns].copy())
+        pd.testing.assert_frame_equal(serving,training[FEATURE_SPEC.columns])
+
+    def test_numpy_transform_matches_pipeline(self):
+        scorer = CompiledScorer.from_fitted(self.preprocessing_pipeline,self.model,self.label_encoder)
+        columns = records_to_columns(self.records)
+        expected = self.preprocessing_pipeline.transform(columns_to_frame(columns))
+        np.testing.assert_allclose(scorer.transform_columns(columns),expected,rtol=1e-12,atol=1e-12)
+
+        reference = SklearnScorer(self.preprocessing_pipeline,self.model,self.label_encoder)
+        np.testing.assert_array_equal(scorer.predict_records(self.records),reference.predict_records(self.records))
+
+    def test_spec_round_trips_through_bundle_manifest(self):
+        scorer = CompiledScorer.from_fitted(self.preprocessing_pipeline,self.model,self.label_encoder)
+        self.assertEqual(scorer.manifest['feature_spec'],FEATURE_SPEC.to_dict())
+        self.assertEqual(scorer.feature_spec.columns,FEATURE_SPEC.columns)
+
+    def test_soft_voting_shares_features_and_matches_sklearn(self):
+        members = [CompiledScorer.from_fitted(self.preprocessing_pipeline,model,self.label_encoder) for model in (self.model,self.challenger)]
+        features = SharedFeatures.from_records(self.records)
+        proba = VotingScorer(members,(3,1)).predict_proba_features(features)
+        # Both members read one encoded column set and one scaled matrix.
+        self.assertEqual(len(features._derived),2)
+
+        X = self.preprocessing_pipeline.transform(columns_to_frame(features.columns))
+        expected = (3 * self.model.predict_proba(X) + self.challenger.predict_proba(X)) / 4
+        np.testing.assert_allclose(proba,expected,rtol=1e-9,atol=1e-12)
+
+        reference = SklearnScorer(self.preprocessing_pipeline,self.model,self.label_encoder)
+        np.testing.assert_allclose(reference.predict_proba_features(features),self.model.predict_proba(X),rtol=1e-12)
+
+if __name__ == "__main__":
+    unittest.main()
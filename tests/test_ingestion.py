@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from src.data_ingestion import load_data,preprocessing,save_data,ingest_chunked
+from src.data_io import load_frame
+
+class ChunkedIngestionTest(unittest.TestCase):
+    # Streaming the CSV in small chunks must write the same raw_data as loading it
+    # in one frame: duplicates dropped across chunk boundaries and missing values
+    # filled with the medians and modes of the whole file.
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        n = 120
+        df = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n,p=[0.3,0.7]),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n,p=[0.6,0.4]),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+            'Personality' : rng.choice(['Extrovert','Introvert'],n),
+        }).astype(object)
+        for column in df.columns[:-1]:
+            df.loc[rng.random(n) < 0.1,column] = np.nan
+        # Repeats of earlier rows, most of them in a later chunk.
+        df = pd.concat([df,df.iloc[[0,3,5,50,51]],df.iloc[[60]]],ignore_index=True)
+        self.source = os.path.join(self.tmp.name,'source.csv')
+        df.to_csv(self.source,index=False)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_chunked_matches_in_memory(self):
+        for fmt in ('csv','parquet'):
+            with self.subTest(fmt=fmt):
+                memory_dir = os.path.join(self.tmp.name,f'memory_{fmt}')
+                chunked_dir = os.path.join(self.tmp.name,f'chunked_{fmt}')
+                save_data(preprocessing(load_data(self.source)),memory_dir,fmt)
+                ingest_chunked(self.source,chunked_dir,chunksize=7,fmt=fmt)
+
+                expected = load_frame(os.path.join(memory_dir,'raw',f'raw_data.{fmt}'))
+                actual = load_frame(os.path.join(chunked_dir,'raw',f'raw_data.{fmt}'))
+                self.assertEqual(len(actual),120)
+                self.assertFalse(actual.isna().any().any())
+                pd.testing.assert_frame_equal(actual.reset_index(drop=True),expected.reset_index(drop=True),check_dtype=False)
+
+if __name__ == "__main__":
+    unittest.main()
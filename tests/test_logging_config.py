@@ -0,0 +1,89 @@
+import unittest
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from config import logging_config
+from config.logging_config import _NonBlockingQueueHandler,restart_listeners,stop_listeners
+
+def log_in_worker(message):
+    logging.getLogger('test.logging_config').info(message)
+    return os.getpid()
+
+class QueuedHandlerForkTest(unittest.TestCase):
+    # A forked child must not lose the records it queued: pool workers exit
+    # without atexit, so they write directly; server workers restart a listener
+    # and stop it before exiting.
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        with mock.patch.object(logging_config,'LOG_ASYNC',True),mock.patch.object(logging_config,'LOG_TO_FILE',True):
+            handlers = logging_config._shared_handlers(self.tmp.name,'test.log')
+        self.handler = handlers[0]
+        self.assertIsInstance(self.handler,_NonBlockingQueueHandler)
+        self.listener = logging_config._listeners[-1]
+        self.logger = logging.getLogger('test.logging_config')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.handlers = [self.handler]
+
+    def tearDown(self):
+        self.logger.handlers = []
+        self.listener.stop()
+        logging_config._listeners.remove(self.listener)
+        for handler in self.listener.handlers:
+            handler.close()
+        del logging_config._handlers[(os.path.abspath(self.tmp.name),'test.log')]
+        self.tmp.cleanup()
+
+    def lines(self):
+        self.listener.stop()
+        self.listener.start()
+        with open(os.path.join(self.tmp.name,'test.log')) as f:
+            return f.read()
+
+    def fork(self,child):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = child()
+            finally:
+                os._exit(code)
+        _,status = os.waitpid(pid,0)
+        return os.waitstatus_to_exitcode(status)
+
+    def test_child_writes_synchronously(self):
+        def child():
+            # No listener thread in the child: the record is written before os._exit.
+            if logging_config._listeners or self.handler.direct is None:
+                return 2
+            self.logger.info('from the child')
+            return 0
+        self.assertEqual(self.fork(child),0)
+        self.assertIn('from the child',self.lines())
+        self.assertIsNone(self.handler.direct)
+
+    def test_restarted_listener_flushes_on_stop(self):
+        def child():
+            restart_listeners()
+            if len(logging_config._listeners) != 1 or self.handler.direct is not None:
+                return 2
+            self.logger.info('from a server worker')
+            stop_listeners()
+            return 0
+        self.assertEqual(self.fork(child),0)
+        self.assertIn('from a server worker',self.lines())
+
+    def test_process_pool_workers_keep_their_records(self):
+        with ProcessPoolExecutor(2,mp_context=multiprocessing.get_context('fork')) as pool:
+            pids = set(pool.map(log_in_worker,[f'pool record {i}' for i in range(6)]))
+        self.assertNotIn(os.getpid(),pids)
+        text = self.lines()
+        for i in range(6):
+            self.assertIn(f'pool record {i}',text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from api.metrics import Counter,Histogram,MetricsMiddleware,METRICS,REGISTRY
+
+def make_app(status:int,route_path:str = None):
+    async def app(scope,receive,send):
+        if route_path:
+            scope['route'] = SimpleNamespace(path=route_path)
+        await send({'type' : 'http.response.start','status' : status,'headers' : []})
+        await send({'type' : 'http.response.body','body' : b''})
+    return app
+
+def request(app,method:str,path:str):
+    async def send(message):
+        pass
+    asyncio.run(MetricsMiddleware(app)({'type' : 'http','method' : method,'path' : path},None,send))
+
+class MetricsTest(unittest.TestCase):
+
+    def test_label_values_are_escaped(self):
+        counter = Counter('c','help',('path',))
+        counter.inc('a\\b "c"\nd')
+        self.assertEqual(list(counter.samples()),['c{path="a\\\\b \\"c\\"\\nd"} 1'])
+
+        histogram = Histogram('h','help',('path',),buckets=(1.0,))
+        histogram.observe('"x"',value=0.5)
+        self.assertEqual(list(histogram.samples()),['h_bucket{path="\\"x\\"",le="1.0"} 1','h_bucket{path="\\"x\\"",le="+Inf"} 1','h_sum{path="\\"x\\""} 0.5','h_count{path="\\"x\\""} 1'])
+
+    def test_requests_without_a_route_share_one_label(self):
+        before = dict(METRICS['requests']._values)
+        request(make_app(200,'/items/{item_id}'),'GET','/items/1')
+        request(make_app(200,'/items/{item_id}'),'GET','/items/2')
+        # Raw paths of unrouted requests would grow the label set without bound.
+        request(make_app(404),'GET','/nope/1')
+        request(make_app(405),'DELETE','/predict')
+        request(make_app(500),'GET','/nope/2')
+
+        def delta(*labels):
+            return METRICS['requests']._values.get(labels,0) - before.get(labels,0)
+        self.assertEqual(delta('GET','/items/{item_id}',200),2)
+        self.assertEqual(delta('GET','unmatched',404),1)
+        self.assertEqual(delta('DELETE','unmatched',405),1)
+        self.assertEqual(delta('GET','unmatched',500),1)
+        paths = {labels[1] for labels in METRICS['requests']._values}
+        self.assertFalse({'/items/1','/nope/1','/nope/2'} & paths)
+        self.assertIn('http_errors_total{path="unmatched",status="405"}',REGISTRY.render())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,8 @@ import joblib
 import mlflow
 import pandas as pd
 import os
+import yaml
+from src.data_io import storage_config,data_path,load_frame
 from sklearn.metrics import accuracy_score,precision_score,recall_score,f1_score
 
 class TestModel(unittest.TestCase):
@@ -27,7 +29,9 @@ class TestModel(unittest.TestCase):
         cls.new_model = mlflow.pyfunc.load_model(cls.new_model_uri)
 
         cls.preprcessing_pipeline = joblib.load('local_Storage/models/preprocessing_pipeline.pkl')
-        cls.test_data = pd.read_csv("local_Storage/data/processed/test.csv")
+        with open('params.yaml') as f:
+            fmt,_ = storage_config(yaml.safe_load(f))
+        cls.test_data = load_frame(data_path('local_Storage/data/processed','test',fmt))
 
     @staticmethod
     def get_latest_model_version(model_name,stage='Staging'):
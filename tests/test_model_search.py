@@ -0,0 +1,78 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from src.model_search import FoldCache,generate_candidates,run_search
+from src.model_training import build_model
+
+class ModelSearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name,'folds')
+        rng = np.random.default_rng(0)
+        self.X = rng.standard_normal((300,4))
+        self.y = (self.X[:,0] + 0.5 * rng.standard_normal(300) > 0).astype(int)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def search(self,**search_params):
+        params = {'cv' : 3,'n_jobs' : 1,'random_state' : 0,**search_params}
+        return run_search(self.X,self.y,params,{'logistic_regression' : {'max_iter' : 200}},build_model,self.cache_dir)
+
+    def assert_ranked(self,leaderboard):
+        self.assertEqual([row['rank'] for row in leaderboard],list(range(1,len(leaderboard) + 1)))
+        for row in leaderboard:
+            self.assertTrue(0 <= row['mean_score'] <= 1)
+            self.assertGreaterEqual(row['std_score'],0)
+
+    def test_grid_scores_every_combination(self):
+        best,summary = self.search(strategy='grid',space={'logistic_regression' : {'C' : [0.001,1.0],'penalty' : ['l2']},'svc' : {'C' : [1.0],'kernel' : ['linear','rbf']}})
+        leaderboard = summary['leaderboard']
+        self.assertEqual(len(leaderboard),4)
+        self.assert_ranked(leaderboard)
+        self.assertEqual(best,leaderboard[0])
+        self.assertEqual(best['mean_score'],max(row['mean_score'] for row in leaderboard))
+        # Base params of the model type are kept under the searched ones.
+        self.assertEqual({row['params']['max_iter'] for row in leaderboard if row['model_type'] == 'logistic_regression'},{200})
+
+    def test_random_samples_n_iter_from_distributions(self):
+        best,summary = self.search(strategy='random',n_iter=5,space={'logistic_regression' : {'C' : {'loguniform' : [0.01,10]}}})
+        self.assertEqual(len(summary['leaderboard']),5)
+        for row in summary['leaderboard']:
+            self.assertTrue(0.01 <= row['params']['C'] <= 10)
+            self.assertIsInstance(row['params']['C'],float)
+
+    def test_halving_promotes_the_best_to_all_rows(self):
+        space = {'logistic_regression' : {'C' : [0.0001,0.001,0.01,0.1,1.0,10.0]}}
+        best,summary = self.search(strategy='halving',factor=3,min_resources=20,space=space)
+        leaderboard = summary['leaderboard']
+        rungs = sorted({row['rung'] for row in leaderboard})
+        self.assertEqual(rungs,[0,1])
+        first = [row for row in leaderboard if row['rung'] == 0]
+        last = [row for row in leaderboard if row['rung'] == 1]
+        self.assertEqual((len(first),len(last)),(6,2))
+        self.assertLess(first[0]['n_train_rows'],last[0]['n_train_rows'])
+        self.assertEqual(last[0]['n_train_rows'],200)
+        self.assertEqual(best,last[0])
+        self.assert_ranked(leaderboard)
+
+    def test_unknown_strategy_is_rejected(self):
+        with self.assertRaises(ValueError):
+            generate_candidates({'strategy' : 'bayes','space' : {}},{})
+
+    def test_fold_cache_evicts_least_recently_used(self):
+        first = FoldCache(self.cache_dir,self.X,self.y,3,0)
+        split_mb = sum(entry.stat().st_size for entry in os.scandir(first.dir)) / 2 ** 20
+        # Room for two splits.
+        second = FoldCache(self.cache_dir,self.X + 1,self.y,3,0,max_size_mb=2.5 * split_mb)
+        os.utime(os.path.join(first.dir,'done'),(0,0))
+        # Reusing the first split makes the second the least recently used.
+        FoldCache(self.cache_dir,self.X,self.y,3,0,max_size_mb=2.5 * split_mb)
+        third = FoldCache(self.cache_dir,self.X + 2,self.y,3,0,max_size_mb=2.5 * split_mb)
+        self.assertFalse(os.path.exists(second.dir))
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),sorted([os.path.basename(first.dir),os.path.basename(third.dir)]))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+import os
+import tempfile
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import LabelEncoder,StandardScaler
+from types import SimpleNamespace
+from api.model_store import ChecksumError,LocalModelStore,MlflowRegistrySource,ModelBundle,PIPELINE_FILE,get_latest_model_version,load_bundle,load_model_ref
+
+class LocalModelStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = LocalModelStore(os.path.join(self.tmp.name,'store'))
+        rng = np.random.default_rng(0)
+        X,y = rng.standard_normal((40,3)),np.arange(40) % 2
+        self.parts = {
+            'model' : LogisticRegression().fit(X,y),
+            'preprocessing_pipeline' : StandardScaler().fit(X),
+            'label_encoder' : LabelEncoder().fit(['Extrovert','Introvert']),
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def bundle(self,version:str,source:str = 'test',**parts):
+        return ModelBundle(model_name='m',version=version,source=source,**{**self.parts,**parts})
+
+    def versions_dir(self):
+        return os.path.join(self.store.root,'m','versions')
+
+    def test_save_is_atomic(self):
+        self.store.save(self.bundle('1'),stage='Production')
+        self.assertEqual(self.store.latest_version('m','Production'),'1')
+        self.assertEqual(self.store.load('m','1').version,'1')
+
+        # A save that fails half way leaves neither the version nor its temporary directory.
+        with self.assertRaises(Exception):
+            self.store.save(self.bundle('2',label_encoder=lambda: None),stage='Production')
+        self.assertEqual(sorted(os.listdir(self.versions_dir())),['1'])
+        self.assertEqual(self.store.latest_version('m','Production'),'1')
+
+    def test_checksum_mismatch_is_rejected(self):
+        self.store.save(self.bundle('1'))
+        with open(os.path.join(self.store.version_dir('m','1'),PIPELINE_FILE),'ab') as f:
+            f.write(b'tampered')
+        with self.assertRaises(ChecksumError):
+            self.store.load('m','1')
+
+    def test_auto_falls_back_to_registry(self):
+        remote_bundle = self.bundle('3',source='mlflow')
+        with mock.patch.object(MlflowRegistrySource,'latest_version',return_value='3') as latest, \
+             mock.patch.object(MlflowRegistrySource,'load',return_value=remote_bundle):
+            # Fresh local copy: the registry is not asked.
+            self.store.save(self.bundle('1'),stage='Production')
+            bundle = load_bundle('m','Production','auto',self.store.root,max_age_s=3600)
+            self.assertEqual((bundle.version,bundle.source),('1','local'))
+            latest.assert_not_called()
+
+            # Corrupt local copy: fetched from the registry and cached locally.
+            with open(os.path.join(self.store.version_dir('m','1'),PIPELINE_FILE),'ab') as f:
+                f.write(b'tampered')
+            bundle = load_bundle('m','Production','auto',self.store.root,max_age_s=3600)
+            self.assertEqual((bundle.version,bundle.source),('3','mlflow'))
+            self.assertEqual(self.store.latest_version('m','Production'),'3')
+            self.assertTrue(self.store.has_version('m','3'))
+
+    def test_auto_without_local_copy_uses_registry(self):
+        with mock.patch.object(MlflowRegistrySource,'latest_version',return_value='5'), \
+             mock.patch.object(MlflowRegistrySource,'load',return_value=self.bundle('5',source='mlflow')):
+            bundle = load_bundle('m','Production','auto',self.store.root,max_age_s=3600)
+        self.assertEqual(bundle.version,'5')
+        self.assertEqual(self.store.load('m','5').source,'local')
+
+        with self.assertRaises(RuntimeError):
+            load_bundle('m','Staging','local',self.store.root,max_age_s=3600)
+
+    def test_only_the_served_stage_falls_back_to_unstaged_versions(self):
+        # The registry has no Staging version, only an unstaged v4.
+        def get_latest_versions(name,stages):
+            return [SimpleNamespace(version='4')] if stages == ['None'] else []
+        client = mock.Mock(get_latest_versions=mock.Mock(side_effect=get_latest_versions))
+        with mock.patch('mlflow.MlflowClient',return_value=client):
+            self.assertEqual(get_latest_model_version('m','Staging'),'4')
+            self.assertIsNone(get_latest_model_version('m','Staging',unstaged_fallback=False))
+
+        with mock.patch('api.model_store.configure_mlflow'), \
+             mock.patch('api.model_store.get_latest_model_version',side_effect=lambda name,stage,fallback: '4' if fallback else None), \
+             mock.patch.object(MlflowRegistrySource,'load',return_value=self.bundle('4',source='mlflow')) as load:
+            self.assertEqual(load_bundle('m','Staging','mlflow',self.store.root,max_age_s=3600).version,'4')
+            # A shadow or ensemble member ref must not pick up the unstaged version.
+            load.reset_mock()
+            with self.assertRaises(RuntimeError):
+                load_model_ref('m','Staging','mlflow',os.path.join(self.tmp.name,'other'),max_age_s=3600)
+            load.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
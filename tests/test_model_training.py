@@ -0,0 +1,138 @@
+import unittest
+import os
+import tempfile
+import pickle
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder,StandardScaler
+from sklearn.linear_model import LogisticRegression
+from src.model_training import build_model,export_model_bundle,load_resumable_model,train_incremental
+
+class BuildModelTest(unittest.TestCase):
+
+    def test_kernel_approximation_splits_params(self):
+        # Feature map keys go to the feature map, the rest to the SGD classifier;
+        # random_state seeds both.
+        params = {'gamma' : 0.5,'n_components' : 20,'loss' : 'log_loss','alpha' : 0.001,'random_state' : 3}
+        for model_type in ('svc_nystroem','svc_rff'):
+            with self.subTest(model_type=model_type):
+                model = build_model(model_type,params)
+                features,classifier = model.named_steps['features'],model.named_steps['classifier']
+                self.assertEqual((features.gamma,features.n_components,features.random_state),(0.5,20,3))
+                self.assertEqual((classifier.loss,classifier.alpha,classifier.random_state),('log_loss',0.001,3))
+
+                rng = np.random.default_rng(0)
+                X,y = rng.standard_normal((80,3)),np.arange(80) % 2
+                model.fit(X,y)
+                self.assertEqual(model[:-1].transform(X[:5]).shape,(5,20))
+
+    def test_shared_keys_reach_both_steps(self):
+        # n_jobs exists on Nystroem and SGDClassifier; prefixes target one step.
+        model = build_model('svc_nystroem',{'n_jobs' : 2,'n_components' : 20,'classifier__alpha' : 0.01,'features__random_state' : 1,'random_state' : 3})
+        features,classifier = model.named_steps['features'],model.named_steps['classifier']
+        self.assertEqual((features.n_jobs,classifier.n_jobs),(2,2))
+        self.assertEqual(classifier.alpha,0.01)
+        self.assertEqual((features.random_state,classifier.random_state),(1,3))
+
+    def test_unknown_param_is_rejected(self):
+        for params in ({'gama' : 0.1},{'classifier__gamma' : 0.1},{'scaler__with_mean' : False}):
+            with self.subTest(params=params):
+                with self.assertRaises(ValueError):
+                    build_model('svc_rff',params)
+
+    def test_unknown_model_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            build_model('random_forest',{})
+
+class ExportModelBundleTest(unittest.TestCase):
+
+    def test_unsupported_model_removes_stale_bundle(self):
+        # The array bundle of a previous run must not outlive the model it was made from.
+        with tempfile.TemporaryDirectory() as tmp:
+            rng = np.random.default_rng(0)
+            X,y = rng.standard_normal((50,3)),np.arange(50) % 2
+            joblib.dump(StandardScaler().fit(X),os.path.join(tmp,'preprocessing_pipeline.pkl'))
+            joblib.dump(LabelEncoder().fit(['Extrovert','Introvert']),os.path.join(tmp,'label_encoder.pkl'))
+            bundle_dir = os.path.join(tmp,'model_bundle')
+            os.makedirs(bundle_dir)
+            with open(os.path.join(bundle_dir,'manifest.json'),'w') as f:
+                f.write('{"verified" : true}')
+
+            export_model_bundle(LogisticRegression().fit(X,y),X,tmp,bundle_dir)
+            self.assertFalse(os.path.exists(bundle_dir))
+
+class TrainIncrementalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        X = rng.standard_normal((100,3)) * [1,5,10] + [0,2,-3]
+        self.df = pd.DataFrame(X,columns=['a','b','c'])
+        self.df['target'] = (X[:,0] > 0).astype(int)
+        self.train_path = os.path.join(self.tmp.name,'train.csv')
+        self.df.to_csv(self.train_path,index=False)
+        self.label_encoder_path = os.path.join(self.tmp.name,'label_encoder.pkl')
+        joblib.dump(LabelEncoder().fit(['Extrovert','Introvert']),self.label_encoder_path)
+        self.model_path = os.path.join(self.tmp.name,'trained_model.pkl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def params(self,resume:bool = False,n_epochs:int = 2):
+        return {'model_training' : {
+            'sgd_incremental' : {'loss' : 'hinge','alpha' : 0.0001,'random_state' : 0},
+            'incremental' : {'chunksize' : 30,'n_epochs' : n_epochs,'resume' : resume},
+        }}
+
+    def train(self,**kwargs):
+        return train_incremental(self.train_path,self.params(**kwargs),self.label_encoder_path,self.model_path)
+
+    def save(self,model):
+        with open(self.model_path,'wb') as f:
+            pickle.dump(model,f)
+
+    def test_streams_every_chunk(self):
+        model,sample = self.train()
+        scaler,classifier = model[0],model[-1]
+        # Scaler statistics over all four chunks match the whole file.
+        X = self.df.drop(columns=['target'])
+        self.assertEqual(scaler.n_samples_seen_,100)
+        np.testing.assert_allclose(scaler.mean_,X.mean().to_numpy())
+        np.testing.assert_allclose(scaler.var_,X.var(ddof=0).to_numpy())
+        # n_epochs passes over 100 rows.
+        self.assertEqual(classifier.t_ - 1,200)
+        np.testing.assert_array_equal(classifier.classes_,[0,1])
+        # The sample kept for bundle verification is the first chunk.
+        pd.testing.assert_frame_equal(sample,X.iloc[:30])
+        self.assertGreater((model.predict(X) == self.df['target']).mean(),0.8)
+
+    def test_resume_continues_from_saved_model(self):
+        model,_ = self.train()
+        self.save(model)
+        resumed,_ = self.train(resume=True,n_epochs=1)
+        self.assertEqual(resumed[0].n_samples_seen_,200)
+        self.assertEqual(resumed[-1].t_ - 1,300)
+
+        fresh,_ = self.train(resume=False,n_epochs=1)
+        self.assertEqual(fresh[0].n_samples_seen_,100)
+        self.assertEqual(fresh[-1].t_ - 1,100)
+
+    def test_load_resumable_model(self):
+        self.assertIsNone(load_resumable_model(self.model_path))
+        self.save(LogisticRegression().fit(self.df[['a']],self.df['target']))
+        self.assertIsNone(load_resumable_model(self.model_path))
+        # A non-incremental model at the path is not resumed from.
+        model,_ = self.train(resume=True,n_epochs=1)
+        self.assertEqual(model[0].n_samples_seen_,100)
+
+        self.save(model)
+        self.assertIsNotNone(load_resumable_model(self.model_path))
+
+    def test_empty_training_file_is_rejected(self):
+        self.df.iloc[:0].to_csv(self.train_path,index=False)
+        with self.assertRaises(ValueError):
+            self.train()
+
+if __name__ == "__main__":
+    unittest.main()
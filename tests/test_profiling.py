@@ -0,0 +1,97 @@
+import unittest
+import json
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+import pandas as pd
+from src import profiling
+from src.profiling import add_rows,annotate,profile_stage,profiled,section
+from src.stage_cache import StageCache
+
+@profiled
+def make_frame(n):
+    return pd.DataFrame({'x' : np.arange(n)}),'extra'
+
+@profiled(name='stream',rows=None)
+def stream(chunks):
+    for chunk in chunks:
+        add_rows(len(chunk))
+        make_frame(len(chunk))
+
+def numeric_only(value):
+    if isinstance(value,dict):
+        return all(numeric_only(v) for v in value.values())
+    return isinstance(value,(int,float)) and not isinstance(value,bool)
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_stage(self,name:str = 'stage',**env):
+        with mock.patch.dict(os.environ,env):
+            with profile_stage(name,self.tmp.name,self.tmp.name):
+                stream([range(10),range(15)])
+                make_frame(40)
+                with section('block'):
+                    annotate(cache_hit=1)
+        with open(os.path.join(self.tmp.name,f'{name}.json')) as f:
+            return json.load(f)
+
+    def test_records_functions_and_rows(self):
+        timings = self.run_stage()
+        functions = timings['functions']
+        self.assertEqual(set(functions),{'stream','make_frame','block'})
+        self.assertEqual((functions['make_frame']['calls'],functions['make_frame']['rows']),(3,65))
+        self.assertEqual((functions['stream']['calls'],functions['stream']['rows']),(1,25))
+        self.assertEqual(timings['rows'],65)
+        self.assertEqual(timings['cache_hit'],1)
+        self.assertGreaterEqual(timings['wall_s'],functions['stream']['wall_s'])
+        self.assertIn('peak_mb',timings)
+
+    def test_timings_are_numeric_for_dvc_metrics(self):
+        self.assertTrue(numeric_only(self.run_stage()))
+        # No tracemalloc: the peaks are left out, not written as null.
+        timings = self.run_stage(PIPELINE_TRACEMALLOC='0')
+        self.assertTrue(numeric_only(timings))
+        self.assertNotIn('peak_mb',timings)
+        self.assertNotIn('peak_mb',timings['functions']['make_frame'])
+
+    def test_stage_cache_result_is_numeric(self):
+        cache = StageCache(os.path.join(self.tmp.name,'cache'))
+        with profile_stage('cached',self.tmp.name,self.tmp.name):
+            cache.restore('cached',cache.key('cached',[],{},[]),{})
+        with open(os.path.join(self.tmp.name,'cached.json')) as f:
+            timings = json.load(f)
+        self.assertTrue(numeric_only(timings))
+        self.assertEqual((timings['cache_hit'],timings['cache_enabled']),(0,1))
+
+    def test_annotate_rejects_non_numbers(self):
+        with self.assertRaises(TypeError):
+            annotate(cache='miss')
+        with self.assertRaises(TypeError):
+            annotate(cache_hit=True)
+
+    def test_profiled_outside_a_stage_is_a_passthrough(self):
+        self.assertIsNone(profiling._active)
+        df,extra = make_frame(5)
+        self.assertEqual((len(df),extra),(5,'extra'))
+        add_rows(5)
+        self.assertEqual(os.listdir(self.tmp.name),[])
+
+    def test_unknown_profiler_is_rejected(self):
+        with mock.patch.dict(os.environ,{'PIPELINE_PROFILE' : 'perf'}):
+            with self.assertRaises(ValueError):
+                with profile_stage('stage',self.tmp.name,self.tmp.name):
+                    pass
+
+    def test_cprofile_dump(self):
+        self.run_stage(PIPELINE_PROFILE='cprofile')
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name,'stage.prof')))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder,LabelEncoder
+from src.features import FEATURE_SPEC
+from src.data_preprocessing import make_derieved_features
+from api.app import UserInput
+from api.model_store import LocalModelStore,ModelBundle,MODEL_FILE
+from api.reloader import ModelReloader,build_serving_model
+from api.settings import Settings
+from api.inference import sample_records
+
+class ModelReloaderTest(unittest.TestCase):
+    # A reload replaces app.state.active in one assignment; a version that fails
+    # to load leaves the served model in place.
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        n = 300
+        raw = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+        })
+        target = np.where(raw['Time_spent_Alone'] > raw['Going_outside'],'Introvert','Extrovert')
+        train_df = make_derieved_features(raw.copy())
+        cls.pipeline = ColumnTransformer(transformers=[
+            ('num',StandardScaler(),FEATURE_SPEC.numeric_columns + FEATURE_SPEC.derived_columns),
+            ('cat',OrdinalEncoder(),FEATURE_SPEC.binary_columns)
+        ]).fit(train_df)
+        cls.label_encoder = LabelEncoder().fit(target)
+        cls.X,cls.y = cls.pipeline.transform(train_df),cls.label_encoder.transform(target)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = Settings(model_name='m',model_source='local',model_store_dir=self.tmp.name,prediction_cache='off',drift_enabled=False)
+        self.store = LocalModelStore(self.tmp.name)
+        self.publish('1')
+        bundle = self.store.load('m','1')
+        self.state = SimpleNamespace(active=build_serving_model(bundle,UserInput,self.settings,warmup_size=0))
+        self.reloader = ModelReloader(self.state,UserInput,self.settings)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def publish(self,version:str,C:float = 1.0):
+        model = LogisticRegression(C=C).fit(self.X,self.y)
+        self.store.save(ModelBundle('m',version,model,self.pipeline,self.label_encoder,'test'),stage='Production')
+
+    def test_new_version_is_swapped_in(self):
+        previous = self.state.active
+        self.assertEqual(asyncio.run(self.reloader.check()),{'reloaded' : False,'model_version' : '1'})
+
+        self.publish('2',C=0.01)
+        result = asyncio.run(self.reloader.check())
+        self.assertEqual(result,{'reloaded' : True,'previous_version' : '1','model_version' : '2'})
+        self.assertEqual(self.state.active.version,'2')
+        self.assertEqual(self.reloader.reloads,1)
+        # A request still holding the previous ServingModel finishes on it.
+        self.assertEqual(previous.version,'1')
+        records = sample_records(UserInput,10)
+        self.assertEqual(len(previous.predict_records(records)[0]),10)
+
+    def test_failed_load_keeps_current_model(self):
+        current = self.state.active
+        self.publish('2')
+        with open(os.path.join(self.store.version_dir('m','2'),MODEL_FILE),'ab') as f:
+            f.write(b'tampered')
+
+        with self.assertRaises(Exception):
+            asyncio.run(self.reloader.check())
+        self.assertIs(self.state.active,current)
+        self.assertIn('Checksum mismatch',self.reloader.last_error)
+        self.assertEqual(self.reloader.reloads,0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import asyncio
+from api.server import WorkerServer
+
+async def echo_app(scope,receive,send):
+    await send({'type' : 'http.response.start','status' : 200,'headers' : [(b'content-type',b'text/plain')]})
+    await send({'type' : 'http.response.body','body' : b'ok'})
+
+class WorkerServerTest(unittest.TestCase):
+    # A stopping worker keeps answering, but tells clients to drop the connection
+    # instead of having keep-alive connections closed under them.
+
+    def respond(self,server):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+        asyncio.run(server.asgi({'type' : 'http'},None,send))
+        return dict(messages[0]['headers'])
+
+    def test_connection_close_only_while_draining(self):
+        server = WorkerServer(echo_app)
+        self.assertNotIn(b'connection',self.respond(server))
+
+        server.drain_started = 0.0
+        self.assertEqual(self.respond(server)[b'connection'],b'close')
+
+    def test_first_signal_drains_second_exits(self):
+        server = WorkerServer(echo_app)
+        server.handle_exit(15,None)
+        self.assertTrue(server.drain_requested)
+        self.assertFalse(server.should_exit)
+
+        server.drain_started = 0.0
+        server.handle_exit(15,None)
+        self.assertTrue(server.should_exit)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import unittest
+import json
+import os
+import tempfile
+import threading
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler,OrdinalEncoder,LabelEncoder
+from src.features import FEATURE_SPEC
+from src.data_preprocessing import make_derieved_features
+from api.app import app,UserInput
+from api.compiled import VotingScorer
+from api.inference import SharedFeatures,sample_records
+from api.model_store import LocalModelStore,ModelBundle
+from api.reloader import build_serving_model,load_models
+from api.settings import Settings
+from api.shadow import ShadowRunner
+
+class FakeScorer:
+
+    def __init__(self,labels = None,error:Exception = None,gate:threading.Event = None):
+        self.labels = labels
+        self.error = error
+        self.gate = gate
+
+    def predict_features(self,features,timer = None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return np.array([self.labels] * len(features),dtype=object)
+
+def fake_model(version:str,**kwargs):
+    return SimpleNamespace(version=version,scorer=FakeScorer(**kwargs))
+
+class ShadowTest(unittest.TestCase):
+    # Shadow models score the served traffic off the request path, cache hits
+    # included, and never hold up or fail the primary.
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.log_path = os.path.join(cls.tmp.name,'shadow','predictions.ndjson')
+        rng = np.random.default_rng(0)
+        n = 300
+        raw = pd.DataFrame({
+            'Time_spent_Alone' : rng.integers(0,12,n).astype(float),
+            'Stage_fear' : rng.choice(['Yes','No'],n),
+            'Social_event_attendance' : rng.integers(0,11,n).astype(float),
+            'Going_outside' : rng.integers(0,8,n).astype(float),
+            'Drained_after_socializing' : rng.choice(['Yes','No'],n),
+            'Friends_circle_size' : rng.integers(0,16,n).astype(float),
+            'Post_frequency' : rng.integers(0,11,n).astype(float),
+        })
+        target = np.where(raw['Time_spent_Alone'] > raw['Going_outside'],'Introvert','Extrovert')
+        train_df = make_derieved_features(raw.copy())
+        pipeline = ColumnTransformer(transformers=[
+            ('num',StandardScaler(),FEATURE_SPEC.numeric_columns + FEATURE_SPEC.derived_columns),
+            ('cat',OrdinalEncoder(),FEATURE_SPEC.binary_columns)
+        ]).fit(train_df)
+        label_encoder = LabelEncoder().fit(target)
+        X,y = pipeline.transform(train_df),label_encoder.transform(target)
+
+        cls.store_dir = os.path.join(cls.tmp.name,'store')
+        store = LocalModelStore(cls.store_dir)
+        # Version 3 is version 1 again: it must agree on every record.
+        for version,C in (('1',1.0),('2',0.001),('3',1.0)):
+            store.save(ModelBundle('m',version,LogisticRegression(C=C).fit(X,y),pipeline,label_encoder,'test'),stage='Production' if version == '1' else None)
+        cls.store = store
+        cls.records = sample_records(UserInput,40,seed=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def settings(self,**kwargs):
+        return Settings(model_name='m',model_source='local',model_store_dir=self.store_dir,drift_enabled=False,**kwargs)
+
+    def runner(self,models,**kwargs):
+        runner = ShadowRunner(models,log_path=self.log_path,**kwargs)
+        self.addCleanup(runner.stop)
+        return runner
+
+    def serving_model(self,members = (),shadow = None,**kwargs):
+        settings = self.settings(**kwargs)
+        return build_serving_model(self.store.load('m','1'),UserInput,settings,warmup_size=0,members=load_models(members,UserInput,settings),shadow=shadow)
+
+    def log_lines(self):
+        with open(self.log_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_scores_and_logs_agreement(self):
+        shadows = load_models(['2','3'],UserInput,self.settings())
+        runner = self.runner(shadows)
+        primary = self.serving_model(shadow=runner,prediction_cache='off')
+        before = len(self.log_lines()) if os.path.exists(self.log_path) else 0
+
+        labels,_ = primary.predict_records(self.records)
+        runner.stop()
+        stats = runner.stats()
+        self.assertEqual((stats['submitted'],stats['dropped'],stats['pending']),(1,0,0))
+        self.assertEqual(stats['models']['3']['agreement'],1.0)
+        self.assertEqual(stats['models']['2']['records'],40)
+        expected = np.asarray(shadows[0].scorer.predict_records(self.records))
+        self.assertEqual(stats['models']['2']['agreed'],int((expected == labels).sum()))
+
+        lines = self.log_lines()[before:]
+        self.assertEqual([line['shadow_version'] for line in lines],['2','3'])
+        self.assertEqual(lines[0]['primary'],list(labels))
+        self.assertEqual(lines[0]['shadow'],list(expected))
+        self.assertEqual(len(lines[0]['inputs']['Time_spent_Alone']),40)
+
+    def test_submit_records_builds_the_features(self):
+        model = load_models(['3'],UserInput,self.settings())
+        runner = self.runner(model)
+        labels = model[0].scorer.predict_records(self.records)
+        runner.submit_records(self.records,labels,'1')
+        runner.submit(SharedFeatures.from_records(self.records),labels,'1')
+        runner.stop()
+        stats = runner.stats()['models']['3']
+        self.assertEqual((stats['batches'],stats['records'],stats['agreed']),(2,80,80))
+
+    def test_full_queue_drops_batches(self):
+        gate = threading.Event()
+        runner = self.runner([fake_model('s',labels='Introvert',gate=gate)],max_pending=1)
+        features = SharedFeatures.from_records(self.records[:2])
+        for _ in range(3):
+            runner.submit(features,['Introvert','Extrovert'],'1')
+        gate.set()
+        runner.stop()
+        stats = runner.stats()
+        self.assertEqual((stats['submitted'],stats['dropped']),(1,2))
+        self.assertEqual(stats['models']['s']['agreed'],1)
+
+    def test_failing_shadow_is_counted_and_skipped(self):
+        runner = self.runner([fake_model('bad',error=RuntimeError('boom')),fake_model('good',labels='Introvert')])
+        runner.submit(SharedFeatures.from_records(self.records[:4]),['Introvert'] * 4,'1')
+        runner.stop()
+        stats = runner.stats()['models']
+        self.assertEqual((stats['bad']['errors'],stats['bad']['batches']),(1,0))
+        self.assertEqual(stats['good']['agreement'],1.0)
+
+    def test_sample_rate_zero_submits_nothing(self):
+        runner = self.runner([fake_model('s',labels='Introvert')],sample_rate=0.0)
+        runner.submit(SharedFeatures.from_records(self.records[:4]),['Introvert'] * 4,'1')
+        runner.stop()
+        self.assertEqual(runner.stats()['submitted'],0)
+
+    def test_ensemble_soft_votes_and_feeds_the_shadow(self):
+        runner = self.runner(load_models(['3'],UserInput,self.settings()))
+        ensemble = self.serving_model(members=['2'],shadow=runner,prediction_cache='off',ensemble_weights=(3.0,1.0))
+        self.assertIsInstance(ensemble.scorer,VotingScorer)
+        self.assertEqual(ensemble.version,'1+2')
+
+        features = SharedFeatures.from_records(self.records)
+        first,second = ensemble.scorer.scorers
+        expected = 0.75 * first.predict_proba_features(features) + 0.25 * second.predict_proba_features(features)
+        labels,proba = ensemble.predict_features(features,None)
+        np.testing.assert_allclose(proba,expected)
+        np.testing.assert_array_equal(labels,ensemble.scorer.labels[expected.argmax(axis=1)])
+        runner.stop()
+        self.assertEqual(runner.stats()['models']['3']['records'],40)
+
+    def test_cache_hits_are_shadowed(self):
+        runner = self.runner(load_models(['3'],UserInput,self.settings()))
+        active = self.serving_model(shadow=runner,prediction_cache='lru')
+        state = (app.state.active,getattr(app.state,'batcher',None))
+        app.state.active,app.state.batcher = active,None
+        try:
+            client = TestClient(app)
+            payload = self.records[0].model_dump(by_alias=True)
+            for _ in range(2):
+                self.assertEqual(client.post('/predict',json=payload).status_code,200)
+            batch = [record.model_dump(by_alias=True) for record in self.records[:3]]
+            self.assertEqual(client.post('/predict_batch',json=batch).status_code,200)
+        finally:
+            app.state.active,app.state.batcher = state
+        runner.stop()
+        self.assertEqual(active.cache.stats()['hits'],2)
+        stats = runner.stats()
+        # One miss and one hit on /predict; a hit batch and a miss batch on /predict_batch.
+        self.assertEqual(stats['submitted'],4)
+        self.assertEqual((stats['models']['3']['records'],stats['models']['3']['agreed']),(5,5))
+
+if __name__ == "__main__":
+    unittest.main()
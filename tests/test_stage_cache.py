@@ -0,0 +1,74 @@
+import unittest
+import os
+import tempfile
+from src.stage_cache import StageCache
+
+class StageCacheTest(unittest.TestCase):
+    # A cached stage must restore exactly what it stored, and any change to its
+    # inputs or params must miss.
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.cache = StageCache(os.path.join(self.root,'cache'),max_size_mb=1)
+        self.input = self.write('input.csv','a,b\n1,2\n')
+        self.output = os.path.join(self.root,'output.csv')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self,name,text):
+        path = os.path.join(self.root,name)
+        with open(path,'w') as f:
+            f.write(text)
+        return path
+
+    def test_hit_restores_outputs(self):
+        key = self.cache.key('stage',[self.input],{'p' : 1},[__file__])
+        self.assertFalse(self.cache.restore('stage',key,{'out' : self.output}))
+        self.write('output.csv','result')
+        self.cache.store('stage',key,{'out' : self.output})
+        os.remove(self.output)
+
+        self.assertTrue(self.cache.restore('stage',key,{'out' : self.output}))
+        with open(self.output) as f:
+            self.assertEqual(f.read(),'result')
+
+    def test_hit_removes_outputs_the_stage_did_not_produce(self):
+        # A stale array bundle from another model must not survive a restore.
+        bundle = os.path.join(self.root,'bundle')
+        stale = os.path.join(self.root,'stale.json')
+        key = self.cache.key('stage',[self.input],{'p' : 1},[__file__])
+        self.write('output.csv','result')
+        self.cache.store('stage',key,{'out' : self.output,'bundle' : bundle,'stale' : stale})
+
+        os.makedirs(bundle)
+        self.write('bundle/manifest.json','{}')
+        self.write('stale.json','{}')
+        self.assertTrue(self.cache.restore('stage',key,{'out' : self.output,'bundle' : bundle,'stale' : stale}))
+        self.assertTrue(os.path.exists(self.output))
+        self.assertFalse(os.path.exists(bundle))
+        self.assertFalse(os.path.exists(stale))
+
+    def test_key_changes_with_inputs_and_params(self):
+        key = self.cache.key('stage',[self.input],{'p' : 1},[__file__])
+        self.assertEqual(key,self.cache.key('stage',[self.input],{'p' : 1},[__file__]))
+        self.assertNotEqual(key,self.cache.key('stage',[self.input],{'p' : 2},[__file__]))
+        self.write('input.csv','a,b\n1,3\n')
+        self.assertNotEqual(key,self.cache.key('stage',[self.input],{'p' : 1},[__file__]))
+
+    def test_evicts_least_recently_used(self):
+        keys = []
+        for i in range(3):
+            # 400 KB each against a 1 MB limit.
+            self.write('output.csv','x' * 400 * 1024)
+            keys.append(self.cache.key('stage',[self.input],{'p' : i},[__file__]))
+            self.cache.store('stage',keys[-1],{'out' : self.output})
+            if i == 1:
+                self.cache.restore('stage',keys[0],{'out' : self.output})
+
+        remaining = {os.path.basename(path) for path,_ in self.cache.entries()}
+        self.assertEqual(remaining,{keys[0],keys[2]})
+
+if __name__ == "__main__":
+    unittest.main()
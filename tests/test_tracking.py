@@ -0,0 +1,102 @@
+import unittest
+import json
+import os
+import pickle
+import tempfile
+from unittest import mock
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+import mlflow
+import mlflow.sklearn
+from mlflow.entities import Metric
+from src.tracking import MAX_ENTITIES_PER_BATCH,MAX_PARAMS_PER_BATCH,MAX_PARAM_VALUE_LENGTH,local_uri,log_batch,read_status,upload_artifacts,wait_for_upload,_write_status
+
+class TrackingTest(unittest.TestCase):
+    # Runs against the local file backend, so no tracking server is needed.
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.uri = local_uri({'file_dir' : os.path.join(self.tmp.name,'mlruns')},'file')
+        self.client = mlflow.MlflowClient(self.uri)
+        experiment_id = self.client.create_experiment('test')
+        self.run_id = self.client.create_run(experiment_id).info.run_id
+        self.uploads_dir = os.path.join(self.tmp.name,'uploads')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_log_batch_respects_request_limits(self):
+        params = {f'p{i}' : i for i in range(250)}
+        params['long'] = 'x' * 2000
+        metrics = {f'm{i}' : i / 10 for i in range(1500)}
+        tags = {f't{i}' : 'v' for i in range(10)}
+        client = mock.Mock(wraps=self.client)
+
+        requests = log_batch(self.run_id,params=params,metrics=metrics,tags=tags,client=client)
+        calls = [c.kwargs for c in client.log_batch.call_args_list]
+        self.assertEqual(requests,len(calls))
+        self.assertEqual(requests,3)
+        for call in calls:
+            self.assertLessEqual(len(call['params']),MAX_PARAMS_PER_BATCH)
+            self.assertLessEqual(len(call['params']) + len(call['metrics']) + len(call['tags']),MAX_ENTITIES_PER_BATCH)
+
+        data = self.client.get_run(self.run_id).data
+        self.assertEqual(len(data.params),251)
+        self.assertEqual(len(data.params['long']),MAX_PARAM_VALUE_LENGTH)
+        self.assertEqual(len(data.metrics),1500)
+        self.assertEqual(data.metrics['m15'],1.5)
+        self.assertEqual({k : v for k,v in data.tags.items() if k.startswith('t')},tags)
+
+    def test_log_batch_keeps_metric_history(self):
+        history = [Metric('loss',1.0 / (step + 1),1000 + step,step) for step in range(5)]
+        self.assertEqual(log_batch(self.run_id,metrics=history,client=self.client),1)
+        logged = self.client.get_metric_history(self.run_id,'loss')
+        self.assertEqual(sorted(m.step for m in logged),list(range(5)))
+
+    def write_artifacts(self):
+        metrics_path = os.path.join(self.tmp.name,'metrics.json')
+        with open(metrics_path,'w') as f:
+            json.dump({'accuracy' : 0.9},f)
+        model_path = os.path.join(self.tmp.name,'trained_model.pkl')
+        with open(model_path,'wb') as f:
+            pickle.dump(LogisticRegression().fit(np.eye(4),[0,1,0,1]),f)
+        return model_path,metrics_path
+
+    def test_foreground_upload(self):
+        model_path,metrics_path = self.write_artifacts()
+        self.assertIsNone(upload_artifacts(self.run_id,self.uri,model_path,[metrics_path],background=False,uploads_dir=self.uploads_dir))
+        status = wait_for_upload(self.run_id,timeout_s=0,uploads_dir=self.uploads_dir)
+        self.assertEqual(status['state'],'done')
+        artifacts = {a.path for a in self.client.list_artifacts(self.run_id)}
+        self.assertIn('metrics.json',artifacts)
+        model = mlflow.sklearn.load_model(f'runs:/{self.run_id}/model')
+        np.testing.assert_array_equal(model.predict(np.eye(4)),[0,1,0,1])
+
+    def test_background_upload(self):
+        _,metrics_path = self.write_artifacts()
+        process = upload_artifacts(self.run_id,self.uri,None,[metrics_path],uploads_dir=self.uploads_dir)
+        process.wait(timeout=120)
+        self.assertEqual(wait_for_upload(self.run_id,timeout_s=5,uploads_dir=self.uploads_dir)['state'],'done')
+        self.assertIn('metrics.json',{a.path for a in self.client.list_artifacts(self.run_id)})
+
+    def test_failed_upload_is_recorded(self):
+        _,metrics_path = self.write_artifacts()
+        with self.assertRaises(Exception):
+            upload_artifacts('0' * 32,self.uri,None,[metrics_path],background=False,uploads_dir=self.uploads_dir)
+        self.assertEqual(read_status('0' * 32,self.uploads_dir)['state'],'failed')
+        with self.assertRaises(RuntimeError):
+            wait_for_upload('0' * 32,timeout_s=0,uploads_dir=self.uploads_dir)
+
+    def test_wait_for_upload_states(self):
+        # Runs logged without a staged upload have nothing to wait for.
+        self.assertIsNone(wait_for_upload(self.run_id,timeout_s=0,uploads_dir=self.uploads_dir))
+        upload_dir = os.path.join(self.uploads_dir,self.run_id)
+        os.makedirs(upload_dir)
+        _write_status(upload_dir,state='uploading',run_id=self.run_id)
+        with self.assertRaises(TimeoutError):
+            wait_for_upload(self.run_id,timeout_s=0,uploads_dir=self.uploads_dir)
+        _write_status(upload_dir,state='done',run_id=self.run_id)
+        self.assertEqual(wait_for_upload(self.run_id,timeout_s=0,uploads_dir=self.uploads_dir)['state'],'done')
+
+if __name__ == "__main__":
+    unittest.main()